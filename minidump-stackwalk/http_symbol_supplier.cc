@@ -411,6 +411,16 @@ HTTPSymbolSupplier::GetStats(const CodeModule* module, SymbolStats* stats) const
   return true;
 }
 
+void
+HTTPSymbolSupplier::ClearStats() {
+  symbol_stats_.clear();
+}
+
+void
+HTTPSymbolSupplier::ClearErrors() {
+  error_symbols_.clear();
+}
+
 bool HTTPSymbolSupplier::SymbolWasError(const CodeModule* module,
                                         const SystemInfo* system_info) {
   return error_symbols_.find(std::make_pair(module->debug_file(),
@@ -100,6 +100,15 @@ class HTTPSymbolSupplier : public SimpleSymbolSupplier {
   // Returns true if stats were found, false if not.
   bool GetStats(const CodeModule* module, SymbolStats* stats) const;
 
+  // Forget the stats gathered so far. A long-running stackwalker calls this
+  // between minidumps so that stats only describe the current one.
+  void ClearStats();
+
+  // Forget the symbol files that failed to download. A long-running
+  // stackwalker calls this between minidumps so that symbols uploaded since
+  // are fetched again.
+  void ClearErrors();
+
  private:
   bool FetchSymbolFile(const CodeModule* module, const SystemInfo* system_info);
 
@@ -1110,12 +1110,129 @@ static void PrintProcessStateMachineReadable(const ProcessState& process_state)
 
 //*** End of copy-paste from minidump_stackwalk.cc ***
 
+// Process a single minidump and fill root with the results.  The symbol
+// supplier and the resolver may be shared by many calls: symbols loaded into
+// the resolver stay loaded for the following minidumps.
+void ProcessMinidump(const char* minidump_path,
+                     Json::Value& raw_root,
+                     SymbolSupplier* symbol_supplier,
+                     HTTPSymbolSupplier* http_symbol_supplier,
+                     SourceLineResolverInterface* resolver,
+                     bool pipe,
+                     Json::Value& root)
+{
+  Minidump minidump(minidump_path);
+  minidump.Read();
+  // process minidump
+  // bug 950710 - Bad symbol files are causing the stackwalker to
+  // run amok. Disabling this until we get an upstream fix.
+  //Stackwalker::set_max_frames(UINT32_MAX);
+  if (http_symbol_supplier) {
+    http_symbol_supplier->ClearStats();
+    http_symbol_supplier->ClearErrors();
+  }
+  StackFrameSymbolizerForward symbolizer(symbol_supplier, resolver);
+  MinidumpProcessor minidump_processor(&symbolizer, true);
+  ProcessState process_state;
+  ProcessResult result =
+    minidump_processor.Process(&minidump, &process_state);
+
+  if (pipe) {
+    if (result == google_breakpad::PROCESS_OK) {
+      PrintProcessStateMachineReadable(process_state);
+    }
+    printf("====PIPE DUMP ENDS===\n");
+  }
+
+  root["status"] = ResultString(result);
+  root["sensitive"] = Json::Value(Json::objectValue);
+  if (result == google_breakpad::PROCESS_OK) {
+    ConvertProcessStateToJSON(process_state, symbolizer,
+                              http_symbol_supplier, root, raw_root);
+  }
+  ConvertMemoryInfoToJSON(minidump, raw_root, root);
+
+  // Get the PID.
+  MinidumpMiscInfo* misc_info = minidump.GetMiscInfo();
+  if (misc_info && misc_info->misc_info() &&
+      (misc_info->misc_info()->flags1 & MD_MISCINFO_FLAGS1_PROCESS_ID)) {
+    root["pid"] = misc_info->misc_info()->process_id;
+  }
+
+  // See if this is a Linux dump with /proc/cpuinfo in it
+  uint32_t cpuinfo_length = 0;
+  if (process_state.system_info()->os == "Linux" &&
+      minidump.SeekToStreamType(MD_LINUX_CPU_INFO, &cpuinfo_length)) {
+    string contents;
+    contents.resize(cpuinfo_length);
+    if (minidump.ReadBytes(const_cast<char*>(contents.data()), cpuinfo_length)) {
+      ConvertCPUInfoToJSON(contents, root);
+    }
+  }
+
+  // See if this is a Linux dump with /etc/lsb-release in it
+  uint32_t length = 0;
+  if (process_state.system_info()->os == "Linux" &&
+      minidump.SeekToStreamType(MD_LINUX_LSB_RELEASE, &length)) {
+    string contents;
+    contents.resize(length);
+    if (minidump.ReadBytes(const_cast<char*>(contents.data()), length)) {
+      ConvertLSBReleaseToJSON(contents, root);
+    }
+  }
+}
+
+void ReadRawJSON(const char* json_path, Json::Value& raw_root) {
+  Json::Reader reader;
+  ifstream raw_stream(json_path);
+  reader.parse(raw_stream, raw_root);
+}
+
+// Serve requests read from stdin, one per line, until stdin is closed.  Each
+// request is a JSON object:
+//   {"minidump": "<path>", "raw_crash": {...}, "raw_json": "<path>"}
+// where the raw annotations are given either inline, as "raw_crash", or in a
+// file named by "raw_json".  Both are optional.  Each response is the JSON output for that
+// minidump, written to stdout on a single line.  A request that can't be
+// parsed gets a response with a "status" of "ERROR_BAD_REQUEST".
+void Serve(SymbolSupplier* symbol_supplier,
+           HTTPSymbolSupplier* http_symbol_supplier,
+           SourceLineResolverInterface* resolver)
+{
+  Json::FastWriter writer;
+  string line;
+  while (std::getline(std::cin, line)) {
+    Json::Value request;
+    Json::Reader reader;
+    Json::Value root;
+    if (!reader.parse(line, request) || !request.isObject() ||
+        !request["minidump"].isString()) {
+      root["status"] = "ERROR_BAD_REQUEST";
+    } else {
+      Json::Value raw_root(Json::objectValue);
+      if (request["raw_crash"].isObject()) {
+        raw_root = request["raw_crash"];
+      } else if (request["raw_json"].isString()) {
+        ReadRawJSON(request["raw_json"].asCString(), raw_root);
+      }
+      ProcessMinidump(request["minidump"].asCString(), raw_root,
+                      symbol_supplier, http_symbol_supplier, resolver,
+                      false, root);
+    }
+    // FastWriter ends its output with a newline
+    fputs(writer.write(root).c_str(), stdout);
+    fflush(stdout);
+  }
+}
+
 void usage() {
   fprintf(stderr, "Usage: stackwalker [options] <minidump> [<symbol paths]\n");
+  fprintf(stderr, "       stackwalker --server [options] [<symbol paths]\n");
   fprintf(stderr, "Options:\n");
   fprintf(stderr, "\t--pretty\tPretty-print JSON output.\n");
   fprintf(stderr, "\t--pipe-dump\tProduce pipe-delimited output in addition to JSON output\n");
   fprintf(stderr, "\t--raw-json\tAn input file with the raw annotations as JSON\n");
+  fprintf(stderr, "\t--server\tProcess the minidumps named in JSON requests read from stdin, one per line\n");
   http_commandline_usage();
   fprintf(stderr, "\t--help\tDisplay this help text.\n");
 }
@@ -1125,6 +1242,7 @@ int main(int argc, char** argv)
 {
   bool pretty = false;
   bool pipe = false;
+  bool server = false;
   char* json_path = nullptr;
   // Yeah, this is ugly.
   vector<char*> symbols_urls;
@@ -1134,6 +1252,7 @@ int main(int argc, char** argv)
     {"pretty", no_argument, nullptr, 'p'},
     {"pipe-dump", no_argument, nullptr, 'i'},
     {"raw-json", required_argument, nullptr, 'r'},
+    {"server", no_argument, nullptr, 'e'},
     HTTP_COMMANDLINE_OPTIONS
     {"help", no_argument, nullptr, 'h'},
     {nullptr, 0, nullptr, 0}
@@ -1156,6 +1275,9 @@ int main(int argc, char** argv)
     case 'r':
       json_path = optarg;
       break;
+    case 'e':
+      server = true;
+      break;
     HANDLE_HTTP_COMMANDLINE_OPTIONS
     case 'h':
       usage();
@@ -1169,7 +1291,7 @@ int main(int argc, char** argv)
     }
   }
 
-  if (optind >= argc) {
+  if (!server && optind >= argc) {
     usage();
     return 1;
   }
@@ -1181,19 +1303,14 @@ int main(int argc, char** argv)
     return 1;
   }
 
-  Minidump minidump(argv[optind]);
+  // in server mode, all the arguments are symbol paths
+  int first_symbol_path = server ? optind : optind + 1;
   vector<string> symbol_paths;
   // allow symbol paths to be passed on the commandline.
-  for (int i = optind + 1; i < argc; i++) {
+  for (int i = first_symbol_path; i < argc; i++) {
     symbol_paths.push_back(argv[i]);
   }
 
-  minidump.Read();
-  // process minidump
-  // bug 950710 - Bad symbol files are causing the stackwalker to
-  // run amok. Disabling this until we get an upstream fix.
-  //Stackwalker::set_max_frames(UINT32_MAX);
-  Json::Value root;
   scoped_ptr<SymbolSupplier> symbol_supplier;
   HTTPSymbolSupplier* http_symbol_supplier = nullptr;
   if (!symbols_urls.empty()) {
@@ -1208,62 +1325,20 @@ int main(int argc, char** argv)
   }
 
   BasicSourceLineResolver resolver;
-  StackFrameSymbolizerForward symbolizer(symbol_supplier.get(), &resolver);
-  MinidumpProcessor minidump_processor(&symbolizer, true);
-  ProcessState process_state;
-  ProcessResult result =
-    minidump_processor.Process(&minidump, &process_state);
 
-  if (pipe) {
-    if (result == google_breakpad::PROCESS_OK) {
-      PrintProcessStateMachineReadable(process_state);
-    }
-    printf("====PIPE DUMP ENDS===\n");
+  if (server) {
+    Serve(symbol_supplier.get(), http_symbol_supplier, &resolver);
+    exit(0);
   }
 
   Json::Value raw_root(Json::objectValue);
   if (json_path) {
-    Json::Reader reader;
-    ifstream raw_stream(json_path);
-    reader.parse(raw_stream, raw_root);
-  }
-
-  root["status"] = ResultString(result);
-  root["sensitive"] = Json::Value(Json::objectValue);
-  if (result == google_breakpad::PROCESS_OK) {
-    ConvertProcessStateToJSON(process_state, symbolizer,
-                              http_symbol_supplier, root, raw_root);
-  }
-  ConvertMemoryInfoToJSON(minidump, raw_root, root);
-
-  // Get the PID.
-  MinidumpMiscInfo* misc_info = minidump.GetMiscInfo();
-  if (misc_info && misc_info->misc_info() &&
-      (misc_info->misc_info()->flags1 & MD_MISCINFO_FLAGS1_PROCESS_ID)) {
-    root["pid"] = misc_info->misc_info()->process_id;
-  }
-
-  // See if this is a Linux dump with /proc/cpuinfo in it
-  uint32_t cpuinfo_length = 0;
-  if (process_state.system_info()->os == "Linux" &&
-      minidump.SeekToStreamType(MD_LINUX_CPU_INFO, &cpuinfo_length)) {
-    string contents;
-    contents.resize(cpuinfo_length);
-    if (minidump.ReadBytes(const_cast<char*>(contents.data()), cpuinfo_length)) {
-      ConvertCPUInfoToJSON(contents, root);
-    }
+    ReadRawJSON(json_path, raw_root);
   }
 
-  // See if this is a Linux dump with /etc/lsb-release in it
-  uint32_t length = 0;
-  if (process_state.system_info()->os == "Linux" &&
-      minidump.SeekToStreamType(MD_LINUX_LSB_RELEASE, &length)) {
-    string contents;
-    contents.resize(length);
-    if (minidump.ReadBytes(const_cast<char*>(contents.data()), length)) {
-      ConvertLSBReleaseToJSON(contents, root);
-    }
-  }
+  Json::Value root;
+  ProcessMinidump(argv[optind], raw_root, symbol_supplier.get(),
+                  http_symbol_supplier, &resolver, pipe, root);
 
   scoped_ptr<Json::Writer> writer;
   if (pretty)
@@ -32,6 +32,7 @@ from functools import partial
 from configman import Namespace
 from configman.converters import class_converter
 
+from socorro.lib.prefetcher import Prefetcher
 from socorro.lib.task_manager import respond_to_SIGTERM
 from socorro.app.generic_app import App, main  # main not used here, but
                                                # is imported from generic_app
@@ -84,6 +85,29 @@ class FetchTransformSaveApp(App):
         short_form='n',
         default='forever'
     )
+    # the crashes waiting in the task manager's queue can be fetched from the
+    # source while they wait, rather than by the worker that takes them.  This
+    # pays off for sources with a high latency, like S3.  It only works with
+    # task managers that run the workers as threads of this process.
+    required_config.prefetch = Namespace()
+    required_config.prefetch.add_option(
+        'number_of_threads',
+        doc='the number of threads fetching crashes ahead of the workers (0 '
+            'to leave the fetching to the workers)',
+        default=0
+    )
+    required_config.prefetch.add_option(
+        'maximum_crashes',
+        doc='the maximum number of crashes fetched ahead of the workers.  No '
+            'more than the ones waiting in the task manager queue can be.',
+        default=8
+    )
+    required_config.prefetch.add_option(
+        'maximum_bytes',
+        doc='the size of the crashes fetched ahead of the workers past which '
+            'no more are fetched',
+        default=256 * 1024 * 1024
+    )
 
     @staticmethod
     def get_application_defaults():
@@ -107,6 +131,8 @@ class FetchTransformSaveApp(App):
     def __init__(self, config):
         super(FetchTransformSaveApp, self).__init__(config)
         self.waiting_func = None
+        self.prefetch_crashes = False
+        self.prefetcher = None
         # select the iterator type based on the "number_of_submissions" config
         self.source_iterator = {
             'forever': self._infinite_iterator,
@@ -230,6 +256,16 @@ class FetchTransformSaveApp(App):
             if i == int(self.config.number_of_submissions):
                 break
 
+    def _prefetching_iterator(self):
+        """this iterator wraps the one selected by "number_of_submissions"
+        when crashes are prefetched.  Each crash is handed to the prefetcher
+        as it goes into the task manager's queue."""
+        for job in self.source_iterator():
+            if job is not None:
+                args, kwargs = job
+                self.prefetcher.submit(args[0])
+            yield job
+
     def _filter_disallowed_values(self, current_value):
         """in this base class there are no disallowed values coming from the
         iterators.  Other users of these iterator may have some standards and
@@ -261,11 +297,9 @@ class FetchTransformSaveApp(App):
                     exc_info=True
                 )
 
-    def _transform(self, crash_id):
-        """this default transform function only transfers raw data from the
-        source to the destination without changing the data.  While this may
-        be good enough for the raw crashmover, the processor would override
-        this method to create and save processed crashes"""
+    def _fetch_crash(self, crash_id):
+        """fetch what the transform needs from the source.  This runs in a
+        prefetch thread when crashes are prefetched."""
         try:
             raw_crash = self.source.get_raw_crash(crash_id)
         except Exception as x:
@@ -284,6 +318,31 @@ class FetchTransformSaveApp(App):
                 exc_info=True
             )
             dumps = {}
+        return raw_crash, dumps
+
+    def _fetched_crash_size(self, fetched_crash):
+        """the number of bytes a fetched crash takes, as counted against the
+        prefetch budget.  The dumps dwarf the rest."""
+        raw_crash, dumps = fetched_crash
+        return sum(len(a_dump) for a_dump in dumps.itervalues())
+
+    def _discard_fetched_crash(self, fetched_crash):
+        """release what a crash that was fetched and never transformed
+        holds"""
+        pass
+
+    def _get_crash(self, crash_id):
+        """the crash as fetched by _fetch_crash, either ahead of time or now"""
+        if self.prefetcher is not None:
+            return self.prefetcher.claim(crash_id)
+        return self._fetch_crash(crash_id)
+
+    def _transform(self, crash_id):
+        """this default transform function only transfers raw data from the
+        source to the destination without changing the data.  While this may
+        be good enough for the raw crashmover, the processor would override
+        this method to create and save processed crashes"""
+        raw_crash, dumps = self._get_crash(crash_id)
         try:
             self.destination.save_raw_crash(raw_crash, dumps, crash_id)
             self.config.logger.info('saved - %s', crash_id)
@@ -348,14 +407,70 @@ class FetchTransformSaveApp(App):
             target=self
         )
         signal.signal(signal.SIGTERM, respond_to_SIGTERM_with_logging)
-        self.task_manager = \
-            self.config.producer_consumer.producer_consumer_class(
-                self.config.producer_consumer,
-                job_source_iterator=self.source_iterator,
-                task_func=self.transform
-            )
+        task_manager_class = \
+            self.config.producer_consumer.producer_consumer_class
+        task_manager_kwargs = {}
+        if getattr(task_manager_class, 'runs_tasks_in_subprocesses', False):
+            # the transform will run in worker processes that must not share
+            # the crash storage connections of this process
+            task_manager_kwargs['worker_setup_func'] = \
+                self._setup_worker_process
+            task_manager_kwargs['worker_close_func'] = \
+                self._close_worker_process
+        job_source_iterator = self.source_iterator
+        if self.config.prefetch.number_of_threads:
+            if task_manager_kwargs:
+                self.config.logger.warning(
+                    'crashes are not prefetched for workers that are '
+                    'separate processes'
+                )
+            else:
+                self.prefetch_crashes = True
+                job_source_iterator = self._prefetching_iterator
+        self.task_manager = task_manager_class(
+            self.config.producer_consumer,
+            job_source_iterator=job_source_iterator,
+            task_func=self.transform,
+            **task_manager_kwargs
+        )
         self.config.executor_identity = self.task_manager.executor_identity
 
+    def _setup_prefetcher(self):
+        """start the prefetch threads if the task manager was given the
+        prefetching iterator"""
+        if not self.prefetch_crashes:
+            return
+        config = self.config.prefetch
+        self.prefetcher = Prefetcher(
+            self._fetch_crash,
+            config.number_of_threads,
+            config.maximum_crashes,
+            config.maximum_bytes,
+            size_func=self._fetched_crash_size,
+            discard_func=self._discard_fetched_crash,
+            logger=self.config.logger,
+        )
+
+    def _close_prefetcher(self):
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+            self.prefetcher = None
+
+    def _setup_worker_process(self):
+        """called at the start of each worker process when the task manager
+        runs the transform in subprocesses.  The source and destination
+        inherited from the parent process share its sockets and connection
+        pools, so the worker gets its own.  The inherited instances are kept
+        referenced rather than closed or garbage collected: either could shut
+        down connections that the parent is still using."""
+        self._inherited_crash_stores = (self.source, self.destination)
+        FetchTransformSaveApp._setup_source_and_destination(self)
+
+    def _close_worker_process(self):
+        """called at the end of each worker process when the task manager
+        runs the transform in subprocesses."""
+        FetchTransformSaveApp.close(self)
+
     def close(self):
         try:
             self.source.close()
@@ -376,7 +491,11 @@ class FetchTransformSaveApp(App):
 
         self._setup_task_manager()
         self._setup_source_and_destination()
-        self.task_manager.blocking_start(waiting_func=self.waiting_func)
+        self._setup_prefetcher()
+        try:
+            self.task_manager.blocking_start(waiting_func=self.waiting_func)
+        finally:
+            self._close_prefetcher()
         self.close()
         self.config.logger.info('done.')
 
@@ -51,6 +51,7 @@ class ApplicationDefaultsProxy(object):
                 'socorro.external.rabbitmq.reprocess_crashlist.ReprocessCrashlistApp',
             'purge_rmq':
             'socorro.external.rabbitmq.purge_queue_app.PurgeRabbitMQQueueApp',
+            'signature_batch': 'socorro.signature.batch_app.SignatureBatchApp',
         }
 
 
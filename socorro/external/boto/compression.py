@@ -0,0 +1,110 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Codecs for the raw and processed crashes saved in S3.
+
+A compressed object is tagged with its encoding by the magic number its
+compression format starts with.  A json document starts with '{', so reading
+an object back doesn't depend on the codec that is configured: whatever
+encoded it, or nothing at all for the objects saved before compression was
+turned on, is recognized and decoded."""
+
+import zlib
+
+from configman import Namespace, RequiredConfig
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class PlainCodec(RequiredConfig):
+    """saves the objects as they are"""
+    required_config = Namespace()
+
+    magic = None
+
+    def __init__(self, config):
+        self.config = config
+
+    def encode(self, data):
+        return data
+
+    @staticmethod
+    def decode(data):
+        return data
+
+
+class GzipCodec(PlainCodec):
+    """compresses the objects with gzip"""
+    required_config = Namespace()
+    required_config.add_option(
+        'compression_level',
+        doc='the gzip compression level, from 1 (fastest) to 9 (smallest)',
+        default=6,
+        reference_value_from='resource.boto',
+    )
+
+    magic = '\x1f\x8b'
+
+    def encode(self, data):
+        # the gzip header and trailer are what the 16 adds to the window bits
+        compressor = zlib.compressobj(
+            self.config.compression_level,
+            zlib.DEFLATED,
+            16 + zlib.MAX_WBITS
+        )
+        return compressor.compress(data) + compressor.flush()
+
+    @staticmethod
+    def decode(data):
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+
+class ZstdCodec(PlainCodec):
+    """compresses the objects with zstandard, which needs the zstandard
+    package"""
+    required_config = Namespace()
+    required_config.add_option(
+        'compression_level',
+        doc='the zstandard compression level, from 1 (fastest) to 22 (smallest)',
+        default=3,
+        reference_value_from='resource.boto',
+    )
+
+    magic = '\x28\xb5\x2f\xfd'
+
+    def __init__(self, config):
+        super(ZstdCodec, self).__init__(config)
+        if zstandard is None:
+            raise ImportError(
+                'the zstandard package is needed to save zstandard '
+                'compressed objects'
+            )
+        self._compressor = zstandard.ZstdCompressor(
+            level=config.compression_level
+        )
+
+    def encode(self, data):
+        return self._compressor.compress(data)
+
+    @staticmethod
+    def decode(data):
+        if zstandard is None:
+            raise ImportError(
+                'the zstandard package is needed to read zstandard '
+                'compressed objects'
+            )
+        # a new decompressor every time, they aren't safe to share between
+        # threads
+        return zstandard.ZstdDecompressor().decompress(data)
+
+
+def decode(data):
+    """returns data decoded by the codec that encoded it"""
+    for codec in (GzipCodec, ZstdCodec):
+        if data.startswith(codec.magic):
+            return codec.decode(data)
+    return data
@@ -5,7 +5,9 @@
 import json
 import socket
 import datetime
+import threading
 import contextlib
+from collections import OrderedDict
 
 import boto
 import boto.s3.connection
@@ -14,21 +16,16 @@ import boto.exception
 from configman import Namespace, RequiredConfig, class_converter
 from configman.converters import str_to_boolean
 
+from socorro.external.boto import compression
 from socorro.lib.converters import change_default
 from socorro.lib.ooid import dateFromOoid
+from socorro.lib.serializers import iso_serializer
 
 
 class KeyNotFound(Exception):
     pass
 
 
-class JSONISOEncoder(json.JSONEncoder):
-    def default(self, obj):
-        if isinstance(obj, datetime.date):
-            return obj.isoformat()
-        raise NotImplementedError("Don't know about {0!r}".format(obj))
-
-
 class KeyBuilderBase(object):
     """Base key builder for s3 pseudo-filenames"""
     def build_keys(self, prefix, name_of_thing, id):
@@ -117,6 +114,83 @@ class SimpleDatePrefixKeyBuilder(KeyBuilderBase):
         return keys
 
 
+class KeyLayoutResolver(object):
+    """remembers which of the keys built for a thing actually held it.
+
+    A key builder can return several keys for a thing, one per layout the
+    thing may have been saved under, and they are tried in order.  A thing
+    that was saved under one of the later layouts costs a failed GET for each
+    of the layouts before it.  Crashes are saved under the same layout for
+    days at a time, so the layout that held a thing is remembered by the kind
+    of thing and the date of its crash id, and that layout's key is tried
+    first for the next thing of the same kind and date.  The other keys are
+    still tried after it.  A fetch is a hit when the key tried first held the
+    thing, and a miss when there was nothing to guess from or the guess was
+    wrong."""
+
+    def __init__(self, size, count_func=None):
+        """parameters:
+            size - the number of (kind of thing, date) pairs remembered, 0 to
+                   remember none
+            count_func - called with 'hits' or 'misses' for every fetch that
+                         is counted, to report them"""
+        self.size = size
+        self.count_func = count_func
+        self.hits = 0
+        self.misses = 0
+        self._layouts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _layout_key(self, name_of_thing, id, keys):
+        # the number of keys is part of it, the same position can be a
+        # different layout for ids the key builder treats differently
+        return (name_of_thing, len(keys), dateFromOoid(id))
+
+    def order(self, name_of_thing, id, keys):
+        """returns the keys in the order they are to be tried"""
+        if self.size <= 0 or len(keys) < 2:
+            return keys
+        layout_key = self._layout_key(name_of_thing, id, keys)
+        with self._lock:
+            index = self._layouts.get(layout_key)
+            if index is None:
+                return keys
+            # the most recently used goes last, the oldest is evicted first
+            del self._layouts[layout_key]
+            self._layouts[layout_key] = index
+        return [keys[index]] + keys[:index] + keys[index + 1:]
+
+    def record(self, name_of_thing, id, keys, key):
+        """remembers that the thing was found under key, one of keys, or
+        under none of them if key is None"""
+        if self.size <= 0 or len(keys) < 2:
+            return
+        layout_key = self._layout_key(name_of_thing, id, keys)
+        with self._lock:
+            guessed_index = self._layouts.get(layout_key)
+            if key is None:
+                self.misses += 1
+                counter = 'misses'
+            else:
+                index = keys.index(key)
+                if guessed_index == index:
+                    self.hits += 1
+                    counter = 'hits'
+                else:
+                    self.misses += 1
+                    counter = 'misses'
+                self._layouts.pop(layout_key, None)
+                self._layouts[layout_key] = index
+                while len(self._layouts) > self.size:
+                    self._layouts.popitem(last=False)
+        if self.count_func is not None:
+            self.count_func(counter)
+
+    def clear(self):
+        with self._lock:
+            self._layouts.clear()
+
+
 class ConnectionContextBase(RequiredConfig):
 
     required_config = Namespace()
@@ -159,6 +233,28 @@ class ConnectionContextBase(RequiredConfig):
         reference_value_from='resource.boto',
         likely_to_be_changed=True,
     )
+    required_config.add_option(
+        'key_layout_cache_size',
+        doc=(
+            'the number of (kind of thing, crash date) pairs for which the '
+            'key that held the thing is remembered and tried first, when the '
+            'key builder builds several keys (0 to always try the keys in '
+            'order)'
+        ),
+        default=1000,
+        reference_value_from='resource.boto',
+    )
+    required_config.add_option(
+        'codec_class',
+        default='socorro.external.boto.compression.PlainCodec',
+        doc=(
+            'fully qualified dotted Python classname of the codec the raw and '
+            'processed crashes are saved with (objects are read back whatever '
+            'codec saved them)'
+        ),
+        from_string_converter=class_converter,
+        reference_value_from='resource.boto',
+    )
 
     operational_exceptions = (
         socket.timeout,
@@ -190,9 +286,21 @@ class ConnectionContextBase(RequiredConfig):
             KeyNotFound
         )
         self.keybuilder = config.keybuilder_class()
+        self.key_layouts = KeyLayoutResolver(
+            config.key_layout_cache_size,
+            count_func=self._count_key_layouts
+        )
+        self.codec = config.codec_class(config)
 
         self._bucket_cache = {}
 
+    def _count_key_layouts(self, counter):
+        try:
+            self.config.metrics.increment('boto.key_layouts.%s' % counter)
+        except KeyError:
+            # no metrics configured
+            pass
+
     def _connect(self):
         try:
             return self.connection
@@ -249,12 +357,14 @@ class ConnectionContextBase(RequiredConfig):
         bucket = self._get_bucket(conn, self.config.bucket_name)
 
         all_keys = self.build_keys(self.config.prefix, name_of_thing, id)
-        for key in all_keys:
+        for key in self.key_layouts.order(name_of_thing, id, all_keys):
             key_object = bucket.get_key(key)
             if key_object is not None:
+                self.key_layouts.record(name_of_thing, id, all_keys, key)
                 return key_object.get_contents_as_string()
 
         # None of the keys worked, so raise an error
+        self.key_layouts.record(name_of_thing, id, all_keys, None)
         raise KeyNotFound(
             '%s (bucket=%r keys=%r) not found, no value returned' % (
                 id,
@@ -264,7 +374,7 @@ class ConnectionContextBase(RequiredConfig):
         )
 
     def _convert_mapping_to_string(self, a_mapping):
-        return json.dumps(a_mapping, cls=JSONISOEncoder)
+        return iso_serializer.dumps(a_mapping)
 
     def _convert_list_to_string(self, a_list):
         return json.dumps(a_list)
@@ -272,6 +382,12 @@ class ConnectionContextBase(RequiredConfig):
     def _convert_string_to_list(self, a_string):
         return json.loads(a_string)
 
+    def _encode(self, a_string):
+        return self.codec.encode(a_string)
+
+    def _decode(self, a_string):
+        return compression.decode(a_string)
+
     def commit(self):
         """boto doesn't support transactions so this silently
         does nothing"""
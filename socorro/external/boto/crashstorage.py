@@ -4,6 +4,9 @@
 
 import json
 import time
+import threading
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
 
 import json_schema_reducer
 from socorro.lib.converters import change_default
@@ -20,6 +23,7 @@ from socorro.external.boto.connection_context import (
     SimpleDatePrefixKeyBuilder
 )
 from socorro.external.es.super_search_fields import SuperSearchFields
+from socorro.lib.serializers import iso_serializer
 from socorro.schemas import CRASH_REPORT_JSON_SCHEMA
 
 
@@ -74,6 +78,27 @@ class BotoCrashStorage(CrashStorageBase):
         default='socorro.lib.util.DotDict',
         from_string_converter=class_converter,
     )
+    required_config.add_option(
+        'number_of_fetch_threads',
+        doc='the number of objects of a crash fetched at the same time when '
+            'reading its dumps (1 to fetch them one after the other)',
+        default=1,
+        reference_value_from='resource.boto',
+    )
+    required_config.add_option(
+        'dump_names_in_raw_crash',
+        doc="also save the names of a crash's dumps in its raw crash, so "
+            "that the dumps can be read back without looking up their "
+            "names first",
+        default=False,
+        reference_value_from='resource.boto',
+    )
+
+    # the key of the dump names in a raw crash saved with them
+    dump_names_key = 'dump_names'
+    # the number of crashes whose dump names are remembered between the
+    # reading of their raw crash and the reading of their dumps
+    remembered_dump_names = 100
 
     def is_operational_exception(self, x):
         if "not found, no value returned" in str(x):
@@ -111,6 +136,31 @@ class BotoCrashStorage(CrashStorageBase):
             quit_check_callback
         )
 
+        self._fetch_pool = None
+        self._lock = threading.Lock()
+        self._dump_names = OrderedDict()
+
+    def _map_fetches(self):
+        """returns the map function used to fetch several objects of a crash.
+        The thread pool is only started when it is first needed, in the
+        process that needs it."""
+        if self.config.number_of_fetch_threads <= 1:
+            return map
+        with self._lock:
+            if self._fetch_pool is None:
+                self._fetch_pool = ThreadPool(
+                    self.config.number_of_fetch_threads
+                )
+            return self._fetch_pool.map
+
+    def close(self):
+        with self._lock:
+            if self._fetch_pool is not None:
+                self._fetch_pool.close()
+                self._fetch_pool.join()
+                self._fetch_pool = None
+        super(BotoCrashStorage, self).close()
+
     @staticmethod
     def do_save_raw_crash(boto_connection, raw_crash, dumps, crash_id):
         if dumps is None:
@@ -121,7 +171,7 @@ class BotoCrashStorage(CrashStorageBase):
         boto_connection.submit(
             crash_id,
             "raw_crash",
-            raw_crash_as_string
+            boto_connection._encode(raw_crash_as_string)
         )
         dump_names_as_string = boto_connection._convert_list_to_string(
             dumps.keys()
@@ -142,6 +192,10 @@ class BotoCrashStorage(CrashStorageBase):
             boto_connection.submit(crash_id, dump_name, dump)
 
     def save_raw_crash(self, raw_crash, dumps, crash_id):
+        if self.config.dump_names_in_raw_crash:
+            # a copy, the raw crash belongs to the caller
+            raw_crash = dict(raw_crash)
+            raw_crash[self.dump_names_key] = dumps.keys() if dumps else []
         self.transaction(self.do_save_raw_crash, raw_crash, dumps, crash_id)
 
     @staticmethod
@@ -153,7 +207,7 @@ class BotoCrashStorage(CrashStorageBase):
         boto_connection.submit(
             crash_id,
             "processed_crash",
-            processed_crash_as_string
+            boto_connection._encode(processed_crash_as_string)
         )
 
     def save_processed(self, processed_crash):
@@ -184,8 +238,8 @@ class BotoCrashStorage(CrashStorageBase):
                 crash_id,
                 "raw_crash"
             )
-            return json.loads(
-                raw_crash_as_string,
+            return iso_serializer.loads(
+                boto_connection._decode(raw_crash_as_string),
                 object_hook=json_object_hook
             )
         except boto_connection.ResponseError as x:
@@ -194,11 +248,22 @@ class BotoCrashStorage(CrashStorageBase):
             )
 
     def get_raw_crash(self, crash_id):
-        return self.transaction_for_get(
+        raw_crash = self.transaction_for_get(
             self.do_get_raw_crash,
             crash_id,
             self.config.json_object_hook
         )
+        if (
+            self.config.dump_names_in_raw_crash and
+            self.dump_names_key in raw_crash
+        ):
+            # kept for the reading of the dumps that usually follows
+            dump_names = raw_crash.pop(self.dump_names_key)
+            with self._lock:
+                self._dump_names[crash_id] = dump_names
+                while len(self._dump_names) > self.remembered_dump_names:
+                    self._dump_names.popitem(last=False)
+        return raw_crash
 
     @staticmethod
     def do_get_raw_dump(boto_connection, crash_id, name=None):
@@ -216,25 +281,54 @@ class BotoCrashStorage(CrashStorageBase):
         return self.transaction_for_get(self.do_get_raw_dump, crash_id, name)
 
     @staticmethod
-    def do_get_raw_dumps(boto_connection, crash_id):
+    def do_get_raw_dumps(boto_connection, crash_id, dump_names=None, map_func=map):
+        """fetches the dumps of a crash.  Without the dump names, they are
+        fetched first.  The fetches are run through map_func, several at a
+        time if it maps concurrently."""
+
+        def fetch(name_of_thing):
+            return boto_connection.fetch(crash_id, name_of_thing)
+
+        def fetch_names_or_main_dump(name_of_thing):
+            if name_of_thing == 'dump_names':
+                return fetch(name_of_thing)
+            try:
+                return fetch(name_of_thing)
+            except boto_connection.ResponseError:
+                # it's fetched again, and fails for good, if it is listed
+                return None
+
         try:
-            dump_names_as_string = boto_connection.fetch(
-                crash_id,
-                "dump_names"
-            )
-            dump_names = boto_connection._convert_string_to_list(
-                dump_names_as_string
-            )
+            fetched = {}
+            if dump_names is None:
+                if map_func is map:
+                    dump_names_as_string = fetch('dump_names')
+                else:
+                    # the main dump, that nearly every crash has, is fetched
+                    # along with the names rather than after them
+                    dump_names_as_string, fetched['dump'] = map_func(
+                        fetch_names_or_main_dump,
+                        ('dump_names', 'dump')
+                    )
+                dump_names = boto_connection._convert_string_to_list(
+                    dump_names_as_string
+                )
+            dump_names = [
+                'dump' if dump_name in (None, '', 'upload_file_minidump')
+                else dump_name
+                for dump_name in dump_names
+            ]
+            to_fetch = [
+                dump_name for dump_name in dump_names
+                if fetched.get(dump_name) is None
+            ]
+            fetched.update(zip(to_fetch, map_func(fetch, to_fetch)))
+
             # when we fetch the dumps, they are by default in memory, so we'll
             # put them into a MemoryDumpMapping.
             dumps = MemoryDumpsMapping()
             for dump_name in dump_names:
-                if dump_name in (None, '', 'upload_file_minidump'):
-                    dump_name = 'dump'
-                dumps[dump_name] = boto_connection.fetch(
-                    crash_id,
-                    dump_name
-                )
+                dumps[dump_name] = fetched[dump_name]
             return dumps
         except boto_connection.ResponseError as x:
             raise CrashIDNotFound(
@@ -243,7 +337,14 @@ class BotoCrashStorage(CrashStorageBase):
 
     def get_raw_dumps(self, crash_id):
         """this returns a MemoryDumpsMapping"""
-        return self.transaction_for_get(self.do_get_raw_dumps, crash_id)
+        with self._lock:
+            dump_names = self._dump_names.pop(crash_id, None)
+        return self.transaction_for_get(
+            self.do_get_raw_dumps,
+            crash_id,
+            dump_names,
+            self._map_fetches()
+        )
 
     def get_raw_dumps_as_files(self, crash_id):
         in_memory_dumps = self.get_raw_dumps(crash_id)
@@ -265,8 +366,8 @@ class BotoCrashStorage(CrashStorageBase):
                 crash_id,
                 "processed_crash"
             )
-            return json.loads(
-                processed_crash_as_string,
+            return iso_serializer.loads(
+                boto_connection._decode(processed_crash_as_string),
                 object_hook=json_object_hook,
             )
         except boto_connection.ResponseError as x:
@@ -6,12 +6,19 @@
 saving, fetching and iterating over raw crashes, dumps and processed crashes.
 """
 
-import copy
 import sys
 import os
 import collections
+import copy
 import datetime
+import threading
+import time
+
+from concurrent import futures
 
+from socorro.lib.copy_on_write import CopyOnWriteDotDict
+from socorro.lib.memory_file import MemoryFile
+from socorro.lib.serializers import shared_serializations
 from socorro.lib.util import DotDict as SocorroDotDict
 
 from configman import Namespace, RequiredConfig
@@ -83,6 +90,27 @@ class MemoryDumpsMapping(dict):
         without having to do any conversion."""
         return self
 
+    def as_memory_file_dumps_mapping(self, crash_id):
+        """convert this MemoryDumpMapping into a MemoryFileDumpsMapping by
+        putting each of the dumps into an anonymous memory file.  Nothing is
+        written to a file system.  The mapping must be closed when the dumps
+        are no longer needed."""
+        name_to_pathname_mapping = MemoryFileDumpsMapping()
+        try:
+            for a_dump_name, a_dump in self.iteritems():
+                if a_dump_name in (None, '', 'dump'):
+                    a_dump_name = 'upload_file_minidump'
+                memory_file = MemoryFile(
+                    '%s.%s' % (crash_id, a_dump_name),
+                    a_dump
+                )
+                name_to_pathname_mapping.memory_files.append(memory_file)
+                name_to_pathname_mapping[a_dump_name] = memory_file.pathname
+        except Exception:
+            name_to_pathname_mapping.close()
+            raise
+        return name_to_pathname_mapping
+
 
 class FileDumpsMapping(dict):
     """there has been a bifurcation in the crash storage data throughout the
@@ -126,6 +154,22 @@ class FileDumpsMapping(dict):
         return in_memory_dumps
 
 
+class MemoryFileDumpsMapping(FileDumpsMapping):
+    """a FileDumpsMapping whose pathnames are those of anonymous memory files
+    (see socorro.lib.memory_file) rather than files on a file system.  The
+    pathnames are valid, for this process and its children, until the mapping
+    is closed."""
+
+    def __init__(self, *args, **kwargs):
+        super(MemoryFileDumpsMapping, self).__init__(*args, **kwargs)
+        self.memory_files = []
+
+    def close(self):
+        for memory_file in self.memory_files:
+            memory_file.close()
+        self.memory_files = []
+
+
 class Redactor(RequiredConfig):
     """This class is the implementation of a functor for in situ redacting
     of sensitive keys from a mapping.  Keys that are to be redacted are placed
@@ -226,6 +270,18 @@ class CrashStorageBase(RequiredConfig):
         """
         return False
 
+    def mutates_few_keys(self):
+        """Whether this storage class, if it mutates the crash, only touches
+        a few of its keys and doesn't read the rest
+
+        Such a storage class is given copy-on-write views of the crash
+        rather than deep copies by the PolyCrashStorage.  A view that is
+        read in full, to serialize it for example, copies the whole crash
+        again on the way and costs about as much as a deep copy.
+
+        """
+        return False
+
     def save_raw_crash(self, raw_crash, dumps, crash_id):
         """this method that saves  both the raw_crash and the dump, must be
         overridden in any implementation.
@@ -494,6 +550,20 @@ class PolyCrashStorage(CrashStorageBase):
       ),
       likely_to_be_changed=True,
     )
+    required_config.add_option(
+      'number_of_save_threads',
+      doc='the number of threads of each subordinate crash store that '
+          'save_raw_and_processed uses to save to them in parallel (0 saves '
+          'to them one after another in the calling thread)',
+      default=0,
+    )
+    required_config.add_option(
+      'store_save_timeout',
+      doc='when saving in parallel, the number of seconds to wait for a '
+          'save to a subordinate crash store to start, and then to end, '
+          'before counting it as a failure',
+      default=120,
+    )
 
     def __init__(self, config, quit_check_callback=None):
         """instantiate all the subordinate crashstorage instances
@@ -507,6 +577,9 @@ class PolyCrashStorage(CrashStorageBase):
             self.storage_namespaces - the list of the namespaces inwhich the
                                       subordinate instances are stored.
             self.stores - instances of the subordinate crash stores
+            self.save_executors - the pools of threads of the subordinate
+                                  crash stores for saving in parallel, by
+                                  namespace, None when saving sequentially
 
         """
         super(PolyCrashStorage, self).__init__(config, quit_check_callback)
@@ -519,6 +592,24 @@ class PolyCrashStorage(CrashStorageBase):
                                       config[a_namespace],
                                       quit_check_callback
                                  )
+        if config.get('number_of_save_threads'):
+            # each store has its own pool, so a store that hangs only holds
+            # up its own saves.  The pools are shared by every thread that
+            # uses this instance, so they bound the number of saves in
+            # flight to each store across all of them.  Pooled connection
+            # contexts key their connections by thread name, so each thread
+            # of a pool gets its own connections.
+            self.save_executors = dict(
+                (
+                    a_namespace,
+                    futures.ThreadPoolExecutor(
+                        max_workers=config.number_of_save_threads
+                    )
+                )
+                for a_namespace in self.storage_namespaces
+            )
+        else:
+            self.save_executors = None
 
     def close(self):
         """iterate through the subordinate crash stores and close them.
@@ -531,6 +622,9 @@ class PolyCrashStorage(CrashStorageBase):
           PolyStorageError - an exception container holding a list of the
                              exceptions raised by the subordinate storage
                              systems"""
+        if self.save_executors is not None:
+            for an_executor in self.save_executors.itervalues():
+                an_executor.shutdown(wait=True)
         storage_exception = PolyStorageError()
         for a_store in self.stores.itervalues():
             try:
@@ -551,14 +645,15 @@ class PolyCrashStorage(CrashStorageBase):
             dumps - a mapping of dump name keys to dump binary values
             crash_id - the id of the crash to use"""
         storage_exception = PolyStorageError()
-        for a_store in self.stores.itervalues():
-            self.quit_check()
-            try:
-                a_store.save_raw_crash(raw_crash, dumps, crash_id)
-            except Exception as x:
-                self.logger.error('%s failure: %s', a_store.__class__,
-                                  str(x))
-                storage_exception.gather_current_exception()
+        with shared_serializations({}):
+            for a_store in self.stores.itervalues():
+                self.quit_check()
+                try:
+                    a_store.save_raw_crash(raw_crash, dumps, crash_id)
+                except Exception as x:
+                    self.logger.error('%s failure: %s', a_store.__class__,
+                                      str(x))
+                    storage_exception.gather_current_exception()
         if storage_exception.has_exceptions():
             raise storage_exception
 
@@ -569,66 +664,214 @@ class PolyCrashStorage(CrashStorageBase):
         parameters:
             processed_crash - a mapping containing the processed crash"""
         storage_exception = PolyStorageError()
-        for a_store in self.stores.itervalues():
-            self.quit_check()
-            try:
-                a_store.save_processed(processed_crash)
-            except Exception as x:
-                self.logger.error('%s failure: %s', a_store.__class__,
-                                  str(x), exc_info=True)
-                storage_exception.gather_current_exception()
+        with shared_serializations({}):
+            for a_store in self.stores.itervalues():
+                self.quit_check()
+                try:
+                    a_store.save_processed(processed_crash)
+                except Exception as x:
+                    self.logger.error('%s failure: %s', a_store.__class__,
+                                      str(x), exc_info=True)
+                    storage_exception.gather_current_exception()
         if storage_exception.has_exceptions():
             raise storage_exception
 
     def save_raw_and_processed(self, raw_crash, dump, processed_crash,
                                crash_id):
-        storage_exception = PolyStorageError()
+        """save the crash to each of the subordinate crash stores.  Depending
+        on the 'number_of_save_threads' configuration, the stores are saved
+        to one after another or all at once in parallel.  Either way, every
+        store gets its chance to save and the failures of all of them are
+        raised together in a PolyStorageError.  The stores that serialize
+        the crash the same way share the serialization."""
+        serializations = {}
+        if self.save_executors is None:
+            self._save_raw_and_processed_sequentially(
+                raw_crash,
+                dump,
+                processed_crash,
+                crash_id,
+                serializations
+            )
+        else:
+            self._save_raw_and_processed_in_parallel(
+                raw_crash,
+                dump,
+                processed_crash,
+                crash_id,
+                serializations
+            )
 
-        # Later we're going to need to clone this per every crash storage
-        # in the loop. But, to save time, before we do that, convert the
-        # processed crash which is a SocorroDotDict into a pure python
-        # dict which we can more easily copy.deepcopy() operate on.
-        processed_crash_as_dict = socorrodotdict_to_dict(processed_crash)
-        raw_crash_as_dict = socorrodotdict_to_dict(raw_crash)
+    @staticmethod
+    def _crash_copies_for_store(a_store, raw_crash, processed_crash):
+        """stores that change the crash while saving it get their own copies
+        of it so that the changes are not seen by the other stores.  The
+        copies are copy-on-write views for the stores that touch only a few
+        keys and deep copies for the others."""
+        actual_store = getattr(a_store, 'wrapped_object', a_store)
+
+        if not (
+            hasattr(actual_store, 'is_mutator') and actual_store.is_mutator()
+        ):
+            return raw_crash, processed_crash
+        if (
+            hasattr(actual_store, 'mutates_few_keys') and
+            actual_store.mutates_few_keys()
+        ):
+            return (
+                CopyOnWriteDotDict(raw_crash),
+                CopyOnWriteDotDict(processed_crash)
+            )
+        # We do this because `a_store.save_raw_and_processed` expects the
+        # processed crash to be a DotDict but you can't deepcopy those, so
+        # we deepcopy the pure dict version and then dress it back up as a
+        # DotDict.
+        return (
+            SocorroDotDict(copy.deepcopy(socorrodotdict_to_dict(raw_crash))),
+            SocorroDotDict(
+                copy.deepcopy(socorrodotdict_to_dict(processed_crash))
+            )
+        )
 
+    @staticmethod
+    def _save_to_store(
+        a_store,
+        raw_crash,
+        dump,
+        processed_crash,
+        crash_id,
+        serializations,
+        started=None
+    ):
+        if started is not None:
+            started.start_time = time.time()
+            started.set()
+        with shared_serializations(serializations):
+            a_store.save_raw_and_processed(
+                raw_crash,
+                dump,
+                processed_crash,
+                crash_id
+            )
+
+    def _log_store_failure(self, a_store, crash_id):
+        store_class = getattr(
+            a_store, 'wrapped_object', a_store.__class__
+        )
+        self.logger.error(
+            '%r failed (crash id: %s)',
+            store_class,
+            crash_id,
+            exc_info=True
+        )
+
+    def _save_raw_and_processed_sequentially(
+        self,
+        raw_crash,
+        dump,
+        processed_crash,
+        crash_id,
+        serializations
+    ):
+        storage_exception = PolyStorageError()
         for a_store in self.stores.itervalues():
             self.quit_check()
             try:
-                actual_store = getattr(a_store, 'wrapped_object', a_store)
-
-                if hasattr(actual_store, 'is_mutator') and actual_store.is_mutator():
-                    # We do this because `a_store.save_raw_and_processed`
-                    # expects the processed crash to be a DotDict but
-                    # you can't deepcopy those, so we deepcopy the
-                    # pure dict version and then dress it back up as a
-                    # DotDict.
-                    my_processed_crash = SocorroDotDict(
-                        copy.deepcopy(processed_crash_as_dict)
+                my_raw_crash, my_processed_crash = \
+                    self._crash_copies_for_store(
+                        a_store,
+                        raw_crash,
+                        processed_crash
                     )
-                    my_raw_crash = SocorroDotDict(
-                        copy.deepcopy(raw_crash_as_dict)
-                    )
-                else:
-                    my_processed_crash = processed_crash
-                    my_raw_crash = raw_crash
-
-                a_store.save_raw_and_processed(
+                self._save_to_store(
+                    a_store,
                     my_raw_crash,
                     dump,
                     my_processed_crash,
-                    crash_id
+                    crash_id,
+                    serializations
                 )
             except Exception:
-                store_class = getattr(
-                    a_store, 'wrapped_object', a_store.__class__
-                )
+                self._log_store_failure(a_store, crash_id)
+                storage_exception.gather_current_exception()
+        if storage_exception.has_exceptions():
+            raise storage_exception
+
+    def _save_raw_and_processed_in_parallel(
+        self,
+        raw_crash,
+        dump,
+        processed_crash,
+        crash_id,
+        serializations
+    ):
+        """submit the save for every store to its pool of threads and then
+        wait for them all.  The stores that don't mutate the crash share the
+        same raw and processed crash, so while they run at the same time,
+        none of them may change it.  A save that doesn't start, because the
+        threads of its store are all busy, or doesn't end within its timeout
+        is counted as a failure.  A save that has started cannot be stopped:
+        it keeps its thread until it is done."""
+        self.quit_check()
+        storage_exception = PolyStorageError()
+        pending_saves = []
+        for a_namespace, a_store in self.stores.iteritems():
+            try:
+                my_raw_crash, my_processed_crash = \
+                    self._crash_copies_for_store(
+                        a_store,
+                        raw_crash,
+                        processed_crash
+                    )
+                started = threading.Event()
+                pending_saves.append((
+                    a_store,
+                    started,
+                    self.save_executors[a_namespace].submit(
+                        self._save_to_store,
+                        a_store,
+                        my_raw_crash,
+                        dump,
+                        my_processed_crash,
+                        crash_id,
+                        serializations,
+                        started
+                    )
+                ))
+            except Exception:
+                self._log_store_failure(a_store, crash_id)
+                storage_exception.gather_current_exception()
+
+        # the saves waiting for a thread were all submitted together, the
+        # timeout of each one is measured from when it starts
+        start_deadline = time.time() + self.config.store_save_timeout
+        for a_store, started, a_future in pending_saves:
+            try:
+                if (
+                    not started.wait(max(start_deadline - time.time(), 0)) and
+                    a_future.cancel()
+                ):
+                    raise futures.TimeoutError(
+                        'the save did not start within %ss'
+                        % self.config.store_save_timeout
+                    )
+                started.wait()
+                a_future.result(timeout=max(
+                    started.start_time + self.config.store_save_timeout -
+                    time.time(),
+                    0
+                ))
+            except futures.TimeoutError:
                 self.logger.error(
-                    '%r failed (crash id: %s)',
-                    store_class,
+                    '%r timed out after %ss (crash id: %s)',
+                    getattr(a_store, 'wrapped_object', a_store.__class__),
+                    self.config.store_save_timeout,
                     crash_id,
-                    exc_info=True
                 )
                 storage_exception.gather_current_exception()
+            except Exception:
+                self._log_store_failure(a_store, crash_id)
+                storage_exception.gather_current_exception()
         if storage_exception.has_exceptions():
             raise storage_exception
 
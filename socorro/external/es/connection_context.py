@@ -2,12 +2,117 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import collections
 import contextlib
+import logging
+import threading
+import time
+
 import elasticsearch
+from elasticsearch.compat import string_types
 
 from configman import Namespace, RequiredConfig
 from configman.converters import list_converter
 
+from socorro.lib.serializers import iso_serializer
+
+
+logger = logging.getLogger(__name__)
+
+
+class JSONSerializer(elasticsearch.serializer.JSONSerializer):
+    """The serializer of the requests to Elasticsearch, on the fast path of
+    the crash stores.
+
+    The functions in `hooks` are called with every mapping that is serialized
+    and a dict of the number of bytes each of its values takes in the request
+    body.  Those sizes are those of the body that is actually sent, a mapping
+    is serialized one value at a time when there are hooks."""
+
+    def __init__(self):
+        self.hooks = []
+
+    def _dumps(self, data):
+        try:
+            return iso_serializer.dumps(data)
+        except TypeError:
+            # what the elasticsearch client knows how to serialize, or
+            # its error
+            return super(JSONSerializer, self).dumps(data)
+
+    def dumps(self, data):
+        if isinstance(data, string_types):
+            return data
+        if not self.hooks or not isinstance(data, collections.Mapping):
+            return self._dumps(data)
+
+        sizes = {}
+        members = []
+        for key, value in data.iteritems():
+            value_as_string = self._dumps(value)
+            sizes[key] = len(value_as_string)
+            if not isinstance(key, string_types):
+                key = str(key)
+            members.append('%s:%s' % (self._dumps(key), value_as_string))
+        for hook in self.hooks:
+            hook(data, sizes)
+        return '{%s}' % ','.join(members)
+
+
+class KnownIndices(object):
+    """The names of the indices of an Elasticsearch cluster, and of their
+    aliases, as of the last refresh.  The indices created since are added by
+    who created them, the list is refreshed when it is older than
+    refresh_interval seconds and it is asked which indices exist.  If the
+    refresh fails, the previous list is kept until the next refresh, and
+    without a list all the indices are taken to exist."""
+
+    def __init__(self, refresh_interval):
+        self.refresh_interval = refresh_interval
+        self.names = set()
+        self._refreshed = False
+        self._next_refresh_time = 0
+        self._lock = threading.Lock()
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def add(self, name):
+        with self._lock:
+            self.names.add(name)
+
+    def refresh(self, es_context):
+        names = set()
+        for index, index_data in es_context.indices_client().get_aliases().items():
+            names.add(index)
+            names.update(index_data.get('aliases', {}))
+        with self._lock:
+            self.names = names
+            self._refreshed = True
+            self._next_refresh_time = time.time() + self.refresh_interval
+
+    def existing(self, es_context, indices):
+        """returns the indices of the list that exist"""
+        if time.time() >= self._next_refresh_time:
+            try:
+                self.refresh(es_context)
+            except Exception:
+                logger.warning(
+                    'could not get the list of the indices', exc_info=True
+                )
+                # not tried again on every query while the cluster fails
+                self._next_refresh_time = time.time() + self.refresh_interval
+        if not self._refreshed:
+            # the queries find out which indices are missing
+            return list(indices)
+        return [index for index in indices if index in self.names]
+
+
+# the KnownIndices of each cluster, by their urls, shared by the connection
+# contexts of the process
+_known_indices = {}
+_known_indices_lock = threading.Lock()
+
 
 class Connection(object):
     """A facade in front of the ES class that standardises certain gross
@@ -72,6 +177,13 @@ class ConnectionContext(RequiredConfig):
         doc='the default doctype to use in elasticsearch',
         reference_value_from='resource.elasticsearch',
     )
+    required_config.add_option(
+        'known_indices_refresh_interval',
+        default=60,
+        doc='the number of seconds the list of the existing indices is used '
+            'before it is asked again to elasticsearch',
+        reference_value_from='resource.elasticsearch',
+    )
     required_config.add_option(
         name='elasticsearch_connection_wrapper_class',
         default=Connection,
@@ -89,6 +201,12 @@ class ConnectionContext(RequiredConfig):
     def __init__(self, config):
         super(ConnectionContext, self).__init__()
         self.config = config
+        self.serializer = JSONSerializer()
+        with _known_indices_lock:
+            self.known_indices = _known_indices.setdefault(
+                tuple(config.elasticsearch_urls),
+                KnownIndices(config.known_indices_refresh_interval)
+            )
 
     def connection(self, name=None, timeout=None):
         """Returns an instance of elasticsearch-py's Elasticsearch class as
@@ -104,7 +222,8 @@ class ConnectionContext(RequiredConfig):
                 hosts=self.config.elasticsearch_urls,
                 timeout=timeout,
                 connection_class=\
-                    elasticsearch.connection.RequestsHttpConnection
+                    elasticsearch.connection.RequestsHttpConnection,
+                serializer=self.serializer
             )
         )
 
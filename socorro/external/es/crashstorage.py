@@ -2,7 +2,6 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-import json
 import re
 from threading import Thread
 from Queue import Queue
@@ -14,7 +13,7 @@ from configman.converters import class_converter, list_converter
 
 from socorro.external.crashstorage_base import CrashStorageBase
 from socorro.lib.converters import change_default
-from socorro.lib.datetimeutil import JsonDTEncoder, string_to_datetime
+from socorro.lib.datetimeutil import string_to_datetime
 from socorro.external.crashstorage_base import Redactor
 
 
@@ -79,10 +78,6 @@ class ESCrashStorage(CrashStorageBase):
         reference_value_from='resource.elasticsearch',
     )
 
-    # This cache reduces attempts to create indices, thus lowering overhead
-    # each time a document is indexed.
-    indices_cache = set()
-
     # These regex will catch field names from Elasticsearch exceptions. They
     # have been tested with Elasticsearch 1.4.
     field_name_string_error_re = re.compile(r'field=\"([\w\-.]+)\"')
@@ -100,6 +95,11 @@ class ESCrashStorage(CrashStorageBase):
         self.es_context = self.config.elasticsearch.elasticsearch_class(
             config=self.config.elasticsearch
         )
+        self.es_context.serializer.hooks.append(self._capture_crash_sizes)
+        # The indices known to exist, they don't need to be created. This
+        # reduces attempts to create indices, thus lowering overhead each time
+        # a document is indexed.
+        self.indices_cache = self.es_context.known_indices
 
         self.transaction = config.transaction_executor_class(
             config,
@@ -130,40 +130,43 @@ class ESCrashStorage(CrashStorageBase):
         usage.
         """
 
+        # The datetimes of the processed crash and the bad keys of the raw
+        # crash are top level keys, shallow copies keep them as they are for
+        # the other crash stores.
         crash_document = {
             'crash_id': crash_id,
-            'processed_crash': processed_crash,
-            'raw_crash': raw_crash
+            'processed_crash': dict(processed_crash),
+            'raw_crash': dict(raw_crash)
         }
 
-        # NOTE(willkg): this is a hard-coded keyname to match what the statsdbenchmarkingwrapper
-        # produces for processor crashstorage classes. This is only used in that context, so we're
-        # hard-coding this now rather than figuring out a better way to carry that name through.
-        try:
-            self.config.metrics.histogram(
-                'processor.es.raw_crash_size',
-                len(json.dumps(raw_crash, cls=JsonDTEncoder))
-            )
-        except Exception:
-            # NOTE(willkg): An error here shouldn't screw up saving data. Log it so we can fix it
-            # later.
-            self.config.logger.exception('something went wrong when capturing raw_crash_size')
-
-        try:
-            self.config.metrics.histogram(
-                'processor.es.processed_crash_size',
-                len(json.dumps(processed_crash, cls=JsonDTEncoder))
-            )
-        except Exception:
-            # NOTE(willkg): An error here shouldn't screw up saving data. Log it so we can fix it
-            # later.
-            self.config.logger.exception('something went wrong when capturing raw_crash_size')
-
         self.transaction(
             self._submit_crash_to_elasticsearch,
             crash_document=crash_document
         )
 
+    def _capture_crash_sizes(self, document, sizes):
+        """serializer hook recording the sizes of the raw and processed crashes
+        of a crash document, as they are in the body sent to Elasticsearch"""
+        if 'raw_crash' not in sizes or 'processed_crash' not in sizes:
+            # not a crash document
+            return
+
+        # NOTE(willkg): this is a hard-coded keyname to match what the statsdbenchmarkingwrapper
+        # produces for processor crashstorage classes. This is only used in that context, so we're
+        # hard-coding this now rather than figuring out a better way to carry that name through.
+        for name in ('raw_crash', 'processed_crash'):
+            try:
+                self.config.metrics.histogram(
+                    'processor.es.%s_size' % name,
+                    sizes[name]
+                )
+            except Exception:
+                # NOTE(willkg): An error here shouldn't screw up saving data. Log it so we can fix
+                # it later.
+                self.config.logger.exception(
+                    'something went wrong when capturing %s_size', name
+                )
+
     @staticmethod
     def reconstitute_datetimes(processed_crash):
         datetime_fields = [
@@ -230,6 +233,7 @@ class ESCrashStorage(CrashStorageBase):
         if es_index not in self.indices_cache:
             index_creator = self.config.index_creator_class(config=self.config)
             index_creator.create_socorro_index(es_index)
+            self.indices_cache.add(es_index)
 
         # Submit the crash for indexing.
         # Don't retry more than 5 times. That is to avoid infinite loops in
@@ -284,6 +288,9 @@ class ESCrashStorage(CrashStorageBase):
                         # of the field that we want to remove from `parent`.
                         del parent[field]
                     else:
+                        # The mappings on the way are copied, they may be
+                        # shared with the other crash stores.
+                        parent[field] = dict(parent[field])
                         parent = parent[field]
 
                 # Add a note in the document that a field has been removed.
@@ -349,6 +356,12 @@ class ESCrashStorageRedactedSave(ESCrashStorage):
         # This crash storage mutates the crash, so we mark it as such.
         return True
 
+    def mutates_few_keys(self):
+        # The redaction drops the biggest parts of the crash before the rest
+        # is serialized, so copy-on-write views are much cheaper than deep
+        # copies, see scripts/benchmark_crash_copies.py.
+        return True
+
     def save_raw_and_processed(self, raw_crash, dumps, processed_crash,
                                crash_id):
         """This is the only write mechanism that is actually employed in normal
@@ -511,6 +524,7 @@ def _create_bulk_load_crashstore(base_class):
                     config=self.config
                 )
                 index_creator.create_socorro_index(es_index)
+                self.indices_cache.add(es_index)
 
             action = {
                 '_index': es_index,
@@ -7,8 +7,10 @@ import sys
 import re
 from collections import defaultdict
 
+from elasticsearch import helpers
 from elasticsearch.exceptions import NotFoundError, RequestError
 from elasticsearch_dsl import A, F, Q, Search
+from elasticsearch_dsl.result import Response, Result
 from socorro.lib import (
     BadArgumentError,
     MissingArgumentError,
@@ -86,25 +88,25 @@ class SuperSearch(SearchBase):
             field_data['in_database_name'],
         )
 
-    def format_field_names(self, hit):
+    def format_field_names(self, hit, request_columns):
         """Return a hit with each field's database name replaced by its
         exposed name. """
         new_hit = {}
-        for field_name in self.request_columns:
+        for field_name in request_columns:
             field = self.all_fields[field_name]
             database_field_name = self.get_full_field_name(field)
             new_hit[field_name] = hit.get(database_field_name)
 
         return new_hit
 
-    def format_fields(self, hit):
+    def format_fields(self, hit, request_columns):
         """Return a well formatted document.
 
         Elasticsearch returns values as lists when using the `fields` option.
         This function removes the list when it contains zero or one element.
         It also calls `format_field_names` to correct all the field names.
         """
-        hit = self.format_field_names(hit)
+        hit = self.format_field_names(hit, request_columns)
 
         for field in hit:
             if isinstance(hit[field], (list, tuple)):
@@ -180,12 +182,11 @@ class SuperSearch(SearchBase):
 
         return aggs
 
-    def get(self, **kwargs):
-        """Return a list of results and aggregations based on parameters.
-
-        The list of accepted parameters (with types and default values) is in
-        the database and can be accessed with the super_search_fields service.
-        """
+    def _prepare_search(self, **kwargs):
+        """Return the search object, the list of indices and the requested
+        columns of a query, and whether only the query should be returned.
+        The columns are not kept on the instance, which is shared by the
+        threads of the webapp. """
         # Require that the list of fields be passed.
         if not kwargs.get('_fields'):
             raise MissingArgumentError('_fields')
@@ -370,17 +371,22 @@ class SuperSearch(SearchBase):
 
         # We keep track of the requested columns in order to make sure we
         # return those column names and not aliases for example.
-        self.request_columns = []
+        request_columns = []
         for param in params['_columns']:
             for value in param.value:
                 if not value:
                     continue
 
-                self.request_columns.append(value)
+                request_columns.append(value)
                 field_name = self.get_field_name(value, full=False)
                 fields.append(field_name)
 
-        search = search.fields(fields)
+        if results_number:
+            search = search.fields(fields)
+        else:
+            # Only the total and the aggregations are wanted, the count
+            # search type doesn't fetch any document.
+            search = search.params(search_type='count')
 
         # Sorting.
         sort_fields = []
@@ -423,37 +429,114 @@ class SuperSearch(SearchBase):
                 histogram_intervals
             )
 
-        # Query and compute results.
-        hits = []
+        return (
+            search,
+            indices,
+            request_columns,
+            params['_return_query'][0].value[0],
+        )
+
+    def _trim_missing_indices(self, search, indices):
+        """Return the search object and the list of indices without the
+        indices known not to exist, and a missing_index error for each of
+        them. """
+        # We call elasticsearch with a computed list of indices, based on
+        # the date range. However, if that list contains indices that do not
+        # exist in elasticsearch, an error will be raised. We thus remove the
+        # indices known not to exist first.
+        errors = []
+        existing_indices = self.es_context.known_indices.existing(
+            self.es_context,
+            indices
+        )
+        if existing_indices != indices:
+            for index in indices:
+                if index not in existing_indices:
+                    errors.append({
+                        'type': 'missing_index',
+                        'index': index,
+                    })
+            indices = existing_indices
+            search = search.index().index(*indices)
+
+        return search, indices, errors
+
+    def _format_results(self, results, errors, request_columns):
+        """Return the hits, total and aggregations of an elasticsearch
+        response, and the errors of the query. """
+        hits = [
+            self.format_fields(hit.to_dict(), request_columns)
+            for hit in results
+        ]
+
+        # The total comes with the hits, asking for it with
+        # search.count() would run the query again.
+        total = results.hits.total
+
+        aggregations = getattr(results, 'aggregations', {})
+        if aggregations:
+            aggregations = self.format_aggregations(aggregations)
+
+        shards = getattr(results, '_shards', {})
+        if shards and shards.failed:
+            # Some shards failed. We want to explain what happened in the
+            # results, so the client can decide what to do.
+            failed_indices = defaultdict(int)
+            for failure in shards.failures:
+                failed_indices[failure.index] += 1
+
+            for index, shards_count in failed_indices.items():
+                errors.append({
+                    'type': 'shards',
+                    'index': index,
+                    'shards_count': shards_count,
+                })
+
+        return {
+            'hits': hits,
+            'total': total,
+            'facets': aggregations,
+            'errors': errors,
+        }
 
-        if params['_return_query'][0].value[0]:
+    def _empty_results(self, errors):
+        return {
+            'hits': [],
+            'total': 0,
+            'facets': {},
+            'errors': errors,
+        }
+
+    def get(self, **kwargs):
+        """Return a list of results and aggregations based on parameters.
+
+        The list of accepted parameters (with types and default values) is in
+        the database and can be accessed with the super_search_fields service.
+        """
+        search, indices, request_columns, return_query = self._prepare_search(
+            **kwargs
+        )
+
+        if return_query:
             # Return only the JSON query that would be sent to elasticsearch.
             return {
                 'query': search.to_dict(),
                 'indices': indices,
             }
 
-        errors = []
+        search, indices, errors = self._trim_missing_indices(search, indices)
 
-        # We call elasticsearch with a computed list of indices, based on
-        # the date range. However, if that list contains indices that do not
-        # exist in elasticsearch, an error will be raised. We thus want to
-        # remove all failing indices until we either have a valid list, or
-        # an empty list in which case we return no result.
+        # An index may still have been deleted since the list of the
+        # existing indices was made, we then remove all failing indices
+        # until we either have a valid list, or an empty list in which case
+        # we return no result.
         while True:
+            if not indices:
+                # There is no index left in the list, return an empty
+                # result.
+                return self._empty_results(errors)
             try:
                 results = search.execute()
-                for hit in results:
-                    hits.append(self.format_fields(hit.to_dict()))
-
-                total = search.count()
-
-                aggregations = getattr(results, 'aggregations', {})
-                if aggregations:
-                    aggregations = self.format_aggregations(aggregations)
-
-                shards = getattr(results, '_shards', {})
-
                 break  # Yay! Results!
             except NotFoundError as e:
                 missing_index = re.findall(BAD_INDEX_REGEX, e.error)[0]
@@ -470,20 +553,11 @@ class SuperSearch(SearchBase):
                     'index': missing_index,
                 })
 
-                if indices:
-                    # Update the list of indices and try again.
-                    # Note: we need to first empty the list of indices before
-                    # updating it, otherwise the removed indices never get
-                    # actually removed.
-                    search = search.index().index(*indices)
-                else:
-                    # There is no index left in the list, return an empty
-                    # result.
-                    hits = []
-                    total = 0
-                    aggregations = {}
-                    shards = None
-                    break
+                # Update the list of indices and try again.
+                # Note: we need to first empty the list of indices before
+                # updating it, otherwise the removed indices never get
+                # actually removed.
+                search = search.index().index(*indices)
             except RequestError as exception:
                 exc_type, exc_value, exc_tb = sys.exc_info()
                 # Try to handle it gracefully if we can find out what
@@ -506,26 +580,121 @@ class SuperSearch(SearchBase):
                 # rather than the actual error where it originally happened.
                 raise exc_type, exc_value, exc_tb
 
-        if shards and shards.failed:
-            # Some shards failed. We want to explain what happened in the
-            # results, so the client can decide what to do.
-            failed_indices = defaultdict(int)
-            for failure in shards.failures:
-                failed_indices[failure.index] += 1
+        return self._format_results(results, errors, request_columns)
 
-            for index, shards_count in failed_indices.items():
-                errors.append({
-                    'type': 'shards',
-                    'index': index,
-                    'shards_count': shards_count,
-                })
+    def get_batch(self, queries):
+        """Return the results of a list of queries, each one being the
+        parameters of a call to `get`, sent to elasticsearch in a single
+        multi search request.
 
-        return {
-            'hits': hits,
-            'total': total,
-            'facets': aggregations,
-            'errors': errors,
-        }
+        A query that fails in the multi search request, because of an index
+        deleted since the list of existing indices was made or of a bad
+        parameter, is run again on its own so that it fails or recovers the
+        way `get` does.
+        """
+        results = [None] * len(queries)
+        batch = []
+        for i, kwargs in enumerate(queries):
+            search, indices, request_columns, return_query = (
+                self._prepare_search(**kwargs)
+            )
+            if return_query:
+                results[i] = {
+                    'query': search.to_dict(),
+                    'indices': indices,
+                }
+                continue
+
+            search, indices, errors = self._trim_missing_indices(
+                search,
+                indices
+            )
+            if not indices:
+                results[i] = self._empty_results(errors)
+                continue
+
+            batch.append((i, search, errors, request_columns))
+
+        if not batch:
+            return results
+
+        body = []
+        for i, search, errors, request_columns in batch:
+            header = dict(search._params)
+            header['index'] = search._index
+            header['type'] = search._doc_type
+            body.append(header)
+            body.append(search.to_dict())
+
+        responses = self.get_connection().msearch(body=body)['responses']
+        for (i, search, errors, request_columns), response in zip(
+            batch, responses
+        ):
+            if 'error' in response:
+                results[i] = self.get(**queries[i])
+                continue
+
+            results[i] = self._format_results(
+                Response(response),
+                errors,
+                request_columns
+            )
+
+        return results
+
+    def iter_hits(self, **kwargs):
+        """Return an iterator over all the hits of a query, however many
+        there are. The hits are paged through with an elasticsearch scroll
+        cursor, in scan mode, which doesn't get slower as it goes deeper the
+        way `_results_offset` does. They come in no particular order.
+
+        `_results_number` is the number of hits fetched from each shard at a
+        time and cannot be 0, `_results_offset`, the sorting and the
+        aggregations are ignored. The parameters are checked before this
+        returns.
+        """
+        search, indices, request_columns, return_query = self._prepare_search(
+            **kwargs
+        )
+        if return_query:
+            raise BadArgumentError(
+                '_return_query',
+                msg='_return_query cannot be used when iterating over hits'
+            )
+        if search._params.get('search_type') == 'count':
+            # a search for 0 results doesn't ask for any field, the hits
+            # would have none of the columns
+            raise BadArgumentError(
+                '_results_number',
+                msg='_results_number cannot be 0 when iterating over hits'
+            )
+
+        search, indices, errors = self._trim_missing_indices(search, indices)
+        if not indices:
+            return iter([])
+
+        query = search.to_dict()
+        size = query.pop('size', None) or 100
+        for key in ('aggs', 'from', 'sort'):
+            query.pop(key, None)
+
+        hits = helpers.scan(
+            self.get_connection(),
+            scroll='2m',  # keep the "scroll" connection open for 2 minutes
+            index=indices,
+            doc_type=search._doc_type,
+            size=size,
+            query=query,
+        )
+
+        def format_hits():
+            for hit in hits:
+                yield self.format_fields(
+                    Result(hit).to_dict(),
+                    request_columns
+                )
+
+        return format_hits()
 
     def _create_aggregations(
         self, params, search, facets_size, histogram_intervals
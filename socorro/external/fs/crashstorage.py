@@ -25,15 +25,10 @@ from socorro.external.crashstorage_base import (
 )
 from socorro.lib.ooid import dateFromOoid, depthFromOoid
 from socorro.lib.datetimeutil import utc_now
+from socorro.lib.serializers import iso_serializer
 from socorro.lib.util import DotDict
 
 
-def dates_to_strings_for_json(obj):
-    if isinstance(obj, datetime.datetime):
-        return obj.isoformat()
-    return json.JSONEncoder.default(self, obj)
-
-
 @contextmanager
 def using_umask(n):
     old_n = os.umask(n)
@@ -197,10 +192,9 @@ class FSRadixTreeStorage(CrashStorageBase):
 
     def save_processed(self, processed_crash):
         crash_id = processed_crash['uuid']
-        processed_crash = processed_crash.copy()
         f = StringIO()
         with closing(gzip.GzipFile(mode='wb', fileobj=f)) as fz:
-            json.dump(processed_crash, fz, default=dates_to_strings_for_json)
+            fz.write(iso_serializer.dumps(processed_crash))
         self._save_files(crash_id, {
             crash_id + self.config.jsonz_file_suffix: f.getvalue()
         })
@@ -209,7 +203,7 @@ class FSRadixTreeStorage(CrashStorageBase):
         if dumps is None:
             dumps = MemoryDumpsMapping()
         files = {
-            crash_id + self.config.json_file_suffix: json.dumps(raw_crash)
+            crash_id + self.config.json_file_suffix: iso_serializer.dumps(raw_crash)
         }
         in_memory_dumps = dumps.as_memory_dumps_mapping()
         files.update(dict((self._get_dump_file_name(crash_id, fn), dump)
@@ -724,10 +718,7 @@ class TarFileWritingCrashStore(CrashStorageBase):
         self.tar_fp.close()
 
     def save_processed(self, processed_crash):
-        processed_crash_as_string = json.dumps(
-            processed_crash,
-            default=dates_to_strings_for_json
-        )
+        processed_crash_as_string = iso_serializer.dumps(processed_crash)
         crash_id = processed_crash["crash_id"]
 
         compressed_crash = StringIO()
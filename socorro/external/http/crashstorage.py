@@ -59,6 +59,14 @@ class HTTPPOSTCrashStorage(CrashStorageBase):
             quit_check_callback
         )
 
+    def is_mutator(self):
+        # The dumps are added to the raw crash, so we mark it as such.
+        return True
+
+    def mutates_few_keys(self):
+        # Only the raw crash is read, and it has no nested values to copy.
+        return True
+
     def save_raw_crash(self, raw_crash, dumps, crash_id):
         self.transaction(
             self.__class__._submit_crash_via_http_POST,
@@ -2,8 +2,9 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
-# this file defines two crash storage classes:
-# PostgreSQLBasicCrashStorage & PostgreSQLCrashStorage.
+# this file defines three crash storage classes:
+# PostgreSQLBasicCrashStorage, PostgreSQLCrashStorage &
+# PostgreSQLBatchedCrashStorage.
 
 # PostgreSQLBasicCrashStorage defines no 'get' methods and saves processed
 # crashes in a lossey form - picking only certain fields to save in the
@@ -12,8 +13,14 @@
 # PostgreSQLCrashStorage is a more complete crashstore. It saves processed
 # crashes completely as json in the 'processed_crashes' table.
 
+# PostgreSQLBatchedCrashStorage saves what PostgreSQLCrashStorage saves, but
+# buffers the crashes and saves them a batch at a time.
+
+import collections
 import datetime
-import json
+import threading
+import time
+
 from psycopg2 import ProgrammingError
 
 from socorro.external.crashstorage_base import (
@@ -25,7 +32,8 @@ from configman import (
     class_converter
 )
 from socorro.external.postgresql.connection_context import ConnectionContext
-from socorro.lib.datetimeutil import uuid_to_date, JsonDTEncoder
+from socorro.lib.datetimeutil import uuid_to_date
+from socorro.lib.serializers import database_serializer
 from socorro.external.postgresql.dbapi2_util import (
     SQLDidNotReturnSingleValue,
     single_value_sql,
@@ -144,20 +152,10 @@ class PostgreSQLBasicCrashStorage(CrashStorageBase):
         far fewer columns being passed into the parameterized query.
         """
 
-        column_list = []
-        placeholder_list = []
+        column_list = self._reports_columns()
+        placeholder_list = ['%s'] * len(column_list)
         # create a list of values to go into the reports table
-        value_list = []
-        for pro_crash_name, report_name, length in (
-            self._reports_table_mappings
-        ):
-            column_list.append(report_name)
-            placeholder_list.append('%s')
-            value = processed_crash[pro_crash_name]
-            if isinstance(value, basestring) and length:
-                    value_list.append(value[:length])
-            else:
-                value_list.append(value)
+        value_list = self._report_values(processed_crash)
 
         def print_eq(a, b):
             # Helper for UPDATE SQL clause
@@ -210,6 +208,44 @@ class PostgreSQLBasicCrashStorage(CrashStorageBase):
         report_id = single_value_sql(connection, upsert_sql, value_list)
         return report_id
 
+    def _reports_columns(self):
+        return [report_name for _, report_name, _ in self._reports_table_mappings]
+
+    def _report_values(self, processed_crash):
+        """returns the values of the reports table columns for a processed
+        crash, in the order of _reports_columns, with the strings truncated to
+        fit their columns"""
+        value_list = []
+        for pro_crash_name, report_name, length in (
+            self._reports_table_mappings
+        ):
+            value = processed_crash[pro_crash_name]
+            if isinstance(value, basestring) and length:
+                value_list.append(value[:length])
+            else:
+                value_list.append(value)
+        return value_list
+
+    def _plugin_for_crash(self, processed_crash):
+        """returns the (filename, name) of the plugin of a processed crash
+        of the plugin process type, None for any other crash"""
+        process_type = processed_crash['process_type']
+        if process_type != "plugin":
+            return None
+
+        # Bug#543776 We actually will are relaxing the non-null policy...
+        # a null filename, name, and version is OK. We'll use empty strings
+        try:
+            return (
+                processed_crash['PluginFilename'],
+                processed_crash['PluginName']
+            )
+        except KeyError as x:
+            self.config.logger.error(
+                'the crash is missing a required field: %s', str(x)
+            )
+            return None
+
     def _save_plugins(self, connection, processed_crash, report_id):
         """ Electrolysis Support - Optional - processed_crash may contain a
         ProcessType of plugin. In the future this value would be default,
@@ -218,39 +254,19 @@ class PostgreSQLBasicCrashStorage(CrashStorageBase):
             plugin - When set to plugin, the jsonDocument MUST calso contain
                      PluginFilename and PluginName
         """
-        process_type = processed_crash['process_type']
-        if not process_type:
+        plugin = self._plugin_for_crash(processed_crash)
+        if plugin is None:
             return
 
-        if process_type == "plugin":
-
-            # Bug#543776 We actually will are relaxing the non-null policy...
-            # a null filename, name, and version is OK. We'll use empty strings
-            try:
-                plugin_filename = processed_crash['PluginFilename']
-                plugin_name = processed_crash['PluginName']
-            except KeyError as x:
-                self.config.logger.error(
-                    'the crash is missing a required field: %s', str(x)
-                )
-                return
-            find_plugin_sql = ('select id from plugins '
-                               'where filename = %s '
-                               'and name = %s')
-            try:
-                single_value_sql(
-                    connection,
-                    find_plugin_sql,
-                    (plugin_filename, plugin_name)
-                )
-            except SQLDidNotReturnSingleValue:
-                insert_plugsins_sql = ("insert into plugins (filename, name) "
-                                       "values (%s, %s) returning id")
-                execute_no_results(
-                    connection,
-                    insert_plugsins_sql,
-                    (plugin_filename, plugin_name)
-                )
+        find_plugin_sql = ('select id from plugins '
+                           'where filename = %s '
+                           'and name = %s')
+        try:
+            single_value_sql(connection, find_plugin_sql, plugin)
+        except SQLDidNotReturnSingleValue:
+            insert_plugsins_sql = ("insert into plugins (filename, name) "
+                                   "values (%s, %s) returning id")
+            execute_no_results(connection, insert_plugsins_sql, plugin)
 
     @staticmethod
     def _table_suffix_for_crash_id(crash_id):
@@ -359,7 +375,7 @@ class PostgreSQLCrashStorage(PostgreSQLBasicCrashStorage):
 
         values = {
             'crash_id': crash_id,
-            'raw_crash': json.dumps(raw_crash),
+            'raw_crash': database_serializer.dumps(raw_crash),
             'date_processed': raw_crash["submitted_timestamp"]
         }
         execute_no_results(connection, upsert_sql, values)
@@ -404,8 +420,274 @@ class PostgreSQLCrashStorage(PostgreSQLBasicCrashStorage):
         """ % {'table': processed_crashes_table_name, 'uuid': crash_id}
 
         values = {
-            'processed_json': json.dumps(processed_crash, cls=JsonDTEncoder),
+            'processed_json': database_serializer.dumps(processed_crash),
             'date_processed': processed_crash["date_processed"],
             'uuid': crash_id
         }
         execute_no_results(connection, upsert_sql, values)
+
+
+class PostgreSQLBatchedCrashStorage(PostgreSQLCrashStorage):
+    """this crashstore saves the same rows as PostgreSQLCrashStorage, but
+    instead of a transaction of several upserts per crash, the crashes are
+    buffered and saved a batch at a time: one transaction per batch and one
+    merge per table of the batch.  A batch is saved when it holds
+    'batch_size' crashes, by the thread that filled it, or when its oldest
+    crash has waited for 'batch_max_age' seconds, by a flushing thread.
+
+    The rows are made when the crashes are saved, so the crashes may be
+    changed by other crashstores afterwards.  Saving a crash doesn't raise
+    the errors of the database anymore, they are logged.  If a batch fails,
+    its crashes are saved again one at a time, so that a bad crash only loses
+    itself.
+
+    Our postgres has no INSERT ... ON CONFLICT, the rows of a table are
+    inserted in a temporary table with one multi-row INSERT, the rows of the
+    table are updated from it and the rows it has that the table doesn't are
+    inserted."""
+
+    required_config = Namespace()
+    required_config.add_option(
+        'batch_size',
+        default=100,
+        doc='the number of raw and processed crashes that triggers a save to '
+            'postgres',
+    )
+    required_config.add_option(
+        'batch_max_age',
+        default=10.0,
+        doc='the number of seconds a crash may wait for its batch to be saved',
+    )
+
+    _raw_crashes_columns = ('uuid', 'raw_crash', 'date_processed')
+    _processed_crashes_columns = ('uuid', 'processed_crash', 'date_processed')
+
+    def __init__(self, config, quit_check_callback=None):
+        super(PostgreSQLBatchedCrashStorage, self).__init__(
+            config,
+            quit_check_callback=quit_check_callback
+        )
+        # crash_id -> rows, a crash saved twice in a batch is saved once with
+        # its last rows
+        self.raw_rows = collections.OrderedDict()
+        self.processed_rows = collections.OrderedDict()
+        self.oldest_save_time = None
+        self.done = False
+        self.batch_condition = threading.Condition()
+        self.flushing_thread = threading.Thread(
+            name="PostgreSQLFlushingThread",
+            target=self._flushing_thread_func
+        )
+        self.flushing_thread.daemon = True
+        self.flushing_thread.start()
+
+    def save_raw_crash(self, raw_crash, dumps, crash_id):
+        """nota bene: this function does not save the dumps in PG, only
+        the raw crash json is saved."""
+        rows = (
+            crash_id,
+            database_serializer.dumps(raw_crash),
+            raw_crash["submitted_timestamp"]
+        )
+        self._add_to_batch(self.raw_rows, crash_id, rows)
+
+    def save_processed(self, processed_crash):
+        crash_id = processed_crash['uuid']
+        rows = (
+            self._report_values(processed_crash),
+            self._plugin_for_crash(processed_crash),
+            (
+                crash_id,
+                database_serializer.dumps(processed_crash),
+                processed_crash["date_processed"]
+            )
+        )
+        self._add_to_batch(self.processed_rows, crash_id, rows)
+
+    def _add_to_batch(self, rows_by_crash_id, crash_id, rows):
+        with self.batch_condition:
+            rows_by_crash_id[crash_id] = rows
+            if self.oldest_save_time is None:
+                self.oldest_save_time = time.time()
+                self.batch_condition.notify()
+            if (
+                len(self.raw_rows) + len(self.processed_rows) <
+                self.config.batch_size
+            ):
+                return
+            batch = self._take_batch()
+        self._save_batch(*batch)
+
+    def _take_batch(self):
+        """empties the batch and returns what it held, to be called with the
+        batch_condition held"""
+        batch = (self.raw_rows, self.processed_rows)
+        self.raw_rows = collections.OrderedDict()
+        self.processed_rows = collections.OrderedDict()
+        self.oldest_save_time = None
+        return batch
+
+    def _wait_for_old_batch(self):
+        """returns a batch whose oldest crash has waited batch_max_age
+        seconds, None once closed"""
+        with self.batch_condition:
+            while not self.done:
+                if self.oldest_save_time is None:
+                    self.batch_condition.wait()
+                    continue
+                wait_time = (
+                    self.oldest_save_time + self.config.batch_max_age -
+                    time.time()
+                )
+                if wait_time > 0:
+                    self.batch_condition.wait(wait_time)
+                    continue
+                return self._take_batch()
+            return None
+
+    def _flushing_thread_func(self):
+        while True:
+            batch = self._wait_for_old_batch()
+            if batch is None:
+                break
+            self._save_batch(*batch)
+
+    def close(self):
+        with self.batch_condition:
+            self.done = True
+            self.batch_condition.notify()
+        self.flushing_thread.join()
+        with self.batch_condition:
+            batch = self._take_batch()
+        self._save_batch(*batch)
+        super(PostgreSQLBatchedCrashStorage, self).close()
+
+    def _save_batch(self, raw_rows, processed_rows):
+        if not raw_rows and not processed_rows:
+            return
+        try:
+            self.transaction(
+                self._save_batch_transaction,
+                raw_rows,
+                processed_rows
+            )
+            return
+        except Exception:
+            self.config.logger.warning(
+                'saving a batch of %d raw and %d processed crashes failed, '
+                'saving them one at a time',
+                len(raw_rows),
+                len(processed_rows),
+                exc_info=True
+            )
+        crash_ids = list(raw_rows)
+        crash_ids.extend(
+            crash_id for crash_id in processed_rows if crash_id not in raw_rows
+        )
+        for crash_id in crash_ids:
+            raw_rows_of_crash = {}
+            if crash_id in raw_rows:
+                raw_rows_of_crash[crash_id] = raw_rows[crash_id]
+            processed_rows_of_crash = {}
+            if crash_id in processed_rows:
+                processed_rows_of_crash[crash_id] = processed_rows[crash_id]
+            try:
+                self.transaction(
+                    self._save_batch_transaction,
+                    raw_rows_of_crash,
+                    processed_rows_of_crash
+                )
+            except Exception:
+                self.config.logger.error(
+                    'could not save %s to postgres',
+                    crash_id,
+                    exc_info=True
+                )
+
+    def _rows_by_table_suffix(self, rows_by_crash_id):
+        rows_by_suffix = collections.defaultdict(list)
+        for crash_id, rows in rows_by_crash_id.iteritems():
+            rows_by_suffix[self._table_suffix_for_crash_id(crash_id)].append(
+                rows
+            )
+        return rows_by_suffix
+
+    def _save_batch_transaction(self, connection, raw_rows, processed_rows):
+        for suffix, rows in sorted(
+            self._rows_by_table_suffix(raw_rows).iteritems()
+        ):
+            self._merge_rows(
+                connection,
+                'raw_crashes_%s' % suffix,
+                self._raw_crashes_columns,
+                rows
+            )
+
+        plugins = set()
+        for suffix, rows in sorted(
+            self._rows_by_table_suffix(processed_rows).iteritems()
+        ):
+            self._merge_rows(
+                connection,
+                'reports_%s' % suffix,
+                self._reports_columns(),
+                [report_values for report_values, _, _ in rows]
+            )
+            self._merge_rows(
+                connection,
+                'processed_crashes_%s' % suffix,
+                self._processed_crashes_columns,
+                [processed_values for _, _, processed_values in rows]
+            )
+            plugins.update(plugin for _, plugin, _ in rows if plugin)
+        if plugins:
+            self._insert_plugins(connection, sorted(plugins))
+
+    @staticmethod
+    def _values_sql(cursor, rows):
+        placeholders = '(%s)' % ', '.join(['%s'] * len(rows[0]))
+        return ',\n'.join(cursor.mogrify(placeholders, row) for row in rows)
+
+    def _merge_rows(self, connection, table, columns, rows):
+        """upserts rows into table, matching them by uuid"""
+        column_list = ', '.join(columns)
+        with connection.cursor() as a_cursor:
+            merge_sql = """
+            CREATE TEMPORARY TABLE batch_%(table)s AS
+                SELECT %(column_list)s FROM %(table)s WITH NO DATA;
+            INSERT INTO batch_%(table)s (%(column_list)s) VALUES
+                %(values)s;
+            UPDATE %(table)s SET (%(column_list)s) = (%(batch_column_list)s)
+                FROM batch_%(table)s AS batch
+                WHERE %(table)s.uuid = batch.uuid;
+            INSERT INTO %(table)s (%(column_list)s)
+                SELECT %(column_list)s FROM batch_%(table)s AS batch
+                WHERE NOT EXISTS (
+                    SELECT uuid FROM %(table)s
+                    WHERE %(table)s.uuid = batch.uuid
+                );
+            DROP TABLE batch_%(table)s;
+            """ % {
+                'table': table,
+                'column_list': column_list,
+                'batch_column_list': ', '.join(
+                    'batch.%s' % column for column in columns
+                ),
+                'values': self._values_sql(a_cursor, rows),
+            }
+            a_cursor.execute(merge_sql)
+
+    def _insert_plugins(self, connection, plugins):
+        """inserts the plugins that aren't in the plugins table yet"""
+        with connection.cursor() as a_cursor:
+            insert_plugins_sql = """
+            INSERT INTO plugins (filename, name)
+                SELECT new_plugins.filename, new_plugins.name
+                FROM (VALUES %(values)s) AS new_plugins (filename, name)
+                WHERE NOT EXISTS (
+                    SELECT id FROM plugins
+                    WHERE plugins.filename = new_plugins.filename
+                        AND plugins.name = new_plugins.name
+                );
+            """ % {'values': self._values_sql(a_cursor, plugins)}
+            a_cursor.execute(insert_plugins_sql)
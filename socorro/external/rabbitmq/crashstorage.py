@@ -2,6 +2,10 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import collections
+from functools import partial
+import time
+
 import pika
 from random import randint
 
@@ -275,6 +279,264 @@ class RabbitMQCrashStorage(CrashStorageBase):
         )
 
 
+class RabbitMQConsumerCrashStorage(RabbitMQCrashStorage):
+    """This class is a RabbitMQCrashStorage whose 'new_crashes' generator
+    consumes the queues instead of getting one crash at a time from them.
+    RabbitMQ pushes up to 'prefetch_count' crashes of each queue ahead of
+    time, they wait in memory until they are yielded.  The queues are polled
+    in a weighted order, each queue as many times per round as its weight.
+
+    The acknowledgements are sent in batches: RabbitMQ acknowledges at once
+    all the crashes delivered up to a delivery tag, so the crashes are
+    acknowledged once all the crashes delivered before them are done.  RabbitMQ
+    stops delivering from a queue once 'prefetch_count' of its crashes aren't
+    acknowledged, so when half of those of a queue are done but held back by
+    one that isn't, they are acknowledged one at a time.
+
+    The number of crashes waiting in each queue goes to the metrics every
+    'lag_metrics_interval' seconds."""
+
+    required_config = Namespace()
+    required_config.add_option(
+        'prefetch_count',
+        default=50,
+        doc='the number of crashes of each queue delivered ahead of time',
+        reference_value_from='resource.rabbitmq',
+    )
+    required_config.add_option(
+        'priority_queue_weight',
+        default=4,
+        doc='the number of times per round the priority queue is polled',
+    )
+    required_config.add_option(
+        'standard_queue_weight',
+        default=2,
+        doc='the number of times per round the standard queue is polled',
+    )
+    required_config.add_option(
+        'reprocessing_queue_weight',
+        default=1,
+        doc='the number of times per round the reprocessing queue is polled',
+    )
+    required_config.add_option(
+        'lag_metrics_interval',
+        default=60,
+        doc='the number of seconds between two reports of the number of '
+            'crashes waiting in the queues',
+    )
+
+    def __init__(self, config, quit_check_callback=None):
+        super(RabbitMQConsumerCrashStorage, self).__init__(
+            config,
+            quit_check_callback=quit_check_callback
+        )
+        self._queue_weights = collections.OrderedDict((
+            (
+                self.rabbitmq.config.priority_queue_name,
+                config.priority_queue_weight
+            ),
+            (
+                self.rabbitmq.config.standard_queue_name,
+                config.standard_queue_weight
+            ),
+            (
+                self.rabbitmq.config.reprocessing_queue_name,
+                config.reprocessing_queue_weight
+            ),
+        ))
+        self._schedule = self._weighted_schedule(self._queue_weights)
+        self._schedule_position = 0
+        self._next_lag_report_time = 0
+        self._start_consuming(None)
+
+    @staticmethod
+    def _weighted_schedule(weights):
+        """returns the order in which the queues are polled in a round, each
+        queue as many times as its weight, spread out through the round"""
+        total_weight = sum(weights.values())
+        credits = dict((queue, 0) for queue in weights)
+        schedule = []
+        for x in range(total_weight):
+            for queue, weight in weights.iteritems():
+                credits[queue] += weight
+            # the first of the queues with the most credits
+            queue = max(weights, key=lambda a_queue: credits[a_queue])
+            credits[queue] -= total_weight
+            schedule.append(queue)
+        return schedule
+
+    def _start_consuming(self, channel):
+        """forgets the deliveries of the previous channel, RabbitMQ delivers
+        the crashes that weren't acknowledged again, and consumes the queues
+        on channel"""
+        self._consumer_channel = channel
+        self._deliveries = dict(
+            (queue, collections.deque()) for queue in self._queue_weights
+        )
+        self._unacknowledged_tags = collections.deque()
+        self._done_tags = set()
+        self._tag_queues = {}
+        self.acknowledgement_token_cache.clear()
+        if channel is None:
+            return
+        channel.basic_qos(prefetch_count=self.config.prefetch_count)
+        for queue in self._queue_weights:
+            channel.basic_consume(partial(self._on_delivery, queue), queue=queue)
+
+    def _on_delivery(self, queue, channel, method_frame, header_frame, body):
+        self._deliveries[queue].append((method_frame, body))
+        self._unacknowledged_tags.append(method_frame.delivery_tag)
+        self._tag_queues[method_frame.delivery_tag] = queue
+
+    def _consume_transaction(self, connection):
+        if connection.channel is not self._consumer_channel:
+            self._start_consuming(connection.channel)
+        # receives what was delivered, without waiting
+        connection.connection.process_data_events(time_limit=0)
+        if time.time() >= self._next_lag_report_time:
+            self._next_lag_report_time = (
+                time.time() + self.config.lag_metrics_interval
+            )
+            self._report_lag(connection)
+
+    def _report_lag(self, connection):
+        for queue in self._queue_weights:
+            queue_status = connection.channel.queue_declare(
+                queue=queue,
+                durable=True,
+                passive=True
+            )
+            try:
+                self.config.metrics.gauge(
+                    'processor.rabbitmq.queue_lag',
+                    (
+                        queue_status.method.message_count +
+                        len(self._deliveries[queue])
+                    ),
+                    tags=['queue:%s' % queue]
+                )
+            except KeyError:
+                # no metrics configured
+                return
+
+    def _next_delivery(self):
+        """returns the next delivery in the weighted order of the queues,
+        None if there is none"""
+        for x in range(len(self._schedule)):
+            queue = self._schedule[self._schedule_position]
+            self._schedule_position = (
+                (self._schedule_position + 1) % len(self._schedule)
+            )
+            if self._deliveries[queue]:
+                return self._deliveries[queue].popleft()
+        return None
+
+    def new_crashes(self):
+        """This generator yields the crash_ids delivered by RabbitMQ."""
+        self._consume_acknowledgement_queue()
+        while True:
+            self.transaction(self._consume_transaction)
+            delivery = self._next_delivery()
+            # must consume ack queue before testing for end of iterator
+            # or the last job won't get ack'd
+            self._consume_acknowledgement_queue()
+            if delivery is None:
+                # there was nothing in the queues - leave the iterator
+                return
+            method_frame, body = delivery
+            if self._suppress_duplicate_jobs(body, method_frame):
+                continue
+            self.acknowledgement_token_cache[body] = method_frame
+            yield body
+
+    def _suppress_duplicate_jobs(self, crash_id, acknowledgement_token):
+        """if this crash is in the cache, then it is already in progress
+        and this is a duplicate.  It is acknowledged with the next batch,
+        True tells the caller to skip on to the next crash."""
+        if crash_id in self.acknowledgement_token_cache:
+            self.config.logger.info(
+                'duplicate job: %s is already in progress',
+                crash_id
+            )
+            self._done_tags.add(acknowledgement_token.delivery_tag)
+            return True
+        return False
+
+    def _consume_acknowledgement_queue(self):
+        """the crash_ids queued by 'ack_crash' are done, their delivery tags
+        are acknowledged in a batch"""
+        try:
+            while True:
+                crash_id_to_be_acknowledged = \
+                    self.acknowledgment_queue.get_nowait()
+                try:
+                    acknowledgement_token = \
+                        self.acknowledgement_token_cache.pop(
+                            crash_id_to_be_acknowledged
+                        )
+                except KeyError:
+                    self.config.logger.warning(
+                        'RabbitMQCrashStorage tried to acknowledge crash %s'
+                        ', which was not in the cache',
+                        crash_id_to_be_acknowledged,
+                    )
+                    continue
+                self._done_tags.add(acknowledgement_token.delivery_tag)
+        except Empty:
+            pass  # nothing more to acknowledge
+
+        if not self._done_tags:
+            return
+        try:
+            self.transaction(self._transaction_ack_crashes)
+        except Exception:
+            self.config.logger.error(
+                'RabbitMQCrashStorage unexpected failure acknowledging '
+                'crashes',
+                exc_info=True
+            )
+
+    def _transaction_ack_crashes(self, connection):
+        if connection.channel is not self._consumer_channel:
+            # the crashes were delivered on a channel that is gone, RabbitMQ
+            # delivers them again
+            self._done_tags.clear()
+            return
+        last_done_tag = None
+        while (
+            self._unacknowledged_tags and
+            self._unacknowledged_tags[0] in self._done_tags
+        ):
+            last_done_tag = self._unacknowledged_tags.popleft()
+            self._done_tags.remove(last_done_tag)
+            del self._tag_queues[last_done_tag]
+        if last_done_tag is not None:
+            connection.channel.basic_ack(
+                delivery_tag=last_done_tag,
+                multiple=True
+            )
+            self.config.logger.debug(
+                'RabbitMQCrashStorage acking up to delivery_tag %s',
+                last_done_tag
+            )
+        # a crash that takes long holds these back, acknowledge them before
+        # the prefetch limit of their queue stops its deliveries
+        done_per_queue = collections.Counter(
+            self._tag_queues[delivery_tag] for delivery_tag in self._done_tags
+        )
+        held_back_queues = set(
+            queue for queue, done_count in done_per_queue.items()
+            if done_count >= max(1, self.config.prefetch_count // 2)
+        )
+        for delivery_tag in sorted(self._done_tags):
+            if self._tag_queues[delivery_tag] not in held_back_queues:
+                continue
+            connection.channel.basic_ack(delivery_tag=delivery_tag)
+            self._unacknowledged_tags.remove(delivery_tag)
+            self._done_tags.remove(delivery_tag)
+            del self._tag_queues[delivery_tag]
+
+
 class ReprocessingRabbitMQCrashStore(RabbitMQCrashStorage):
     required_config = Namespace()
     required_config.routing_key = change_default(
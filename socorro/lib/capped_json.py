@@ -0,0 +1,318 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""An incremental json loader that caps the length of chosen arrays.
+
+A json document is read from a file object a chunk at a time.  The arrays
+named in the caps only keep their first elements, the rest are skipped over
+without ever being decoded, so the memory taken by loading a document depends
+on the caps rather than on the size of the document.  What was cut is
+recorded so that it can be reported.
+
+Caps are given as a mapping of paths to the maximum number of elements to
+keep.  A path is a tuple of object keys, with '*' standing for every element
+of an array:
+
+    {
+        ('threads',): 500,
+        ('threads', '*', 'frames'): 100,
+    }
+
+Only the objects and arrays leading to a capped array are parsed here, the
+values below them are handed to ujson whole.  A capped array of modest size
+is handed to ujson whole too and cut afterwards, only an array bigger than
+bulk_size characters is taken apart element by element."""
+
+import re
+
+import ujson
+
+
+_STRING = r'"[^"\\]*(?:\\.[^"\\]*)*"'
+_PLAIN = r'[^"{}\[\]]+'
+_FLAT_OBJECT = r'\{[^"{}\[\]]*(?:%s[^"{}\[\]]*)*\}' % _STRING
+
+_NOT_WHITESPACE_RE = re.compile(r'\S')
+_STRING_RE = re.compile(_STRING)
+# everything up to the next bracket, skipping over the objects that contain
+# no other objects or arrays, or up to a string cut by the end of the buffer
+_SKIPPABLE_RE = re.compile(
+    r'(?:%s|%s|%s)*' % (_PLAIN, _STRING, _FLAT_OBJECT)
+)
+_SCALAR_RE = re.compile(r'[^\s,\]}]*')
+
+# returned by CappedJSONParser._dropped_element to leave nothing in place of a
+# dropped element
+DROP = object()
+
+
+class CappedJSONParser(object):
+    """parses a single json document from a file object.  Subclasses may
+    override _keep_beyond_cap and _dropped_element to keep some of the
+    elements past the cap of an array, or to leave something in their
+    place."""
+
+    def __init__(self, caps, chunk_size=65536, bulk_size=1048576):
+        self.caps = dict(caps)
+        self.chunk_size = chunk_size
+        self.bulk_size = bulk_size
+        # the paths that lead to a capped array must be parsed here
+        self._parsed_paths = set()
+        for a_path in self.caps:
+            for length in range(len(a_path) + 1):
+                self._parsed_paths.add(tuple(a_path[:length]))
+
+    def load(self, fp):
+        """returns the document read from fp.  The arrays that were cut are
+        listed in self.truncations as (location, total, kept) tuples, where
+        location is a tuple of the keys and indexes of the array."""
+        self.fp = fp
+        self.buffer = ''
+        self.pos = 0
+        self.mark = None
+        self.eof = False
+        self.truncations = []
+        self.root = None
+        value = self._parse_value((), ())
+        # anything but whitespace after the document is an error.  Only what
+        # has already been read is checked, the document is complete.
+        if _NOT_WHITESPACE_RE.search(self.buffer, self.pos):
+            raise ValueError('Trailing data')
+        return value
+
+    def _keep_beyond_cap(self, pattern, location, index):
+        """decides if the element at index, past the cap, of the capped array
+        at location is kept anyway"""
+        return False
+
+    def _dropped_element(self, pattern, location, index):
+        """returns what takes the place of a dropped element in its array,
+        or DROP for nothing at all"""
+        return DROP
+
+    def _fill(self):
+        """reads the next chunk.  The text before self.pos is dropped unless
+        it is being captured from self.mark.  Returns False at the end of the
+        input."""
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not isinstance(chunk, basestring):
+            raise TypeError('Expected String or Unicode')
+        if not chunk:
+            self.eof = True
+            return False
+        keep_from = self.pos if self.mark is None else self.mark
+        self.buffer = self.buffer[keep_from:] + chunk
+        self.pos -= keep_from
+        if self.mark is not None:
+            self.mark = 0
+        return True
+
+    def _next_char(self):
+        """skips whitespace and returns the next character, which is not
+        consumed"""
+        while True:
+            match = _NOT_WHITESPACE_RE.search(self.buffer, self.pos)
+            if match:
+                self.pos = match.start()
+                return self.buffer[self.pos]
+            self.pos = len(self.buffer)
+            if not self._fill():
+                raise ValueError('Unexpected end of input')
+
+    def _expect(self, a_char):
+        found = self._next_char()
+        if found != a_char:
+            raise ValueError(
+                'Expected %r at position %d, found %r' %
+                (a_char, self.pos, found)
+            )
+        self.pos += 1
+
+    def _end_of(self, closing):
+        """consumes the separator after a member of an object or an element
+        of an array, returns True if it is the closing bracket"""
+        separator = self._next_char()
+        self.pos += 1
+        if separator == closing:
+            return True
+        if separator != ',':
+            raise ValueError(
+                'Expected %r or %r at position %d' %
+                (',', closing, self.pos - 1)
+            )
+        return False
+
+    def _skip_string(self):
+        while True:
+            match = _STRING_RE.match(self.buffer, self.pos)
+            if match:
+                self.pos = match.end()
+                return
+            if not self._fill():
+                raise ValueError('Unterminated string')
+
+    def _skip_value(self, size_limit=None):
+        """moves past the next value without decoding it.  With a size_limit,
+        it gives up and returns False once more than that many characters
+        from self.mark would have to be kept."""
+        first = self._next_char()
+        if first == '"':
+            self._skip_string()
+        elif first in '{[':
+            self.pos += 1
+            depth = 1
+            while depth:
+                self.pos = _SKIPPABLE_RE.match(self.buffer, self.pos).end()
+                if size_limit and self.pos - self.mark > size_limit:
+                    return False
+                if self.pos == len(self.buffer):
+                    if not self._fill():
+                        raise ValueError('Unexpected end of input')
+                    continue
+                found = self.buffer[self.pos]
+                if found == '"':
+                    # a string cut by the end of the chunk
+                    self._skip_string()
+                    continue
+                self.pos += 1
+                if found in '{[':
+                    depth += 1
+                else:
+                    depth -= 1
+        else:
+            while True:
+                match = _SCALAR_RE.match(self.buffer, self.pos)
+                if match.end() < len(self.buffer) or not self._fill():
+                    break
+            if match.end() == self.pos:
+                raise ValueError(
+                    'Unexpected %r at position %d' % (first, self.pos)
+                )
+            self.pos = match.end()
+        return True
+
+    def _decode_value(self):
+        self._next_char()
+        self.mark = self.pos
+        try:
+            self._skip_value()
+            text = self.buffer[self.mark:self.pos]
+        finally:
+            self.mark = None
+        return ujson.loads(text)
+
+    def _parse_value(self, pattern, location):
+        if pattern in self._parsed_paths:
+            first = self._next_char()
+            if first == '{':
+                return self._parse_object(pattern, location)
+            if first == '[':
+                if (
+                    pattern in self.caps and
+                    pattern + ('*',) not in self._parsed_paths
+                ):
+                    return self._parse_capped_array_of_values(
+                        pattern,
+                        location
+                    )
+                return self._parse_array(pattern, location)
+        return self._decode_value()
+
+    def _parse_object(self, pattern, location):
+        self._expect('{')
+        an_object = {}
+        if self.root is None:
+            # the subclasses may look at what has been parsed so far
+            self.root = an_object
+        if self._next_char() == '}':
+            self.pos += 1
+            return an_object
+        while True:
+            if self._next_char() != '"':
+                raise ValueError('Expected a key at position %d' % self.pos)
+            key = self._decode_value()
+            self._expect(':')
+            an_object[key] = self._parse_value(
+                pattern + (key,),
+                location + (key,)
+            )
+            if self._end_of('}'):
+                return an_object
+
+    def _parse_array(self, pattern, location):
+        """parses an array element by element, capping it if it is capped"""
+        self._expect('[')
+        an_array = []
+        if self._next_char() == ']':
+            self.pos += 1
+            return an_array
+        cap = self.caps.get(pattern)
+        element_pattern = pattern + ('*',)
+        index = 0
+        kept = 0
+        while True:
+            if (
+                cap is None or
+                index < cap or
+                self._keep_beyond_cap(pattern, location, index)
+            ):
+                an_array.append(
+                    self._parse_value(element_pattern, location + (index,))
+                )
+                kept += 1
+            else:
+                self._skip_value()
+                self._drop(an_array, pattern, location, index)
+            index += 1
+            if self._end_of(']'):
+                break
+        if kept < index:
+            self.truncations.append((location, index, kept))
+        return an_array
+
+    def _parse_capped_array_of_values(self, pattern, location):
+        """a capped array whose elements are all decoded by ujson"""
+        self.mark = self.pos
+        try:
+            if self._skip_value(self.bulk_size):
+                text = self.buffer[self.mark:self.pos]
+            else:
+                # too big to be decoded whole, start again from the top
+                self.pos = self.mark
+                text = None
+        finally:
+            self.mark = None
+        if text is None:
+            return self._parse_array(pattern, location)
+
+        values = ujson.loads(text)
+        cap = self.caps[pattern]
+        if len(values) <= cap:
+            return values
+        an_array = values[:cap]
+        kept = cap
+        for index in xrange(cap, len(values)):
+            if self._keep_beyond_cap(pattern, location, index):
+                an_array.append(values[index])
+                kept += 1
+            else:
+                self._drop(an_array, pattern, location, index)
+        if kept < len(values):
+            self.truncations.append((location, len(values), kept))
+        return an_array
+
+    def _drop(self, an_array, pattern, location, index):
+        replacement = self._dropped_element(pattern, location, index)
+        if replacement is not DROP:
+            an_array.append(replacement)
+
+
+def load(fp, caps, chunk_size=65536):
+    """returns a tuple of the json document read from fp, with the arrays
+    capped, and the list of truncations"""
+    parser = CappedJSONParser(caps, chunk_size)
+    value = parser.load(fp)
+    return value, parser.truncations
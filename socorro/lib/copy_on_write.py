@@ -0,0 +1,122 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Copy-on-write views of crashes.
+
+A crash store that changes the crash it is given (removing sensitive keys or
+trimming the json_dump, for example) must not let those changes be seen by
+the other crash stores saving the same crash.  Deep copying the crash for
+such a store copies the whole tree, stack frames and all, even though the
+store only ever touches a handful of keys.
+
+The views in this module copy lazily instead.  A view starts out as a
+shallow copy of one level of the crash.  A nested mapping or list is only
+copied, again shallowly, when it is read from the view, and the copy
+replaces the shared original in the view.  Since every path to a nested
+value goes through a read, changes made through the view can only ever land
+in the view's own copies.  The parts of the tree that are never read stay
+shared with the original.
+
+The views of mappings are mappings, not dicts, so that even dict(view) goes
+through the reads.  The serializers of socorro.lib.serializers, and so the
+crash stores, handle them like dicts.
+
+A view is only cheap as long as most of it is never read.  A list is copied
+as soon as it is read, with a view made for every mapping and list in it,
+and toDict(), which the serializers use, reads every key of a mapping.  So
+serializing a view copies everything that is still in it, which costs about
+as much as a deep copy.  PolyCrashStorage only gives views to the crash
+stores whose mutates_few_keys() says they don't read the rest of the crash.
+"""
+
+import collections
+
+
+def copy_on_write(value):
+    """return a copy-on-write view of a mapping or a list.  Other values are
+    returned as they are."""
+    if isinstance(value, collections.Mapping):
+        return CopyOnWriteDotDict(value)
+    if isinstance(value, list):
+        return CopyOnWriteList(value)
+    return value
+
+
+class CopyOnWriteDotDict(collections.MutableMapping):
+    """a copy-on-write view of a mapping with the attribute style access of
+    socorro.lib.util.DotDict.  Changes to the view, at any depth, never
+    reach the original mapping.  It isn't a dict, so that nothing, not even
+    dict(view), can get to the shared values without going through the
+    view."""
+
+    def __init__(self, a_mapping=()):
+        object.__setattr__(self, '_values', {})
+        # the keys whose values belong to this view rather than to the
+        # original: copies made by the view and values set on the view
+        object.__setattr__(self, '_own_keys', set())
+        for key, value in dict(a_mapping).iteritems():
+            if not isinstance(value, dict) and isinstance(
+                value, collections.Mapping
+            ):
+                # the view of a view, or of a configman DotDict, is made now
+                # rather than when it is read
+                value = CopyOnWriteDotDict(value)
+                self._own_keys.add(key)
+            self._values[key] = value
+
+    def __getitem__(self, key):
+        value = self._values[key]
+        if key not in self._own_keys:
+            value = copy_on_write(value)
+            self._values[key] = value
+            self._own_keys.add(key)
+        return value
+
+    def __setitem__(self, key, value):
+        self._values[key] = value
+        self._own_keys.add(key)
+
+    def __delitem__(self, key):
+        del self._values[key]
+        self._own_keys.discard(key)
+
+    def __iter__(self):
+        return iter(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def __getattr__(self, key):
+        if key.startswith('__') or key in ('_values', '_own_keys'):
+            # keep the copy and pickle protocols working
+            raise AttributeError(key)
+        return self[key]
+
+    __setattr__ = __setitem__
+    __delattr__ = __delitem__
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, dict(self))
+
+    def copy(self):
+        return CopyOnWriteDotDict(self)
+
+    __copy__ = copy
+
+    def toDict(self):
+        # what ujson serializes instead of a mapping that isn't a dict
+        return dict(self)
+
+
+class CopyOnWriteList(list):
+    """a copy-on-write view of a list.  The list itself is copied, its
+    mappings and lists are replaced by copy-on-write views of them."""
+
+    def __init__(self, a_list=()):
+        super(CopyOnWriteList, self).__init__(
+            copy_on_write(value) for value in a_list
+        )
@@ -0,0 +1,64 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Anonymous files that live in memory (Linux memfd).
+
+A memory file has a pathname, '/proc/<pid>/fd/<fd>', that can be handed to
+an external program like the stackwalker, yet nothing is ever written to a
+file system and there is nothing to delete: the file goes away when its last
+file descriptor is closed."""
+
+import os
+import ctypes
+import ctypes.util
+
+MFD_CLOEXEC = 1
+
+_libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+try:
+    _memfd_create = _libc.memfd_create
+except AttributeError:
+    # not Linux or a glibc older than 2.27
+    _memfd_create = None
+else:
+    _memfd_create.argtypes = (ctypes.c_char_p, ctypes.c_uint)
+    _memfd_create.restype = ctypes.c_int
+
+
+def memory_files_supported():
+    return _memfd_create is not None
+
+
+class MemoryFile(object):
+    """an anonymous in memory file holding some data.  It is readable by this
+    process and its children through its pathname until it is closed."""
+
+    def __init__(self, name, data):
+        if _memfd_create is None:
+            raise NotImplementedError('memfd_create is not available')
+        # the descriptor is not inherited, children open it by its pathname
+        fd = _memfd_create(str(name), MFD_CLOEXEC)
+        if fd == -1:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.fd = fd
+        try:
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+        except Exception:
+            self.close()
+            raise
+        self.pathname = '/proc/%d/fd/%d' % (os.getpid(), fd)
+
+    def close(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,192 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Fetching ahead of the workers.
+
+The task manager queues up jobs well before a worker thread gets to them.
+A Prefetcher is told about each job as it is queued and starts fetching its
+data right away, in threads of its own.  By the time a worker takes the job,
+the data is usually there and the worker can get on with its work instead of
+waiting on the round trips to the crash storage.
+
+What has been fetched and not yet claimed by a worker is bounded twice: by
+the number of jobs fetched ahead and by their total size.  A prefetch thread
+doesn't start a fetch while the budget is spent.  Since the size of what is
+fetched is only known once it is fetched, the budget can be overrun by at
+most one fetch per thread.  A worker that claims something that hasn't
+started being fetched yet fetches it itself rather than wait."""
+
+import sys
+import Queue
+import threading
+
+
+_QUEUED = 'queued'
+_FETCHING = 'fetching'
+_DONE = 'done'
+
+_STOP = object()
+
+
+class _Entry(object):
+    def __init__(self):
+        self.state = _QUEUED
+        self.result = None
+        self.exc_info = None
+        self.size = 0
+
+
+class Prefetcher(object):
+    """fetches data for keys ahead of the time it is claimed"""
+
+    def __init__(
+        self,
+        fetch_func,
+        number_of_threads,
+        max_pending,
+        max_bytes,
+        size_func=None,
+        discard_func=None,
+        logger=None,
+    ):
+        """parameters:
+            fetch_func - the function that fetches the data for a key.  What
+                         it raises is raised again by 'claim'.
+            number_of_threads - the number of fetches run at the same time
+            max_pending - the maximum number of keys fetched or being fetched
+                          and not yet claimed
+            max_bytes - the maximum total size of what has been fetched and
+                        not yet claimed
+            size_func - returns the size in bytes of what fetch_func returned,
+                        nothing is counted without it
+            discard_func - called on what was fetched but never claimed
+            logger - where to report the failures of discard_func"""
+        self.fetch_func = fetch_func
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.size_func = size_func
+        self.discard_func = discard_func
+        self.logger = logger
+
+        self._condition = threading.Condition()
+        self._entries = {}
+        self._bytes = 0
+        self._closed = False
+        self._queue = Queue.Queue()
+        self._threads = []
+        for x in range(number_of_threads):
+            a_thread = threading.Thread(
+                name='Prefetcher%02d' % x,
+                target=self._fetch_loop
+            )
+            a_thread.daemon = True
+            a_thread.start()
+            self._threads.append(a_thread)
+
+    @property
+    def pending_bytes(self):
+        return self._bytes
+
+    def submit(self, key):
+        """start fetching the data for key.  Nothing happens if max_pending
+        keys are already pending, the data will be fetched when it is
+        claimed.  Returns True if the key is being prefetched."""
+        with self._condition:
+            if (
+                self._closed or
+                key in self._entries or
+                len(self._entries) >= self.max_pending
+            ):
+                return False
+            self._entries[key] = _Entry()
+        self._queue.put(key)
+        return True
+
+    def claim(self, key):
+        """returns the data for key, waiting for a fetch in progress to end.
+        The data is fetched here if it isn't being prefetched."""
+        with self._condition:
+            entry = self._entries.pop(key, None)
+            if entry is not None and entry.state != _QUEUED:
+                # put it back while it is being fetched so that no other
+                # fetch of it starts
+                self._entries[key] = entry
+                while entry.state == _FETCHING:
+                    self._condition.wait()
+                del self._entries[key]
+                self._bytes -= entry.size
+                # room in the budget for the prefetch threads
+                self._condition.notify_all()
+        if entry is None or entry.state == _QUEUED:
+            return self.fetch_func(key)
+        if entry.exc_info is not None:
+            exc_type, exc_value, exc_tb = entry.exc_info
+            raise exc_type, exc_value, exc_tb
+        return entry.result
+
+    def _next_entry(self, key):
+        """returns the entry of key once there is room in the budget to fetch
+        it, or None if it isn't to be fetched anymore"""
+        with self._condition:
+            while True:
+                entry = self._entries.get(key)
+                if self._closed or entry is None or entry.state != _QUEUED:
+                    # claimed, and fetched by the claimer, in the meantime
+                    return None
+                if self._bytes < self.max_bytes:
+                    entry.state = _FETCHING
+                    return entry
+                self._condition.wait()
+
+    def _fetch_loop(self):
+        while True:
+            key = self._queue.get()
+            if key is _STOP:
+                return
+            entry = self._next_entry(key)
+            if entry is None:
+                continue
+            try:
+                result = self.fetch_func(key)
+                size = self.size_func(result) if self.size_func else 0
+            except Exception:
+                result = None
+                size = 0
+                exc_info = sys.exc_info()
+            else:
+                exc_info = None
+            with self._condition:
+                entry.result = result
+                entry.exc_info = exc_info
+                entry.size = size
+                entry.state = _DONE
+                self._bytes += size
+                self._condition.notify_all()
+
+    def close(self):
+        """stop the prefetch threads and discard what was never claimed"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for a_thread in self._threads:
+            self._queue.put(_STOP)
+        for a_thread in self._threads:
+            a_thread.join()
+        with self._condition:
+            entries = self._entries.values()
+            self._entries = {}
+            self._bytes = 0
+        if self.discard_func is None:
+            return
+        for entry in entries:
+            if entry.state != _DONE or entry.exc_info is not None:
+                continue
+            try:
+                self.discard_func(entry.result)
+            except Exception:
+                if self.logger:
+                    self.logger.warning(
+                        'error discarding prefetched data',
+                        exc_info=True
+                    )
@@ -0,0 +1,334 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""This module defines a producer/consumer system where the consumers are
+separate processes rather than threads.  A single iterator thread in the
+parent process pushes jobs into an inter-process queue while a flock of
+worker processes do the jobs.
+
+Pure Python work, like that done by the processor's transform rules, is
+serialized by the GIL no matter how many threads the ThreadedTaskManager
+runs.  Worker processes each get their own interpreter and can use as many
+cores as there are processes.
+
+The arguments of a job must be picklable to cross the process boundary.  The
+one exception is the 'finished_func' keyword argument: it never leaves the
+parent process.  It is held back when the job is queued and called in the
+parent when a worker reports the job as done.  That keeps callbacks like the
+RabbitMQ acknowledgement on the connection that fetched the crash."""
+
+import os
+import signal
+import time
+import threading
+import itertools
+import multiprocessing
+import Queue
+
+from configman import Namespace
+
+from socorro.lib.task_manager import (
+    default_task_func,
+    default_iterator,
+)
+from socorro.lib.threaded_task_manager import ThreadedTaskManager
+
+
+class ProcessPoolTaskManager(ThreadedTaskManager):
+    """Given an iterator over a sequence of job parameters and a function,
+    this class will execute the function in a set of worker processes."""
+    required_config = Namespace()
+    # each process is a full copy of the app and takes a core when it is busy.
+    # For Socorro processors, one process per core is the place to start.
+    required_config.add_option(
+        'number_of_processes',
+        default=4,
+        doc='the number of worker processes'
+    )
+    required_config.add_option(
+        'statistics_log_interval',
+        default=300,
+        doc='the number of seconds between logging of the per worker '
+            'throughput (0 to disable)'
+    )
+
+    # this tells the app that creates this task manager that the task function
+    # will run in another process and that the app needs to supply the
+    # functions that set up and tear down the resources of each worker
+    runs_tasks_in_subprocesses = True
+
+    def __init__(self, config,
+                 job_source_iterator=default_iterator,
+                 task_func=default_task_func,
+                 worker_setup_func=None,
+                 worker_close_func=None):
+        """the constructor accepts the same parameters as the
+        ThreadedTaskManager and these additions:
+
+        parameters:
+            worker_setup_func - a function called, with no arguments, in each
+                                worker process before it takes its first job.
+                                Resources like database connections or
+                                sockets inherited from the parent must not be
+                                used in the worker, this is the place to
+                                create the worker's own.
+            worker_close_func - a function called, with no arguments, in each
+                                worker process after it has taken its last
+                                job"""
+        super(ProcessPoolTaskManager, self).__init__(
+            config,
+            job_source_iterator,
+            task_func
+        )
+        self.number_of_threads = config.number_of_processes
+        self.worker_setup_func = worker_setup_func
+        self.worker_close_func = worker_close_func
+        self.task_queue = _JobQueue(config.maximum_queue_size)
+        self.result_queue = multiprocessing.Queue()
+        self.worker_statistics = {}
+        self._worker_names = itertools.count()
+        # held by the results thread while it handles a finished job and by
+        # the queuing thread while it forks a replacement worker, so that a
+        # fork never copies a lock that the results thread holds half way
+        # through logging or a 'finished_func'
+        self._fork_lock = threading.Lock()
+
+    def start(self):
+        """start the worker processes, the thread that listens for finished
+        jobs and the queuing thread.  This is a non blocking call."""
+        self.logger.debug('start')
+        self.start_time = time.time()
+        self.results_thread = threading.Thread(
+            name="ResultsThread",
+            target=self._results_thread_func
+        )
+        for x in range(self.number_of_threads):
+            self.thread_list.append(self._start_worker_process())
+        self.results_thread.start()
+        self.queuing_thread = threading.Thread(
+            name="QueuingThread",
+            target=self._queuing_thread_func
+        )
+        self.queuing_thread.start()
+
+    def _start_worker_process(self):
+        name = 'Worker-%d' % self._worker_names.next()
+        self.worker_statistics[name] = WorkerStatistics()
+        new_process = multiprocessing.Process(
+            name=name,
+            target=self._worker_process_func,
+            args=(name, os.getpid())
+        )
+        new_process.start()
+        return new_process
+
+    def _kill_worker_threads(self):
+        """put one death token on the queue for each worker process, wait for
+        all the processes to end and then stop the results thread.  All jobs
+        queued before the death tokens will have been finished."""
+        for x in range(self.number_of_threads):
+            self.task_queue.put((None, None))
+        self.logger.debug("waiting for worker processes to stop")
+        for a_process in self.thread_list:
+            a_process.join()
+        # the workers are gone, so this is the last thing the results thread
+        # will ever read from the queue
+        self.result_queue.put(None)
+        self.results_thread.join()
+        self._log_worker_statistics()
+
+    def _results_thread_func(self):
+        """runs in the parent process.  It reads the reports of finished jobs
+        sent back from the workers, calls the 'finished_func' held back for
+        each job and keeps the per worker statistics."""
+        last_log_time = time.time()
+        while True:
+            try:
+                result = self.result_queue.get(timeout=1.0)
+            except Queue.Empty:
+                result = ()
+            if result is None:
+                break
+            with self._fork_lock:
+                if result:
+                    self._finish_job(*result)
+                log_interval = self.config.statistics_log_interval
+                if log_interval and time.time() - last_log_time > log_interval:
+                    self._log_worker_statistics()
+                    last_log_time = time.time()
+        # if workers died, their unfinished jobs will never be reported
+        if self.task_queue.finished_funcs:
+            self.logger.warning(
+                '%d jobs were never reported as finished',
+                len(self.task_queue.finished_funcs)
+            )
+
+    def _finish_job(self, job_id, worker_name, elapsed_time, succeeded):
+        self.worker_statistics[worker_name].add(elapsed_time, succeeded)
+        finished_func = self.task_queue.finished_funcs.pop(job_id, None)
+        if finished_func is None:
+            return
+        try:
+            finished_func()
+        except Exception:
+            self.logger.error(
+                'Error in the finished_func of a job',
+                exc_info=True
+            )
+
+    def _get_iterator(self):
+        """the queuing thread is the only thread that reads the job source, so
+        checking for dead workers between jobs keeps all the forking in that
+        thread.  It is also the thread that queues the death tokens, so no
+        replacement can be started once the shutdown has begun."""
+        for job_params in super(ProcessPoolTaskManager, self)._get_iterator():
+            self._replace_dead_workers()
+            yield job_params
+
+    def _replace_dead_workers(self):
+        """a worker that dies while the queuing thread is still running
+        (a segfault in an extension or the OOM killer, for example) gets
+        replaced so that the pool doesn't shrink.  The job it was working on
+        is lost and its 'finished_func' is never called."""
+        if self.quit:
+            return
+        for index, a_process in enumerate(self.thread_list):
+            if a_process.is_alive() or a_process.exitcode == 0:
+                continue
+            self.logger.error(
+                '%s died with exit code %s, starting a replacement',
+                a_process.name,
+                a_process.exitcode
+            )
+            with self._fork_lock:
+                self.thread_list[index] = self._start_worker_process()
+
+    def _log_worker_statistics(self):
+        running_time = time.time() - self.start_time
+        for name, statistics in sorted(self.worker_statistics.items()):
+            self.logger.info(
+                '%s: %d jobs (%d failed) in %.1fs, %.2f jobs/sec, '
+                '%.1f%% busy',
+                name,
+                statistics.jobs,
+                statistics.failures,
+                running_time,
+                statistics.jobs / running_time if running_time else 0.0,
+                100.0 * statistics.busy_time / running_time
+                if running_time else 0.0,
+            )
+
+    def _worker_process_func(self, name, parent_pid):
+        """The main routine of a worker process.
+
+        The worker pulls jobs from the task queue and executes them until it
+        encounters a death token or finds that its parent is gone.  Each
+        finished job is reported back on the results queue."""
+        # shutting down is the job of the parent process.  It sends death
+        # tokens that let the workers finish what is already queued.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        try:
+            if self.worker_setup_func:
+                self.worker_setup_func()
+        except Exception:
+            self.config.logger.critical(
+                "%s failed to set up", name, exc_info=True
+            )
+            raise
+        try:
+            while True:
+                try:
+                    job = self.task_queue.get(timeout=1.0)
+                except Queue.Empty:
+                    if os.getppid() != parent_pid:
+                        self.config.logger.warning(
+                            '%s was orphaned, quitting', name
+                        )
+                        break
+                    continue
+                if job is None:
+                    self.config.logger.info('%s quits', name)
+                    break
+                job_id, args, kwargs = job
+                start_time = time.time()
+                succeeded = True
+                try:
+                    self.task_func(*args, **kwargs)
+                except Exception:
+                    succeeded = False
+                    self.config.logger.error("Error in processing a job",
+                                             exc_info=True)
+                except KeyboardInterrupt:
+                    succeeded = False
+                    self.config.logger.info('quit request detected')
+                self.result_queue.put(
+                    (job_id, name, time.time() - start_time, succeeded)
+                )
+        finally:
+            if self.worker_close_func:
+                try:
+                    self.worker_close_func()
+                except Exception:
+                    self.config.logger.error(
+                        "%s failed to close", name, exc_info=True
+                    )
+
+    def executor_identity(self):
+        """the worker processes are all forked from the same thread, so the
+        process id is needed to tell them apart."""
+        return "%s-%s" % (os.getpid(), threading.currentThread().getName())
+
+
+class WorkerStatistics(object):
+    """the running totals of the jobs done by a single worker process"""
+
+    def __init__(self):
+        self.jobs = 0
+        self.failures = 0
+        self.busy_time = 0.0
+
+    def add(self, elapsed_time, succeeded):
+        self.jobs += 1
+        self.busy_time += elapsed_time
+        if not succeeded:
+            self.failures += 1
+
+
+class _JobQueue(object):
+    """An inter-process queue with the interface that the queuing thread of
+    the ThreadedTaskManager expects.  Items put into it in the form
+    (task_func, job_params) are translated into picklable
+    (job_id, args, kwargs) jobs for the worker processes.  The task_func is
+    dropped because every worker already has its own copy, while the
+    'finished_func' in the kwargs is held back in the parent under the
+    job_id."""
+
+    def __init__(self, maximum_queue_size):
+        self.queue = multiprocessing.Queue(maximum_queue_size)
+        self.finished_funcs = {}
+        self._job_ids = itertools.count()
+
+    def put(self, item):
+        function, arguments = item
+        if function is None:
+            # a death token
+            self.queue.put(None)
+            return
+        try:
+            args, kwargs = arguments
+        except ValueError:
+            args = arguments
+            kwargs = {}
+        job_id = self._job_ids.next()
+        if 'finished_func' in kwargs:
+            kwargs = dict(kwargs)
+            self.finished_funcs[job_id] = kwargs.pop('finished_func')
+        self.queue.put((job_id, args, kwargs))
+
+    def get(self, timeout=None):
+        return self.queue.get(timeout=timeout)
+
+    def empty(self):
+        return self.queue.empty()
@@ -0,0 +1,155 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""The json serialization of crashes shared by the crash stores.
+
+JSONSerializer is the json module of the standard library with a hook for
+dates.  UJSONSerializer is the fast path: the dates are converted to strings
+before ujson sees them, in one walk of the nested mappings of the crash.  The
+walk doesn't go down the lists, the stacks of a processed crash are lists of
+frames and walking them all would cost more than ujson saves.  Whatever ujson
+can't serialize, like a date in a list, sends the crash through the standard
+library instead.  That takes ujson 2 or later: ujson 1.x doesn't refuse what
+it can't serialize, it writes dates as epoch integers and other objects as
+empty mappings, so with it UJSONSerializer serializes with the standard
+library.
+
+A crash is saved to several crash stores, most of which serialize it the
+same way.  Within `shared_serializations`, the serializers keep what they
+made of each mapping, so the next store that serializes the same mapping, in
+the same date format, gets the same string without serializing it again.
+PolyCrashStorage does that for each save.
+
+The crash stores use the serializers defined at the bottom of this module,
+one per date format in use."""
+
+import collections
+import contextlib
+import datetime
+import json
+import threading
+
+import ujson
+
+
+def _ujson_kwargs(function, test_value, **kwargs):
+    """returns the kwargs that function takes.  ujson 1.x rounds floats
+    unless asked not to, ujson 2.x doesn't and doesn't take the arguments"""
+    try:
+        function(test_value, **kwargs)
+    except TypeError:
+        return {}
+    return kwargs
+
+
+class JSONSerializer(object):
+    """serializes with the json module of the standard library"""
+
+    def __init__(self, date_format=None):
+        """parameters:
+            date_format - the strftime format of datetimes, isoformat if
+                          None"""
+        self.date_format = date_format
+
+    def date_to_string(self, a_date):
+        if self.date_format and isinstance(a_date, datetime.datetime):
+            return a_date.strftime(self.date_format)
+        return a_date.isoformat()
+
+    def _default(self, obj):
+        if isinstance(obj, datetime.date):
+            return self.date_to_string(obj)
+        if isinstance(obj, collections.Mapping):
+            return dict(obj)
+        raise TypeError('%r is not JSON serializable' % (obj,))
+
+    def dumps(self, obj):
+        # compact, like ujson, so that both write the same
+        return json.dumps(obj, default=self._default, separators=(',', ':'))
+
+    def loads(self, a_string, object_hook=None):
+        return json.loads(a_string, object_hook=object_hook)
+
+
+_local = threading.local()
+
+
+@contextlib.contextmanager
+def shared_serializations(serializations):
+    """within this context, the serializers of this thread keep in the dict
+    serializations the strings the mappings they serialize were made into, to
+    serialize each of them only once.  The mappings must not change while
+    the context lasts.  The dict can be shared by the threads that save the
+    same crash."""
+    previous = getattr(_local, 'serializations', None)
+    _local.serializations = serializations
+    try:
+        yield serializations
+    finally:
+        _local.serializations = previous
+
+
+class UJSONSerializer(JSONSerializer):
+    """serializes with ujson, falling back on the standard library"""
+
+    _dumps_kwargs = dict(
+        _ujson_kwargs(ujson.dumps, 0.1, double_precision=15),
+        escape_forward_slashes=False
+    )
+    _loads_kwargs = _ujson_kwargs(ujson.loads, '0.1', precise_float=True)
+
+    # ujson 1.x serializes dates and unknown objects as something else
+    # instead of raising TypeError
+    _ujson_refuses_unknown_types = int(ujson.__version__.split('.')[0]) >= 2
+
+    def _convert_dates(self, a_mapping):
+        """returns a copy of a_mapping and of the mappings in it, with the
+        dates as strings"""
+        converted = {}
+        for key, value in a_mapping.iteritems():
+            if isinstance(value, datetime.date):
+                value = self.date_to_string(value)
+            elif isinstance(value, collections.Mapping):
+                value = self._convert_dates(value)
+            converted[key] = value
+        return converted
+
+    def _dumps(self, obj):
+        if not self._ujson_refuses_unknown_types:
+            return super(UJSONSerializer, self).dumps(obj)
+        try:
+            if isinstance(obj, collections.Mapping):
+                obj = self._convert_dates(obj)
+            return ujson.dumps(obj, **self._dumps_kwargs)
+        except (TypeError, OverflowError, ValueError):
+            return super(UJSONSerializer, self).dumps(obj)
+
+    def dumps(self, obj):
+        serializations = getattr(_local, 'serializations', None)
+        if serializations is None or not isinstance(obj, collections.Mapping):
+            return self._dumps(obj)
+        # the mapping is kept so that its id isn't reused while the
+        # serializations are, the lock makes the other threads wait for the
+        # string instead of making it too
+        entry = serializations.setdefault(
+            (id(obj), self.date_format),
+            [obj, None, threading.Lock()]
+        )
+        with entry[2]:
+            if entry[1] is None:
+                entry[1] = self._dumps(obj)
+        return entry[1]
+
+    def loads(self, a_string, object_hook=None):
+        if object_hook is not None:
+            # ujson has no hook, calling it on every object afterwards costs
+            # more than ujson saves
+            return json.loads(a_string, object_hook=object_hook)
+        return ujson.loads(a_string, **self._loads_kwargs)
+
+
+# datetimes as isoformat, as saved in S3 and on the file system
+iso_serializer = UJSONSerializer()
+# datetimes as saved in postgres and elasticsearch
+database_serializer = UJSONSerializer(date_format='%Y-%m-%d %H:%M:%S.%f')
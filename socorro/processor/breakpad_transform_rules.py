@@ -13,8 +13,10 @@ from configman.dotdict import DotDict as ConfigmanDotDict
 
 from socorro.lib.converters import change_default
 
+from socorro.lib.capped_json import CappedJSONParser, DROP
 from socorro.lib.util import DotDict
 from socorro.lib.transform_rules import Rule
+from socorro.processor.stackwalker_server import StackwalkerServer
 
 
 def _create_symbol_path_str(input_str):
@@ -344,17 +346,28 @@ class ExternalProcessRule(Rule):
             )
             return {}
 
-    def _execute_external_process(self, command_line, processor_meta):
+    def _execute_external_process(self, command_line, processor_meta,
+                                  stdin_data=None):
+        """run the command line in a shell.  If there is stdin_data, it is
+        written to the command's stdin before its output is read."""
         if self.config.get('chatty', False):
             self.config.logger.debug(
                 "External Command: %s",
                 command_line
             )
-        subprocess_handle = subprocess.Popen(
-            command_line,
-            shell=True,
-            stdout=subprocess.PIPE
-        )
+        popen_kwargs = {'shell': True, 'stdout': subprocess.PIPE}
+        if stdin_data is not None:
+            popen_kwargs['stdin'] = subprocess.PIPE
+        subprocess_handle = subprocess.Popen(command_line, **popen_kwargs)
+        if stdin_data is not None:
+            try:
+                subprocess_handle.stdin.write(stdin_data)
+            except IOError:
+                # the command quit without reading it all, its return code
+                # will tell what happened
+                pass
+            finally:
+                subprocess_handle.stdin.close()
         with closing(subprocess_handle.stdout):
             external_command_output = self._interpret_external_command_output(
                 subprocess_handle.stdout,
@@ -471,6 +484,37 @@ class DumpLookupExternalRule(ExternalProcessRule):
         return 'create_dump_lookup' in raw_crash
 
 
+class StackwalkerOutputParser(CappedJSONParser):
+    """loads the json output of the stackwalker with its threads and frames
+    capped.  The crashing thread is kept even if it is past the cap on
+    threads, and empty threads stand in for the dropped threads that come
+    before it so that its index stays right."""
+
+    def _crashing_thread_index(self):
+        # the keys of the stackwalker output are sorted, 'crash_info' is
+        # parsed before 'threads'
+        try:
+            return self.root['crash_info']['crashing_thread']
+        except (KeyError, TypeError):
+            return None
+
+    def _keep_beyond_cap(self, pattern, location, index):
+        return (
+            pattern == ('threads',) and
+            index == self._crashing_thread_index()
+        )
+
+    def _dropped_element(self, pattern, location, index):
+        crashing_thread_index = self._crashing_thread_index()
+        if (
+            pattern == ('threads',) and
+            crashing_thread_index is not None and
+            index < crashing_thread_index
+        ):
+            return {'frames': [], 'frame_count': 0}
+        return DROP
+
+
 class BreakpadStackwalkerRule2015(ExternalProcessRule):
 
     required_config = Namespace()
@@ -513,6 +557,24 @@ class BreakpadStackwalkerRule2015(ExternalProcessRule):
         doc='a path where temporary files may be written',
         default=tempfile.gettempdir(),
     )
+    required_config.add_option(
+        'max_threads',
+        doc='the number of threads of the stackwalker output that are kept, '
+            'the crashing thread is always kept',
+        default=500,
+    )
+    required_config.add_option(
+        'max_frames_per_thread',
+        doc='the number of frames of each thread of the stackwalker output '
+            'that are kept',
+        default=100,
+    )
+    required_config.add_option(
+        'raw_crash_over_stdin',
+        doc='pass the raw crash to the stackwalker on its stdin, as '
+            '/dev/stdin, rather than in a temporary file',
+        default=False,
+    )
 
     def version(self):
         return '1.0'
@@ -533,12 +595,94 @@ class BreakpadStackwalkerRule2015(ExternalProcessRule):
         finally:
             os.unlink(file_pathname)
 
-    def _execute_external_process(self, command_line, processor_meta):
+    @contextmanager
+    def _raw_crash_pathname_context(self, raw_crash):
+        """yields the pathname from which the stackwalker is to read the raw
+        crash"""
+        if self.config.raw_crash_over_stdin:
+            yield '/dev/stdin'
+            return
+        with self._temp_raw_crash_json_file(
+            raw_crash,
+            raw_crash.uuid
+        ) as raw_crash_pathname:
+            yield raw_crash_pathname
+
+    def _interpret_external_command_output(self, fp, processor_meta):
+        """the output is read incrementally, with the threads and their frames
+        capped, so that a dump with an outlandish number of threads can't
+        take the memory of the processor with it"""
+        parser = StackwalkerOutputParser({
+            ('threads',): self.config.max_threads,
+            ('threads', '*', 'frames'): self.config.max_frames_per_thread,
+            ('crashing_thread', 'frames'): self.config.max_frames_per_thread,
+        })
+        try:
+            stackwalker_output = parser.load(fp)
+        except Exception as x:
+            processor_meta.processor_notes.append(
+                "%s output failed in json: %s" % (
+                    self.config.command_pathname,
+                    x
+                )
+            )
+            return {}
+        self._note_truncations(
+            stackwalker_output,
+            parser.truncations,
+            processor_meta
+        )
+        return stackwalker_output
+
+    def _note_truncations(self, stackwalker_output, truncations,
+                          processor_meta):
+        threads_with_truncated_frames = 0
+        for location, total, kept in truncations:
+            if location == ('threads',):
+                processor_meta.processor_notes.append(
+                    "MDSW output had %d threads, %d were kept" % (
+                        total,
+                        kept
+                    )
+                )
+                continue
+            # the frames of a thread
+            thread = stackwalker_output
+            for key in location[:-1]:
+                thread = thread[key]
+            thread['frames_truncated'] = True
+            thread.setdefault('total_frames', total)
+            threads_with_truncated_frames += 1
+        if threads_with_truncated_frames:
+            processor_meta.processor_notes.append(
+                "MDSW output had more than %d frames in %d threads, the "
+                "other frames were dropped" % (
+                    self.config.max_frames_per_thread,
+                    threads_with_truncated_frames
+                )
+            )
+
+    def _execute_external_process(self, command_line, processor_meta,
+                                  stdin_data=None):
         stackwalker_output, return_code = super(
             BreakpadStackwalkerRule2015,
             self
-        )._execute_external_process(command_line, processor_meta)
+        )._execute_external_process(command_line, processor_meta, stdin_data)
+        stackwalker_data = self._interpret_stackwalker_output(
+            stackwalker_output,
+            return_code,
+            command_line,
+            processor_meta
+        )
+        return stackwalker_data, return_code
 
+    def _interpret_stackwalker_output(
+        self,
+        stackwalker_output,
+        return_code,
+        invocation,
+        processor_meta
+    ):
         if not isinstance(stackwalker_output, Mapping):
             processor_meta.processor_notes.append(
                 "MDSW produced unexpected output: %s..." %
@@ -563,19 +707,37 @@ class BreakpadStackwalkerRule2015(ExternalProcessRule):
         elif return_code != 0 or not stackwalker_data.success:
             processor_meta.processor_notes.append(
                 "MDSW failed on '%s': %s" % (
-                    command_line,
+                    invocation,
                     stackwalker_data.mdsw_status_string
                 )
             )
 
-        return stackwalker_data, return_code
+        return stackwalker_data
+
+    def _run_stackwalker(self, dump_pathname, raw_crash, raw_crash_pathname,
+                         processor_meta):
+        command_line = self.config.command_line.format(
+            **dict(
+                self.config,
+                dump_file_pathname=dump_pathname,
+                raw_crash_pathname=raw_crash_pathname
+            )
+        )
+        if self.config.raw_crash_over_stdin:
+            stdin_data = ujson.dumps(raw_crash)
+        else:
+            stdin_data = None
+        return self._execute_external_process(
+            command_line,
+            processor_meta,
+            stdin_data
+        )
 
     def _action(self, raw_crash, raw_dumps, processed_crash, processor_meta):
         if 'additional_minidumps' not in processed_crash:
             processed_crash.additional_minidumps = []
-        with self._temp_raw_crash_json_file(
-            raw_crash,
-            raw_crash.uuid
+        with self._raw_crash_pathname_context(
+            raw_crash
         ) as raw_crash_pathname:
             for dump_name in raw_dumps.iterkeys():
 
@@ -601,16 +763,10 @@ class BreakpadStackwalkerRule2015(ExternalProcessRule):
                         dump_pathname
                     )
 
-                command_line = self.config.command_line.format(
-                    **dict(
-                        self.config,
-                        dump_file_pathname=dump_pathname,
-                        raw_crash_pathname=raw_crash_pathname
-                    )
-                )
-
-                stackwalker_data, return_code = self._execute_external_process(
-                    command_line,
+                stackwalker_data, return_code = self._run_stackwalker(
+                    dump_pathname,
+                    raw_crash,
+                    raw_crash_pathname,
                     processor_meta
                 )
 
@@ -623,6 +779,99 @@ class BreakpadStackwalkerRule2015(ExternalProcessRule):
         return True
 
 
+class BreakpadStackwalkerServerRule2015(BreakpadStackwalkerRule2015):
+    """a BreakpadStackwalkerRule2015 that, rather than starting a stackwalker
+    for every minidump, sends the minidumps to stackwalkers running in server
+    mode.  Each thread of the processor gets its own long-lived stackwalker.
+    The symbols it has loaded are reused from one crash to the next."""
+
+    required_config = Namespace()
+    required_config.add_option(
+        'server_command_line',
+        doc='the template for the command that starts a stackwalker in '
+            'server mode.  It is not run by a shell.',
+        default=(
+            '{command_pathname} --server '
+            '--symbols-url {public_symbols_url} '
+            '--symbols-url {private_symbols_url} '
+            '--symbols-cache {symbol_cache_path}'
+        ),
+    )
+    required_config.add_option(
+        'stackwalker_timeout',
+        doc='the number of seconds the stackwalker may take on a single '
+            'minidump before it is killed',
+        default=30,
+    )
+    required_config.add_option(
+        'stackwalker_max_requests',
+        doc='the number of minidumps after which a stackwalker is replaced '
+            'by a new one, bounding the memory taken by the symbols it keeps '
+            '(0 for never)',
+        default=1000,
+    )
+
+    def __init__(self, config):
+        super(BreakpadStackwalkerServerRule2015, self).__init__(config)
+        self._servers = {}
+        self._servers_lock = threading.Lock()
+
+    def _get_server(self):
+        thread_name = threading.currentThread().getName()
+        with self._servers_lock:
+            try:
+                return self._servers[thread_name]
+            except KeyError:
+                server = StackwalkerServer(
+                    self.config.server_command_line.format(**self.config),
+                    self.config.stackwalker_timeout,
+                    self.config.stackwalker_max_requests,
+                    self.config.logger
+                )
+                self._servers[thread_name] = server
+                return server
+
+    @contextmanager
+    def _raw_crash_pathname_context(self, raw_crash):
+        # the raw crash goes to the stackwalker along with each request
+        yield None
+
+    def _run_stackwalker(self, dump_pathname, raw_crash, raw_crash_pathname,
+                         processor_meta):
+        if self.config.chatty:
+            self.config.logger.debug(
+                "stackwalker server request: %s",
+                dump_pathname
+            )
+        # the output is parsed as it is read from the stackwalker, so that
+        # it is never held whole in memory
+        stackwalker_output, return_code = self._get_server().request(
+            dump_pathname,
+            raw_crash,
+            load=lambda fp: self._interpret_external_command_output(
+                fp,
+                processor_meta
+            )
+        )
+        if return_code:
+            # there is no output to interpret
+            stackwalker_output = {}
+        stackwalker_data = self._interpret_stackwalker_output(
+            stackwalker_output,
+            return_code,
+            dump_pathname,
+            processor_meta
+        )
+        return stackwalker_data, return_code
+
+    def close(self):
+        with self._servers_lock:
+            servers = self._servers.values()
+            self._servers = {}
+        for server in servers:
+            server.close()
+
+
 class JitCrashCategorizeRule(ExternalProcessRule):
 
     required_config = Namespace()
@@ -2,10 +2,12 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import collections
 import datetime
 import gzip
 import re
 from sys import maxint
+import threading
 import time
 from urllib import unquote_plus
 
@@ -21,7 +23,8 @@ from socorro.lib.context_tools import temp_file_context
 from socorro.lib.datetimeutil import (
     UTC,
     datetime_from_isodate_string,
-    datestring_to_weekly_partition
+    datestring_to_weekly_partition,
+    utc_now
 )
 from socorro.lib.ooid import dateFromOoid
 from socorro.lib.transform_rules import Rule
@@ -700,6 +703,13 @@ class TopMostFilesRule(Rule):
 
 
 class MissingSymbolsRule(Rule):
+    """records the modules of a crash that have missing symbols in the
+    missing_symbols table.  The rows aren't inserted by the processor threads:
+    they are queued and a flushing thread inserts the queued rows every
+    'flush_interval' seconds, one INSERT per weekly partition.  The table is
+    read by day, a row that was queued recently for the same day is the same
+    row and isn't queued again.  No more than 'max_queued_rows' rows wait to
+    be inserted, the others are dropped while the database is behind."""
     required_config = Namespace()
     required_config.add_option(
         'database_class',
@@ -717,6 +727,22 @@ class MissingSymbolsRule(Rule):
         from_string_converter=str_to_python_object,
         reference_value_from='resource.postgresql',
     )
+    required_config.add_option(
+        'flush_interval',
+        doc='the number of seconds between the inserts of the queued rows',
+        default=5.0,
+    )
+    required_config.add_option(
+        'seen_rows_cache_size',
+        doc='the number of recently queued rows that are not queued again',
+        default=50000,
+    )
+    required_config.add_option(
+        'max_queued_rows',
+        doc='the maximum number of rows waiting to be inserted, more are '
+            'dropped',
+        default=100000,
+    )
 
     def __init__(self, config):
         super(MissingSymbolsRule, self).__init__(config)
@@ -728,8 +754,22 @@ class MissingSymbolsRule(Rule):
         self.sql = (
             "INSERT INTO missing_symbols_%s"
             " (date_processed, debug_file, debug_id, code_file, code_id)"
-            " VALUES (%%s, %%s, %%s, %%s, %%s)"
+            " VALUES %s"
         )
+        # partition -> rows to insert
+        self.queued_rows = collections.defaultdict(list)
+        self.queued_rows_count = 0
+        self.dropped_rows_count = 0
+        # the rows queued recently, oldest first
+        self.seen_rows = collections.OrderedDict()
+        self.done = False
+        self.queue_condition = threading.Condition()
+        self.flushing_thread = threading.Thread(
+            name="MissingSymbolsFlushingThread",
+            target=self._flushing_thread_func
+        )
+        self.flushing_thread.daemon = True
+        self.flushing_thread.start()
 
     def version(self):
         return '1.0'
@@ -738,7 +778,11 @@ class MissingSymbolsRule(Rule):
         try:
             date = processed_crash['date_processed']
             # update partition information based on date processed
-            sql = self.sql % datestring_to_weekly_partition(date)
+            partition = datestring_to_weekly_partition(date)
+            if isinstance(date, datetime.datetime):
+                # the table is by day
+                date = date.date()
+            rows = []
             for module in processed_crash['json_dump']['modules']:
                 try:
                     # First of all, only bother if there are
@@ -750,34 +794,129 @@ class MissingSymbolsRule(Rule):
                         module['debug_file'] and
                         module['debug_id']
                     ):
-                        self.transaction(
-                            execute_no_results,
-                            sql,
-                            (
-                                date,
-                                module['debug_file'],
-                                module['debug_id'],
-                                # These two use .get() because the keys
-                                # were added later in history. If it's
-                                # non-existent (or existant and None), it
-                                # will proceed and insert as a nullable.
-                                module.get('filename'),
-                                module.get('code_id'),
-                            )
-                        )
-                except self.database.ProgrammingError:
-                    processor_meta.processor_notes.append(
-                        "WARNING: missing symbols rule failed for"
-                        " %s" % raw_crash.uuid
-                    )
+                        rows.append((
+                            date,
+                            module['debug_file'],
+                            module['debug_id'],
+                            # These two use .get() because the keys
+                            # were added later in history. If it's
+                            # non-existent (or existant and None), it
+                            # will proceed and insert as a nullable.
+                            module.get('filename'),
+                            module.get('code_id'),
+                        ))
                 except KeyError:
                     pass
         except KeyError:
             return False
+        self._queue_rows(partition, rows)
         return True
 
+    def _queue_rows(self, partition, rows):
+        with self.queue_condition:
+            for row in rows:
+                if row in self.seen_rows:
+                    continue
+                if self.queued_rows_count >= self.config.max_queued_rows:
+                    self.dropped_rows_count += 1
+                    continue
+                self.queued_rows_count += 1
+                self.seen_rows[row] = partition
+                if len(self.seen_rows) > self.config.seen_rows_cache_size:
+                    self.seen_rows.popitem(last=False)
+                self.queued_rows[partition].append(row)
+
+    def _take_queued_rows(self):
+        with self.queue_condition:
+            queued_rows = self.queued_rows
+            self.queued_rows = collections.defaultdict(list)
+            self.queued_rows_count = 0
+            dropped_rows_count = self.dropped_rows_count
+            self.dropped_rows_count = 0
+        if dropped_rows_count:
+            self.config.logger.warning(
+                'the missing symbols rule dropped %d rows, more than %d '
+                'were waiting to be inserted',
+                dropped_rows_count,
+                self.config.max_queued_rows
+            )
+        return queued_rows
+
+    def _flushing_thread_func(self):
+        while True:
+            with self.queue_condition:
+                if not self.done:
+                    self.queue_condition.wait(self.config.flush_interval)
+                if self.done:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                # the thread goes on flushing
+                self.config.logger.error(
+                    'the missing symbols rule failed to flush',
+                    exc_info=True
+                )
+
+    def flush(self):
+        """inserts the queued rows.  If the rows of a partition fail, they
+        are inserted again one at a time, so that a bad row only loses
+        itself"""
+        for partition, rows in sorted(self._take_queued_rows().iteritems()):
+            try:
+                self.transaction(self._insert_rows, partition, rows)
+                continue
+            except Exception:
+                self.config.logger.warning(
+                    'the missing symbols rule failed to insert %d rows in '
+                    'missing_symbols_%s, inserting them one at a time',
+                    len(rows),
+                    partition,
+                    exc_info=True
+                )
+            for row in rows:
+                try:
+                    self.transaction(self._insert_rows, partition, [row])
+                except Exception:
+                    self.config.logger.error(
+                        'the missing symbols rule failed to insert %r in '
+                        'missing_symbols_%s',
+                        row,
+                        partition,
+                        exc_info=True
+                    )
+                    # it may be queued again by the next crashes that have it
+                    with self.queue_condition:
+                        self.seen_rows.pop(row, None)
+
+    def _insert_rows(self, connection, partition, rows):
+        placeholders = ', '.join(
+            ['(%s, %s, %s, %s, %s)'] * len(rows)
+        )
+        parameters = []
+        for row in rows:
+            parameters.extend(row)
+        execute_no_results(
+            connection,
+            self.sql % (partition, placeholders),
+            parameters
+        )
+
+    def close(self):
+        with self.queue_condition:
+            self.done = True
+            self.queue_condition.notify()
+        self.flushing_thread.join()
+        self.flush()
+
 
 class BetaVersionRule(Rule):
+    """gives the crashes of the beta and aurora channels their real version,
+    by the build id.  The versions of the recent builds are loaded at once
+    when the first crash is looked up and every 'refresh_interval' seconds
+    after, the versions of the other builds are looked up one at a time.  The
+    builds that aren't found are looked up again after 'unknown_version_ttl'
+    seconds, the cron jobs may not have seen them yet."""
     required_config = Namespace()
     required_config.add_option(
         'database_class',
@@ -795,6 +934,29 @@ class BetaVersionRule(Rule):
         from_string_converter=str_to_python_object,
         reference_value_from='resource.postgresql',
     )
+    required_config.add_option(
+        'version_cache_size',
+        doc='the maximum number of product, version and build id lookups '
+            'kept in memory',
+        default=10000,
+    )
+    required_config.add_option(
+        'preload_days',
+        doc='the number of days of builds whose versions are loaded at once',
+        default=30,
+    )
+    required_config.add_option(
+        'refresh_interval',
+        doc='the number of seconds between two loads of the versions of the '
+            'recent builds',
+        default=600,
+    )
+    required_config.add_option(
+        'unknown_version_ttl',
+        doc='the number of seconds before a build that was not found is '
+            'looked up again',
+        default=60,
+    )
 
     def __init__(self, config):
         super(BetaVersionRule, self).__init__(config)
@@ -803,11 +965,65 @@ class BetaVersionRule(Rule):
             config,
             database,
         )
-        self._versions_data_cache = {}
+        # (product, version, build_id) -> (real version, expiration time),
+        # least recently used first, the real versions that were found
+        # don't expire
+        self._versions_data_cache = collections.OrderedDict()
+        self._versions_data_lock = threading.Lock()
+        self._next_refresh_time = 0
 
     def version(self):
         return '1.0'
 
+    def _incr(self, name):
+        try:
+            self.config.metrics.increment('processor.betaversionrule.%s' % name)
+        except KeyError:
+            # no metrics configured
+            pass
+
+    def _cache_version_data(self, key, real_version, expiration_time):
+        """to be called with the _versions_data_lock held"""
+        self._versions_data_cache.pop(key, None)
+        self._versions_data_cache[key] = (real_version, expiration_time)
+        while len(self._versions_data_cache) > self.config.version_cache_size:
+            self._versions_data_cache.popitem(last=False)
+
+    def _load_recent_versions_data(self):
+        """loads the versions of the builds of the last preload_days days"""
+        sql = """
+            SELECT
+                pv.product_name,
+                pv.release_version,
+                pvb.build_id,
+                pv.version_string
+            FROM product_versions pv
+                JOIN product_version_builds pvb ON
+                    (pv.product_version_id = pvb.product_version_id)
+            WHERE pv.build_date >= %(since)s
+        """
+        params = {
+            'since': (
+                utc_now() - datetime.timedelta(days=self.config.preload_days)
+            ).date(),
+        }
+        try:
+            results = self.transaction(execute_query_fetchall, sql, params)
+        except Exception:
+            # the builds can still be looked up one at a time
+            self.config.logger.error(
+                'could not load the versions of the recent builds',
+                exc_info=True
+            )
+            return
+        with self._versions_data_lock:
+            for product, version, build_id, real_version in results:
+                self._cache_version_data(
+                    (product, version, int(build_id)),
+                    real_version,
+                    None
+                )
+
     def _get_version_data(self, product, version, build_id):
         """Return the real version number of a specific product, version and
         build.
@@ -817,10 +1033,28 @@ class BetaVersionRule(Rule):
         is 54.0). This database call returns the actual version number of said
         build (i.e. 54.0b3 for the previous example).
         """
-        key = '%s:%s:%s' % (product, version, build_id)
-
-        if key in self._versions_data_cache:
-            return self._versions_data_cache[key]
+        now = time.time()
+        with self._versions_data_lock:
+            refresh = now >= self._next_refresh_time
+            if refresh:
+                self._next_refresh_time = now + self.config.refresh_interval
+        if refresh:
+            self._load_recent_versions_data()
+
+        key = (product, version, build_id)
+        with self._versions_data_lock:
+            if key in self._versions_data_cache:
+                real_version, expiration_time = (
+                    self._versions_data_cache.pop(key)
+                )
+                if expiration_time is None or expiration_time > now:
+                    self._versions_data_cache[key] = (
+                        real_version,
+                        expiration_time
+                    )
+                    self._incr('cache_hit')
+                    return real_version
+        self._incr('cache_miss')
 
         sql = """
             SELECT
@@ -842,10 +1076,17 @@ class BetaVersionRule(Rule):
             sql,
             params
         )
+        real_version = None
         for real_version, in results:
-            self._versions_data_cache[key] = real_version
+            pass
 
-        return self._versions_data_cache.get(key)
+        with self._versions_data_lock:
+            self._cache_version_data(
+                key,
+                real_version,
+                None if real_version else now + self.config.unknown_version_ttl
+            )
+        return real_version
 
     def _predicate(self, raw_crash, raw_dumps, processed_crash, proc_meta):
         try:
@@ -16,7 +16,11 @@ from socorro.app.fetch_transform_save_app import (
     FetchTransformSaveWithSeparateNewCrashSourceApp,
     main
 )
-from socorro.external.crashstorage_base import CrashIDNotFound
+from socorro.external.crashstorage_base import (
+    CrashIDNotFound,
+    MemoryFileDumpsMapping,
+)
+from socorro.lib.memory_file import memory_files_supported
 from socorro.lib.util import DotDict
 from socorro.lib import raven_client
 from socorro.external.fs.crashstorage import FSDatedPermanentStorage
@@ -57,6 +61,15 @@ class ProcessorApp(FetchTransformSaveWithSeparateNewCrashSourceApp):
         from_string_converter=class_converter
     )
 
+    required_config.add_option(
+        'dumps_in_memory_files',
+        doc='hand the dumps to the processor in anonymous memory files rather '
+            'than in temporary files (Linux only).  This saves writing and '
+            'deleting a file per dump for sources that hold dumps in memory, '
+            'like S3.',
+        default=False,
+    )
+
     ###########################################################################
     # TODO: implement an __init__ and a waiting func.  The waiting func
     # will take registrations of periodic things to do over some time
@@ -86,8 +99,7 @@ class ProcessorApp(FetchTransformSaveWithSeparateNewCrashSourceApp):
         implemented by the 'processor_class' is applied, the
         processed crash is saved to the 'destination'"""
         try:
-            raw_crash = self.source.get_raw_crash(crash_id)
-            dumps = self.source.get_raw_dumps_as_files(crash_id)
+            raw_crash, dumps, processed_crash = self._get_crash(crash_id)
         except CrashIDNotFound:
             self.processor.reject_raw_crash(
                 crash_id,
@@ -106,13 +118,6 @@ class ProcessorApp(FetchTransformSaveWithSeparateNewCrashSourceApp):
             )
             return
 
-        try:
-            processed_crash = self.source.get_unredacted_processed(
-                crash_id
-            )
-        except CrashIDNotFound:
-            processed_crash = DotDict()
-
         try:
             if 'uuid' not in raw_crash:
                 raw_crash.uuid = crash_id
@@ -184,18 +189,59 @@ class ProcessorApp(FetchTransformSaveWithSeparateNewCrashSourceApp):
             # rather than the actual error where it originally happened.
             raise exc_type, exc_value, exc_tb
         finally:
-            # earlier, we created the dumps as files on the file system,
-            # we need to clean up after ourselves.
-            for a_dump_pathname in dumps.itervalues():
-                try:
-                    if "TEMPORARY" in a_dump_pathname:
-                        os.unlink(a_dump_pathname)
-                except OSError as x:
-                    # the file does not actually exist
-                    self.config.logger.info(
-                        'deletion of dump failed: %s',
-                        x,
-                    )
+            self._clean_up_dumps(dumps)
+
+    def _fetch_crash(self, crash_id):
+        """fetch the raw crash, the dumps as files and the processed crash,
+        if there is one, from the source"""
+        raw_crash = self.source.get_raw_crash(crash_id)
+        dumps = self._get_raw_dumps_as_files(crash_id)
+        try:
+            processed_crash = self.source.get_unredacted_processed(
+                crash_id
+            )
+        except CrashIDNotFound:
+            processed_crash = DotDict()
+        except Exception:
+            self._clean_up_dumps(dumps)
+            raise
+        return raw_crash, dumps, processed_crash
+
+    def _fetched_crash_size(self, fetched_crash):
+        """the dumps of a fetched crash are files, in memory or on disk"""
+        raw_crash, dumps, processed_crash = fetched_crash
+        return sum(
+            os.path.getsize(a_pathname) for a_pathname in dumps.itervalues()
+        )
+
+    def _discard_fetched_crash(self, fetched_crash):
+        raw_crash, dumps, processed_crash = fetched_crash
+        self._clean_up_dumps(dumps)
+
+    def _clean_up_dumps(self, dumps):
+        if isinstance(dumps, MemoryFileDumpsMapping):
+            # nothing was written to the file system
+            dumps.close()
+            return
+        # earlier, we created the dumps as files on the file system,
+        # we need to clean up after ourselves.
+        for a_dump_pathname in dumps.itervalues():
+            try:
+                if "TEMPORARY" in a_dump_pathname:
+                    os.unlink(a_dump_pathname)
+            except OSError as x:
+                # the file does not actually exist
+                self.config.logger.info(
+                    'deletion of dump failed: %s',
+                    x,
+                )
+
+    def _get_raw_dumps_as_files(self, crash_id):
+        if self.config.dumps_in_memory_files and memory_files_supported():
+            return self.source.get_raw_dumps(
+                crash_id
+            ).as_memory_dumps_mapping().as_memory_file_dumps_mapping(crash_id)
+        return self.source.get_raw_dumps_as_files(crash_id)
 
     def _setup_source_and_destination(self):
         """this method simply instatiates the source, destination,
@@ -212,6 +258,12 @@ class ProcessorApp(FetchTransformSaveWithSeparateNewCrashSourceApp):
 
         self.config.processor_name = self.app_instance_name
 
+        if self.config.dumps_in_memory_files and not memory_files_supported():
+            self.config.logger.warning(
+                'memory files are not supported here, dumps will be '
+                'written to temporary files'
+            )
+
         # this function will be called by the MainThread periodically
         # while the threaded_task_manager processes crashes.
         self.waiting_func = None
@@ -221,6 +273,25 @@ class ProcessorApp(FetchTransformSaveWithSeparateNewCrashSourceApp):
             self.quit_check
         )
 
+    def _setup_worker_process(self):
+        """each worker process gets its own source, destination and processor.
+        The companion process and the new crash source stay with the
+        parent."""
+        super(ProcessorApp, self)._setup_worker_process()
+        self._inherited_processor = self.processor
+        self.processor = self.config.processor.processor_class(
+            self.config.processor,
+            self.quit_check
+        )
+
+    def _close_worker_process(self):
+        super(ProcessorApp, self)._close_worker_process()
+        try:
+            self.processor.close()
+        except AttributeError:
+            # the processor implementation does not have a close method
+            pass
+
     def close(self):
         """when  the processor shutsdown, this function cleans up"""
         try:
@@ -0,0 +1,244 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""A long-lived stackwalker process.
+
+Started with '--server', the stackwalker reads requests from its stdin, one
+json object per line naming a minidump and carrying the raw crash.  It
+answers each one with the json output for that minidump written to its
+stdout as a single line.  Symbols loaded for one minidump stay loaded for
+the next, so neither the process start up nor the loading of the symbols of
+the common modules is paid for every crash.
+
+The timeout that 'timeout -s KILL' enforces on the one-shot stackwalker is
+enforced here per request: a stackwalker that doesn't answer in time is
+killed and a new one is started for the next request."""
+
+import os
+import sys
+import time
+import shlex
+import select
+import signal
+import subprocess
+
+import ujson
+
+
+# the return code reported for a request that timed out.  It is the one that
+# 'timeout' returns, so that notes and statistics don't depend on which way
+# the stackwalker was run.
+TIMEOUT_RETURN_CODE = 124
+
+
+class StackwalkerServer(object):
+    """the parent's end of one stackwalker started in server mode.  It is not
+    thread safe, each thread that needs a stackwalker must have its own."""
+
+    def __init__(self, command_line, timeout, max_requests, logger):
+        """parameters:
+            command_line - the command that starts the stackwalker in server
+                           mode.  It is not run by a shell.
+            timeout - the number of seconds a single request may take
+            max_requests - the number of requests after which the
+                           stackwalker is replaced by a new one.  Every
+                           module a stackwalker has seen stays in its
+                           memory, this keeps that bounded.  0 means never.
+            logger - where to report the starting and the killing of
+                     stackwalkers"""
+        self.command = shlex.split(command_line)
+        self.timeout = timeout
+        self.max_requests = max_requests
+        self.logger = logger
+        self.process = None
+        self.requests = 0
+        self._buffer = ''
+
+    def _start(self):
+        with open(os.devnull, 'w') as devnull:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=devnull,
+                close_fds=True,
+            )
+        self.requests = 0
+        self._buffer = ''
+        self.logger.debug(
+            'started stackwalker server %s', self.process.pid
+        )
+
+    def request(self, dump_pathname, raw_crash=None, load=None):
+        """have the stackwalker process a minidump.  The raw crash, if there is
+        one, is sent to the stackwalker along with the request.
+
+        Without load, returns a tuple of the line of json output, '' if there
+        was none, and a return code: 0 for a response, 124 for a timeout and
+        the exit code of the stackwalker if it died.  With load, the line is
+        never held whole in memory: load is given a file object that reads
+        the line from the stackwalker, ending where the line ends, and what
+        load returns takes the place of the line, None if there was none.
+        An exception raised by load is raised again once the rest of the
+        line has been read."""
+        if self.process is None:
+            self._start()
+        a_request = {'minidump': dump_pathname}
+        if raw_crash is not None:
+            a_request['raw_crash'] = raw_crash
+        no_output = '' if load is None else None
+        try:
+            self.process.stdin.write(ujson.dumps(a_request) + '\n')
+            self.process.stdin.flush()
+        except (IOError, OSError):
+            # the stackwalker is already gone
+            return no_output, self._reap()
+
+        reader = _LineReader(self, time.time() + self.timeout)
+        load_error = None
+        try:
+            if load is None:
+                output = reader.read_line()
+            else:
+                try:
+                    output = load(reader)
+                except Exception:
+                    load_error = sys.exc_info()
+                # the rest of the line, that load didn't read, is skipped
+                # so that the answer to the next request starts after it
+                reader.skip_line()
+        except _Timeout:
+            self.logger.warning(
+                'stackwalker server %s took more than %ss on %s, killing it',
+                self.process.pid,
+                self.timeout,
+                dump_pathname
+            )
+            self._kill()
+            return no_output, TIMEOUT_RETURN_CODE
+        except _Died:
+            return no_output, self._reap()
+
+        self.requests += 1
+        if self.max_requests and self.requests >= self.max_requests:
+            self.close()
+        if load_error is not None:
+            exc_type, exc_value, exc_tb = load_error
+            raise exc_type, exc_value, exc_tb
+        return output, 0
+
+    def _read_chunk(self, deadline):
+        """returns what the stackwalker has written to its stdout since the
+        last time, '' on end of file.  The pipe is read directly, rather than
+        through the file object, so that select sees everything that hasn't
+        been consumed yet."""
+        if self._buffer:
+            chunk, self._buffer = self._buffer, ''
+            return chunk
+        fd = self.process.stdout.fileno()
+        remaining = deadline - time.time()
+        if remaining <= 0:
+            raise _Timeout()
+        readable, _, _ = select.select([fd], [], [], remaining)
+        if not readable:
+            raise _Timeout()
+        return os.read(fd, 65536)
+
+    def _reap(self):
+        """the stackwalker quit on its own.  Returns its exit code."""
+        return_code = self.process.wait()
+        self.logger.warning(
+            'stackwalker server %s died with return code %s',
+            self.process.pid,
+            return_code
+        )
+        self._discard()
+        return return_code
+
+    def _kill(self):
+        try:
+            self.process.send_signal(signal.SIGKILL)
+        except OSError:
+            # it died on its own in the meantime
+            pass
+        self.process.wait()
+        self._discard()
+
+    def _discard(self):
+        for a_pipe in (self.process.stdin, self.process.stdout):
+            try:
+                a_pipe.close()
+            except (IOError, OSError):
+                pass
+        self.process = None
+
+    def close(self):
+        """end the stackwalker.  Closing its stdin makes it quit once it has
+        answered the requests it has; one that doesn't within the timeout is
+        killed."""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+        except (IOError, OSError):
+            pass
+        deadline = time.time() + self.timeout
+        while self.process.poll() is None:
+            if time.time() > deadline:
+                self._kill()
+                return
+            time.sleep(0.05)
+        self._discard()
+
+
+class _LineReader(object):
+    """a file object reading one line of the stdout of a stackwalker server,
+    the end of the line is its end of file.  A read of a given size returns
+    whatever the stackwalker has written so far, up to that size, rather than
+    wait for all of it.  Reading past the deadline raises _Timeout, and
+    reading past the end of the output of a stackwalker that died before it
+    ended the line raises _Died."""
+
+    def __init__(self, server, deadline):
+        self.server = server
+        self.deadline = deadline
+        self.end_of_line = False
+
+    def read(self, size=-1):
+        if size < 0:
+            return self.read_line()
+        if self.end_of_line or not size:
+            return ''
+        chunk = self.server._read_chunk(self.deadline)
+        if not chunk:
+            raise _Died()
+        # only the new chunk is searched for the end of the line
+        end = chunk.find('\n', 0, size + 1)
+        if end != -1:
+            self.server._buffer = chunk[end + 1:]
+            chunk = chunk[:end]
+            self.end_of_line = True
+        elif len(chunk) > size:
+            self.server._buffer = chunk[size:]
+            chunk = chunk[:size]
+        return chunk
+
+    def read_line(self):
+        """returns the rest of the line.  A line can be tens of megabytes,
+        the chunks are joined only once."""
+        return ''.join(iter(lambda: self.read(65536), ''))
+
+    def skip_line(self):
+        for chunk in iter(lambda: self.read(65536), ''):
+            pass
+
+
+# They are not Exceptions, so that they get through the loads given to
+# StackwalkerServer.request that handle every error of their own.
+class _Timeout(BaseException):
+    pass
+
+
+class _Died(BaseException):
+    pass
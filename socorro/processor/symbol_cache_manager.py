@@ -3,8 +3,12 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import os
+import sqlite3
+import stat
 import sys
 import tempfile
+import threading
+import time
 from collections import OrderedDict
 
 from configman import Namespace, RequiredConfig
@@ -247,6 +251,382 @@ class SymbolLRUCacheManager(RequiredConfig):
         self._notifier.stop()
 
 
+# =============================================================================
+class SymbolIndexedCacheManager(RequiredConfig):
+    """for cleaning up the symbols cache without watching it.  The files of
+    the cache are kept in an index on disk, a sqlite database, with their
+    size and the last time they were used.  A thread keeps the index up to
+    date, going through the cache one top directory at a time, the access
+    times of the files tell when they were last used.  The directories are
+    in the index too, with their modification time: the files of a directory
+    that didn't change since it was indexed aren't listed again.  When the
+    cache is over symbol_cache_size, the least recently used files are
+    removed, a batch at a time, until it is under its low watermark.
+
+    The index is kept between runs, so starting doesn't go through the
+    cache.  With filesystems mounted with relatime, a file used in the last
+    day may look like it wasn't used since the day before."""
+    required_config = Namespace()
+    required_config.add_option(
+        'symbol_cache_path',
+        doc="the cache directory to automatically remove files from",
+        default=os.path.join(tempfile.gettempdir(), 'symbols')
+    )
+    required_config.add_option(
+        'symbol_cache_size',
+        doc="the maximum size of the symbols cache",
+        default='1G',
+        from_string_converter=from_string_to_parse_size
+    )
+    required_config.add_option(
+        'low_watermark',
+        doc="the fraction of symbol_cache_size that the cache is brought down "
+            "to when it is over symbol_cache_size",
+        default=0.9,
+        from_string_converter=float
+    )
+    required_config.add_option(
+        'index_path',
+        doc="the sqlite database of the files of the cache",
+        default=os.path.join(tempfile.gettempdir(), 'symbols_index.sqlite')
+    )
+    required_config.add_option(
+        'rescan_interval',
+        doc="the number of seconds between two passes through the cache",
+        default=300,
+        from_string_converter=int
+    )
+    required_config.add_option(
+        'eviction_batch_size',
+        doc="the number of files considered for removal at a time",
+        default=1000,
+        from_string_converter=int
+    )
+    required_config.add_option(
+        'verbosity',
+        doc="how chatty should this be? 2 - uses the logger",
+        default=0,
+        from_string_converter=int
+    )
+
+    # -------------------------------------------------------------------------
+    def __init__(self, config, quit_check_callback=None):
+        self.config = config
+
+        self.directory = os.path.abspath(config.symbol_cache_path)
+        self.max_size = config.symbol_cache_size
+        self.low_size = config.symbol_cache_size * config.low_watermark
+        self.index_path = os.path.abspath(config.index_path)
+        self.verbosity = config.verbosity
+
+        self._index_lock = threading.Lock()
+        # the scanning thread uses the index, and so does close
+        self._index = sqlite3.connect(
+            self.index_path,
+            check_same_thread=False
+        )
+        with self._index:
+            self._index.execute(
+                'CREATE TABLE IF NOT EXISTS files ('
+                ' path TEXT PRIMARY KEY,'
+                ' size INTEGER NOT NULL,'
+                ' last_access REAL NOT NULL'
+                ')'
+            )
+            self._index.execute(
+                'CREATE INDEX IF NOT EXISTS files_last_access'
+                ' ON files (last_access)'
+            )
+            self._index.execute(
+                'CREATE TABLE IF NOT EXISTS directories ('
+                ' path TEXT PRIMARY KEY,'
+                ' parent TEXT NOT NULL,'
+                ' mtime REAL NOT NULL'
+                ')'
+            )
+            self._index.execute(
+                'CREATE INDEX IF NOT EXISTS directories_parent'
+                ' ON directories (parent)'
+            )
+        self.total_size = self._index.execute(
+            'SELECT COALESCE(SUM(size), 0) FROM files'
+        ).fetchone()[0]
+
+        self._done = threading.Event()
+        self._scanning_thread = threading.Thread(
+            name='SymbolCacheScanningThread',
+            target=self._scanning_thread_func
+        )
+        self._scanning_thread.daemon = True
+        self._scanning_thread.start()
+
+    # -------------------------------------------------------------------------
+    @property
+    def num_files(self):
+        with self._index_lock:
+            return self._index.execute(
+                'SELECT COUNT(*) FROM files'
+            ).fetchone()[0]
+
+    # -------------------------------------------------------------------------
+    def _scanning_thread_func(self):
+        while not self._done.is_set():
+            self._evict()
+            try:
+                names = set(os.listdir(self.directory))
+            except OSError:
+                self.config.logger.warning(
+                    'could not list the symbols cache %s', self.directory,
+                    exc_info=True
+                )
+                names = set()
+            else:
+                # the top directories removed since, to forget them
+                names.update(
+                    os.path.basename(path) for path in
+                    self._indexed_subdirectories(self.directory)
+                )
+            for name in sorted(names):
+                if self._done.is_set():
+                    return
+                try:
+                    self._scan_entry(name)
+                    self._evict()
+                except Exception:
+                    self.config.logger.error(
+                        'could not index %s of the symbols cache', name,
+                        exc_info=True
+                    )
+            self._done.wait(self.config.rescan_interval)
+
+    # -------------------------------------------------------------------------
+    @staticmethod
+    def _last_access(a_stat):
+        return max(a_stat.st_atime, a_stat.st_mtime)
+
+    # -------------------------------------------------------------------------
+    def _indexed_subdirectories(self, path):
+        with self._index_lock:
+            return [
+                subdirectory for subdirectory, in self._index.execute(
+                    'SELECT path FROM directories WHERE parent = ?', (path,)
+                )
+            ]
+
+    # -------------------------------------------------------------------------
+    def _stat_file(self, path, found):
+        if path.startswith(self.index_path):
+            # the index, or its journal, is in the cache
+            return
+        try:
+            a_stat = os.stat(path)
+        except OSError:
+            # removed since it was listed
+            return
+        found[path] = (a_stat.st_size, self._last_access(a_stat))
+
+    # -------------------------------------------------------------------------
+    def _scan_directory(self, path, parent, found, listed, gone):
+        """adds the files of the directories under path that changed since
+        they were indexed to found, the changed directories to listed and the
+        directories that are gone to gone"""
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            gone.append(path)
+            return
+        with self._index_lock:
+            row = self._index.execute(
+                'SELECT mtime FROM directories WHERE path = ?', (path,)
+            ).fetchone()
+        if row is not None and row[0] == mtime:
+            # its files and directories are the same, theirs may not be
+            for subdirectory in self._indexed_subdirectories(path):
+                self._scan_directory(subdirectory, path, found, listed, gone)
+            return
+
+        try:
+            names = os.listdir(path)
+        except OSError:
+            gone.append(path)
+            return
+        subdirectories = set()
+        for name in names:
+            a_path = os.path.join(path, name)
+            try:
+                is_directory = stat.S_ISDIR(os.lstat(a_path).st_mode)
+            except OSError:
+                # removed since it was listed
+                continue
+            if is_directory:
+                subdirectories.add(a_path)
+                self._scan_directory(a_path, path, found, listed, gone)
+            else:
+                self._stat_file(a_path, found)
+        gone.extend(
+            subdirectory
+            for subdirectory in self._indexed_subdirectories(path)
+            if subdirectory not in subdirectories
+        )
+        if time.time() - mtime < 1:
+            # what changes in the same tick wouldn't change mtime, it is
+            # listed again next time
+            mtime = -1
+        listed[path] = (parent, mtime)
+
+    # -------------------------------------------------------------------------
+    def _scan_entry(self, name):
+        """brings the index up to date with the files under name, a top
+        directory or a file of the cache"""
+        top = os.path.join(self.directory, name)
+        # path -> (size, last access) of the files of the listed directories
+        found = {}
+        # path -> (parent, mtime) of the directories that were listed
+        listed = {}
+        gone = []
+        if os.path.isdir(top) or not os.path.exists(top):
+            self._scan_directory(top, self.directory, found, listed, gone)
+        else:
+            self._stat_file(top, found)
+            if top not in found:
+                gone.append(top)
+        if not found and not listed and not gone:
+            return
+
+        with self._index_lock:
+            with self._index:
+                # the paths under top, '0' comes after '/'
+                indexed = dict(self._index.execute(
+                    'SELECT path, size FROM files'
+                    ' WHERE path = ? OR (path >= ? AND path < ?)',
+                    (top, top + '/', top + '0')
+                ))
+                removed = [
+                    path for path in indexed
+                    if path not in found and (
+                        os.path.dirname(path) in listed or
+                        any(
+                            path == a_path or path.startswith(a_path + '/')
+                            for a_path in gone
+                        )
+                    )
+                ]
+                self._index.executemany(
+                    'DELETE FROM files WHERE path = ?',
+                    [(path,) for path in removed]
+                )
+                self._index.executemany(
+                    'INSERT OR REPLACE INTO files (path, size, last_access)'
+                    ' VALUES (?, ?, ?)',
+                    [
+                        (path, size, last_access)
+                        for path, (size, last_access) in found.iteritems()
+                    ]
+                )
+                for a_path in gone:
+                    self._index.execute(
+                        'DELETE FROM directories'
+                        ' WHERE path = ? OR (path >= ? AND path < ?)',
+                        (a_path, a_path + '/', a_path + '0')
+                    )
+                self._index.executemany(
+                    'INSERT OR REPLACE INTO directories (path, parent, mtime)'
+                    ' VALUES (?, ?, ?)',
+                    [
+                        (path, parent, mtime)
+                        for path, (parent, mtime) in listed.iteritems()
+                    ]
+                )
+            self.total_size += (
+                sum(size for size, _ in found.itervalues()) -
+                sum(indexed[path] for path in found if path in indexed) -
+                sum(indexed[path] for path in removed)
+            )
+
+    # -------------------------------------------------------------------------
+    def _evict(self):
+        """removes the least recently used files of the cache, if it is over
+        its size, until it is under its low watermark"""
+        if self.total_size <= self.max_size:
+            return
+        while self.total_size > self.low_size:
+            with self._index_lock:
+                rows = self._index.execute(
+                    'SELECT path, size, last_access FROM files'
+                    ' ORDER BY last_access LIMIT ?',
+                    (self.config.eviction_batch_size,)
+                ).fetchall()
+            if not rows:
+                return
+            removed = []
+            used = []
+            for path, size, last_access in rows:
+                if self.total_size <= self.low_size:
+                    break
+                try:
+                    a_stat = os.stat(path)
+                except OSError:
+                    # already gone
+                    removed.append(path)
+                    self.total_size -= size
+                    continue
+                if self._last_access(a_stat) > last_access:
+                    # used since it was indexed
+                    used.append(
+                        (a_stat.st_size, self._last_access(a_stat), path)
+                    )
+                    self.total_size += a_stat.st_size - size
+                    continue
+                try:
+                    os.unlink(path)
+                except OSError:
+                    # it is put back in the index by the next pass if it
+                    # is still there
+                    self.config.logger.warning(
+                        'could not remove %s from the symbols cache', path,
+                        exc_info=True
+                    )
+                else:
+                    self._rm_empty_dirs(path)
+                    if self.verbosity >= 2:
+                        self.config.logger.debug('RM %s', path)
+                removed.append(path)
+                self.total_size -= size
+            with self._index_lock:
+                with self._index:
+                    self._index.executemany(
+                        'DELETE FROM files WHERE path = ?',
+                        [(path,) for path in removed]
+                    )
+                    self._index.executemany(
+                        'UPDATE files SET size = ?, last_access = ?'
+                        ' WHERE path = ?',
+                        used
+                    )
+
+    # -------------------------------------------------------------------------
+    def _rm_empty_dirs(self, path):
+        '''
+       Attempt to remove any empty directories that are parents of path
+       and children of self.directory.
+       '''
+        path = os.path.dirname(path)
+        while path.startswith(self.directory + os.sep):
+            try:
+                os.rmdir(path)
+            except OSError:
+                # not empty
+                return
+            path = os.path.dirname(path)
+
+    # -------------------------------------------------------------------------
+    def close(self):
+        self._done.set()
+        self._scanning_thread.join()
+        with self._index_lock:
+            self._index.close()
+
+
 # =============================================================================
 class NoOpCacheManager(RequiredConfig):
     def __init__(self, *args, **kwargs):
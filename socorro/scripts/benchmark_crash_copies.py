@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import argparse
+import copy
+import json
+import os
+import os.path
+import time
+
+from socorro.external.crashstorage_base import Redactor, socorrodotdict_to_dict
+from socorro.external.es.connection_context import JSONSerializer
+from socorro.external.es.crashstorage import ESCrashStorage
+from socorro.lib.copy_on_write import CopyOnWriteDotDict
+from socorro.lib.util import DotDict
+from socorro.scripts import WrappedTextHelpFormatter
+
+
+DESCRIPTION = """
+Compares the two ways PolyCrashStorage can protect a crash from crash stores that change it
+
+For each processed crash, the "deepcopy" path converts the crash to a dict and deep copies it the
+way PolyCrashStorage does for mutating stores by default. The "copy-on-write" path wraps it in a
+CopyOnWriteDotDict the way PolyCrashStorage does for the stores whose mutates_few_keys() is true.
+Both then change the copy the way a store does and serialize it for Elasticsearch, which is what
+the store does next. The "no copy" path serializes the crash without copying or changing it.
+
+Two stores are timed. The "redacting" store changes the copy the way
+ESCrashStorageRedactedJsonDump does, which drops most of the crash. The "whole crash" store only
+parses the datetimes of the copy and serializes all the rest.
+
+The serialization of a copy-on-write view reads, and so copies, every part of the crash that is
+still in it: CopyOnWriteList wraps every element of a list as soon as the list is read, and
+toDict() rebuilds each mapping. So the copy-on-write path only pays off for the stores that
+touch a few keys and drop or don't read the rest, and it costs about as much as a deep copy for
+the stores that serialize the whole crash.
+
+"""
+
+DEFAULT_DIRECTORY = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'testcrash', 'processed'
+)
+
+# the redaction done by ESCrashStorageRedactedJsonDump, by default
+FORBIDDEN_KEYS = (
+    'url, email, user_id, exploitability, json_dump.sensitive, memory_info, memory_report, '
+    'upload_file_minidump_flash1.json_dump, upload_file_minidump_flash2.json_dump, '
+    'upload_file_minidump_browser.json_dump'
+)
+JSON_DUMP_WHITELIST_KEYS = [
+    'largest_free_vm_block', 'tiny_block_size', 'write_combine_size', 'system_info'
+]
+REDACTOR = Redactor(DotDict({'forbidden_keys': FORBIDDEN_KEYS}))
+
+
+def redact(crash):
+    json_dump = crash.get('json_dump', {})
+    crash['json_dump'] = dict((k, json_dump.get(k)) for k in JSON_DUMP_WHITELIST_KEYS)
+    REDACTOR.redact(crash)
+
+
+STORES = [
+    ('redacting', redact),
+    ('whole crash', ESCrashStorage.reconstitute_datetimes),
+]
+
+
+def no_copy_path(crash, mutate, serializer):
+    serializer.dumps({'processed_crash': crash})
+
+
+def deepcopy_path(crash, mutate, serializer):
+    a_copy = DotDict(copy.deepcopy(socorrodotdict_to_dict(crash)))
+    mutate(a_copy)
+    serializer.dumps({'processed_crash': a_copy})
+
+
+def copy_on_write_path(crash, mutate, serializer):
+    a_copy = CopyOnWriteDotDict(crash)
+    mutate(a_copy)
+    serializer.dumps({'processed_crash': a_copy})
+
+
+def time_path(path_func, crashes, mutate, repeat):
+    """returns the best, over the repeats, of the mean number of seconds per crash"""
+    serializer = JSONSerializer()
+    best = None
+    for x in range(repeat):
+        start = time.time()
+        for crash in crashes:
+            path_func(crash, mutate, serializer)
+        elapsed = (time.time() - start) / len(crashes)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def load_crashes(directory):
+    crashes = []
+    for filename in sorted(os.listdir(directory)):
+        if filename.endswith('.json'):
+            with open(os.path.join(directory, filename)) as f:
+                crashes.append(json.load(f, object_hook=DotDict))
+    return crashes
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        formatter_class=WrappedTextHelpFormatter,
+        prog=os.path.basename(__file__),
+        description=DESCRIPTION.strip(),
+    )
+    parser.add_argument(
+        '--directory', default=DEFAULT_DIRECTORY,
+        help='Directory of processed crash json files'
+    )
+    parser.add_argument(
+        '--repeat', default=5, type=int,
+        help='The number of times to time each path; the best time is reported'
+    )
+    args = parser.parse_args(argv)
+
+    crashes = load_crashes(args.directory)
+    if not crashes:
+        print('No processed crashes found in %s' % args.directory)
+        return 1
+    size = sum(len(json.dumps(crash)) for crash in crashes) / len(crashes)
+    print('%d processed crashes, %d bytes of json on average' % (len(crashes), size))
+
+    no_copy_time = time_path(no_copy_path, crashes, None, args.repeat)
+    print('no copy:       %9.3f ms per crash' % (no_copy_time * 1000))
+    for name, mutate in STORES:
+        deepcopy_time = time_path(deepcopy_path, crashes, mutate, args.repeat)
+        copy_on_write_time = time_path(copy_on_write_path, crashes, mutate, args.repeat)
+
+        print('%s store:' % name)
+        print('  deepcopy:      %9.3f ms per crash' % (deepcopy_time * 1000))
+        print('  copy-on-write: %9.3f ms per crash' % (copy_on_write_time * 1000))
+        print('  speedup:       %9.1fx' % (deepcopy_time / copy_on_write_time))
+    return 0
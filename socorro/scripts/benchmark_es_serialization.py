@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import argparse
+import json
+import os
+import os.path
+import time
+
+import elasticsearch.serializer
+
+from socorro.external.es.connection_context import JSONSerializer
+from socorro.external.es.crashstorage import ESCrashStorage
+from socorro.lib.datetimeutil import JsonDTEncoder
+from socorro.scripts import WrappedTextHelpFormatter
+
+
+DESCRIPTION = """
+Times the serialization of crashes on the way to Elasticsearch
+
+Each processed crash of a directory is paired with a raw crash and made into the document that
+ESCrashStorage indexes. The "before" path serializes the raw and processed crashes with
+json.dumps to measure their sizes, then the whole document with the serializer of the
+elasticsearch client, the way ESCrashStorage used to. The "after" path serializes the document
+once with the serializer of the ES connection context, whose hook gets the sizes from the body.
+Both are checked to produce the same sizes and documents.
+
+"""
+
+TESTCRASH = os.path.join(os.path.dirname(__file__), '..', '..', 'testcrash')
+DEFAULT_DIRECTORY = os.path.join(TESTCRASH, 'processed')
+DEFAULT_RAW_CRASH = os.path.join(TESTCRASH, 'raw_crash.json')
+
+
+def before(documents):
+    serializer = elasticsearch.serializer.JSONSerializer()
+    sizes = []
+    for document in documents:
+        sizes.append((
+            len(json.dumps(document['raw_crash'], cls=JsonDTEncoder)),
+            len(json.dumps(document['processed_crash'], cls=JsonDTEncoder)),
+        ))
+        serializer.dumps(document)
+    return sizes
+
+
+def after(documents):
+    serializer = JSONSerializer()
+    sizes = []
+    serializer.hooks.append(
+        lambda document, document_sizes: sizes.append((
+            document_sizes['raw_crash'],
+            document_sizes['processed_crash'],
+        ))
+    )
+    for document in documents:
+        serializer.dumps(document)
+    return sizes
+
+
+def time_path(path_func, documents, repeat):
+    """returns the best, over the repeats, of the mean number of seconds per crash"""
+    best = None
+    for x in range(repeat):
+        start = time.time()
+        path_func(documents)
+        elapsed = (time.time() - start) / len(documents)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def load_documents(directory, raw_crash_pathname):
+    """returns the crash documents of the processed crashes of directory, made
+    ready for indexing the way ESCrashStorage does"""
+    with open(raw_crash_pathname) as f:
+        raw_crash = json.load(f)
+    ESCrashStorage.remove_bad_keys(raw_crash)
+
+    documents = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            processed_crash = json.load(f)
+        ESCrashStorage.reconstitute_datetimes(processed_crash)
+        documents.append({
+            'crash_id': processed_crash.get('uuid', filename[:-5]),
+            'processed_crash': processed_crash,
+            'raw_crash': raw_crash,
+        })
+    return documents
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        formatter_class=WrappedTextHelpFormatter,
+        prog=os.path.basename(__file__),
+        description=DESCRIPTION.strip(),
+    )
+    parser.add_argument(
+        '--directory', default=DEFAULT_DIRECTORY,
+        help='Directory of processed crash json files'
+    )
+    parser.add_argument(
+        '--raw-crash', default=DEFAULT_RAW_CRASH,
+        help='The raw crash json file paired with every processed crash'
+    )
+    parser.add_argument(
+        '--repeat', default=5, type=int,
+        help='The number of times to time each path; the best time is reported'
+    )
+    args = parser.parse_args(argv)
+
+    documents = load_documents(args.directory, args.raw_crash)
+    if not documents:
+        print('No processed crashes found in %s' % args.directory)
+        return 1
+    print('%d crashes, %d bytes on average' % (
+        len(documents),
+        sum(len(JSONSerializer().dumps(document)) for document in documents) / len(documents)
+    ))
+
+    # the date formats differ, and so do the separators, so the sizes are only
+    # roughly the same
+    for before_sizes, after_sizes in zip(before(documents), after(documents)):
+        for before_size, after_size in zip(before_sizes, after_sizes):
+            if abs(before_size - after_size) > before_size / 10:
+                print('The two paths disagree on sizes %r and %r' % (
+                    before_sizes, after_sizes
+                ))
+                return 1
+    old_serializer = elasticsearch.serializer.JSONSerializer()
+    for document in documents:
+        if (
+            json.loads(old_serializer.dumps(document)) !=
+            json.loads(JSONSerializer().dumps(document))
+        ):
+            print('The two paths disagree on %s' % document['crash_id'])
+            return 1
+
+    before_time = time_path(before, documents, args.repeat)
+    after_time = time_path(after, documents, args.repeat)
+
+    print('before: %9.3f ms per crash' % (before_time * 1000))
+    print('after:  %9.3f ms per crash' % (after_time * 1000))
+    print('saved:  %9.3f ms per crash (%.1fx)' % (
+        (before_time - after_time) * 1000, before_time / after_time
+    ))
+    return 0
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import argparse
+import json
+import os
+import os.path
+import time
+
+from socorro.signature.signature_utilities import CSignatureTool
+from socorro.scripts import WrappedTextHelpFormatter
+
+
+DESCRIPTION = """
+Times C signature generation over the stacks of a directory of processed crashes
+
+Every thread of every crash is used as a stack. The "separate" path matches each frame against
+the irrelevant, trim dll and prefix regular expressions one after the other and looks each
+sentinel up with list.index, the way CSignatureTool used to. The "combined" path is
+CSignatureTool as it is, with its SiglistClassifier. Both are checked to generate the same
+signatures.
+
+"""
+
+DEFAULT_DIRECTORY = os.path.join(
+    os.path.dirname(__file__), '..', '..', 'testcrash', 'processed'
+)
+
+
+def separate_generate(tool, source_list):
+    """the frame selection of CSignatureTool._do_generate with a match per siglist"""
+    sentinel_locations = []
+    for a_sentinel in tool.signature_sentinels:
+        if type(a_sentinel) == tuple:
+            a_sentinel, condition_fn = a_sentinel
+            if not condition_fn(source_list):
+                continue
+        try:
+            sentinel_locations.append(source_list.index(a_sentinel))
+        except ValueError:
+            pass
+    if sentinel_locations:
+        source_list = source_list[min(sentinel_locations):]
+
+    new_signature_list = []
+    for a_signature in source_list:
+        if tool.irrelevant_signature_re.match(a_signature):
+            continue
+        if tool.trim_dll_signature_re.match(a_signature):
+            a_signature = a_signature.split('@')[0]
+            if new_signature_list and a_signature == new_signature_list[-1]:
+                continue
+        new_signature_list.append(a_signature)
+        if not tool.prefix_signature_re.match(a_signature):
+            break
+    return ' | '.join(new_signature_list)
+
+
+def combined_generate(tool, source_list):
+    return tool._do_generate(source_list, None, 0)[0]
+
+
+def time_path(path_func, tool, stacks, repeat):
+    """returns the best, over the repeats, of the mean number of seconds per stack"""
+    best = None
+    for x in range(repeat):
+        start = time.time()
+        for stack in stacks:
+            path_func(tool, stack)
+        elapsed = (time.time() - start) / len(stacks)
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def load_stacks(directory, tool):
+    """returns the normalized frames of every thread of every crash"""
+    stacks = []
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(directory, filename)) as f:
+            crash = json.load(f)
+        for thread in (crash.get('json_dump') or {}).get('threads', []):
+            stack = [
+                tool.normalize_signature(**frame)
+                for frame in thread.get('frames', [])
+            ]
+            if stack:
+                stacks.append(stack)
+    return stacks
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        formatter_class=WrappedTextHelpFormatter,
+        prog=os.path.basename(__file__),
+        description=DESCRIPTION.strip(),
+    )
+    parser.add_argument(
+        '--directory', default=DEFAULT_DIRECTORY,
+        help='Directory of processed crash json files'
+    )
+    parser.add_argument(
+        '--repeat', default=5, type=int,
+        help='The number of times to time each path; the best time is reported'
+    )
+    args = parser.parse_args(argv)
+
+    tool = CSignatureTool()
+    stacks = load_stacks(args.directory, tool)
+    if not stacks:
+        print('No stacks found in %s' % args.directory)
+        return 1
+    print('%d stacks, %d frames on average' % (
+        len(stacks), sum(len(stack) for stack in stacks) / len(stacks)
+    ))
+
+    for stack in stacks:
+        if separate_generate(tool, stack) != combined_generate(tool, stack):
+            print('The two paths disagree on %r' % stack)
+            return 1
+
+    separate_time = time_path(separate_generate, tool, stacks, args.repeat)
+    combined_time = time_path(combined_generate, tool, stacks, args.repeat)
+
+    print('separate: %9.3f us per stack' % (separate_time * 1000000))
+    print('combined: %9.3f us per stack' % (combined_time * 1000000))
+    print('speedup:  %9.1fx' % (separate_time / combined_time))
+    return 0
@@ -13,8 +13,8 @@ import sys
 
 import requests
 
-from socorro.lib.treelib import tree_get
 from socorro.signature import SignatureGenerator
+from socorro.signature.utils import convert_to_crash_data
 
 
 DESCRIPTION = """
@@ -197,16 +197,6 @@ def main(args):
                 out.warning('Error fetching raw crash: %s' % raw_crash['error'])
                 return 1
 
-            raw_crash_minimal = {
-                'JavaStackTrace': raw_crash.get('JavaStackTrace', None),
-                'OOMAllocationSize': raw_crash.get('OOMAllocationSize', None),
-                'AbortMessage': raw_crash.get('AbortMessage', None),
-                'AsyncShutdownTimeout': raw_crash.get('AsyncShutdownTimeout', None),
-                'ipc_channel_error': raw_crash.get('ipc_channel_error', None),
-                'additional_minidumps': raw_crash.get('additional_minidumps', None),
-                'IPCMessageName': raw_crash.get('IPCMessageName', None),
-            }
-
             resp = fetch('/ProcessedCrash/', crash_id, api_token)
             if resp.status_code == 404:
                 out.warning('%s: does not have processed crash.' % crash_id)
@@ -230,30 +220,9 @@ def main(args):
 
             old_signature = processed_crash['signature']
 
-            processed_crash_minimal = {
-                'hang_type': processed_crash.get('hang_type', None),
-                'json_dump': {
-                    'threads': tree_get(processed_crash, 'json_dump.threads', default=[]),
-                    'system_info': {
-                        'os': tree_get(processed_crash, 'json_dump.system_info.os', default=''),
-                    },
-                    'crash_info': {
-                        'crashing_thread': tree_get(
-                            processed_crash, 'json_dump.crash_info.crashing_thread', default=None
-                        ),
-                    },
-                },
-                # NOTE(willkg): Classifications aren't available via the public API.
-                'classifications': {
-                    'jit': {
-                        'category': tree_get(processed_crash, 'classifications.jit.category', ''),
-                    },
-                },
-                'mdsw_status_string': processed_crash.get('mdsw_status_string', None),
-
-                # This needs to be an empty string--the signature generator fills it in.
-                'signature': ''
-            }
+            raw_crash_minimal, processed_crash_minimal = convert_to_crash_data(
+                raw_crash, processed_crash
+            )
 
             ret = generator.generate(raw_crash_minimal, processed_crash_minimal)
 
@@ -0,0 +1,251 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+"""Regenerates the signatures of a list of crashes, in bulk, from the crashes
+already in a crash storage.
+
+The raw and processed crashes are read from the crash storage (S3 or the file
+system) and the signature is generated again by worker processes, without
+running the stackwalker or anything else in the processor.  The old and new
+signatures are written to a csv report.  The ids of the crashes whose
+signature would change can be written to a file of their own, ready to be
+given to the reprocess_crashlist app, so that only those are reprocessed.  A
+crash that can't be read or whose signature can't be generated gets an error
+row in the report, the others go on.
+
+This is the way to judge the impact of a change to the siglists before it is
+deployed:
+
+    $ python -m socorro.signature.batch_app \\
+        --crash_ids_file=crashids.txt \\
+        --report_file=report.csv \\
+        --changed_crash_ids_file=changed.txt
+"""
+
+import csv
+import collections
+import multiprocessing
+import sys
+
+from configman import Namespace, class_converter
+
+from socorro.app.socorro_app import App, main
+from socorro.external.crashstorage_base import CrashIDNotFound
+from socorro.signature import SignatureGenerator
+from socorro.signature.utils import convert_to_crash_data
+
+
+# the crash storage and the signature generator of a worker process
+_worker = {}
+
+
+def _set_up_worker(source_config):
+    _worker['crash_store'] = source_config.crashstorage_class(source_config)
+    _worker['generator'] = SignatureGenerator()
+
+
+def _close_worker():
+    _worker.pop('crash_store').close()
+    _worker.pop('generator')
+
+
+def _utf8(a_string):
+    if isinstance(a_string, unicode):
+        return a_string.encode('utf-8')
+    return a_string
+
+
+def regenerate_signature(crash_id):
+    """returns a tuple of the crash id, the old signature, the new signature,
+    the notes of signature generation and the error that stopped it.  The
+    signatures are None for a crash that isn't in the crash storage or that
+    failed, the error is None for the others."""
+    crash_store = _worker['crash_store']
+    try:
+        raw_crash = crash_store.get_raw_crash(crash_id)
+        processed_crash = crash_store.get_unredacted_processed(crash_id)
+
+        raw_crash_minimal, processed_crash_minimal = convert_to_crash_data(
+            raw_crash, processed_crash
+        )
+        result = _worker['generator'].generate(raw_crash_minimal, processed_crash_minimal)
+    except CrashIDNotFound:
+        return crash_id, None, None, [], None
+    except Exception as exception:
+        # a string, the exception may not be picklable back from a worker
+        # process
+        return crash_id, None, None, [], '%s: %s' % (
+            exception.__class__.__name__,
+            exception
+        )
+    return (
+        crash_id,
+        processed_crash.get('signature', ''),
+        result['signature'],
+        result['notes'],
+        None,
+    )
+
+
+class SignatureBatchApp(App):
+    app_name = 'signature_batch'
+    app_version = '1.0'
+    app_description = __doc__
+
+    required_config = Namespace()
+    required_config.source = Namespace()
+    required_config.source.add_option(
+        'crashstorage_class',
+        doc='the crash storage to read the raw and processed crashes from',
+        default='socorro.external.boto.crashstorage.BotoS3CrashStorage',
+        from_string_converter=class_converter
+    )
+    required_config.add_option(
+        'crash_ids_file',
+        doc='file containing crash ids, one per line (- for stdin)',
+        default='-'
+    )
+    required_config.add_option(
+        'report_file',
+        doc='where to write the csv report of old and new signatures (- for stdout)',
+        default='-'
+    )
+    required_config.add_option(
+        'changed_only',
+        doc='leave the crashes whose signature is unchanged out of the report',
+        default=False
+    )
+    required_config.add_option(
+        'changed_crash_ids_file',
+        doc='where to write the ids of the crashes whose signature changes, one per line '
+            '(none if empty)',
+        default=''
+    )
+    required_config.add_option(
+        'number_of_processes',
+        doc='the number of worker processes generating signatures (1 to generate them in '
+            'this process)',
+        default=4
+    )
+    required_config.add_option(
+        'chunk_size',
+        doc='the number of crash ids handed to a worker process at a time',
+        default=20
+    )
+    required_config.add_option(
+        'number_of_top_changes',
+        doc='the number of the most common signature changes to log at the end',
+        default=20
+    )
+
+    def _open(self, pathname, default):
+        if pathname == '-':
+            return default
+        return open(pathname, 'w' if default is sys.stdout else 'r')
+
+    def _crash_ids(self, crash_ids_file):
+        for line in crash_ids_file:
+            crash_id = line.strip()
+            if crash_id:
+                yield crash_id
+
+    def _results(self, crash_ids):
+        """generates the results of regenerate_signature for the crash ids, in
+        no particular order when they come from worker processes"""
+        if self.config.number_of_processes <= 1:
+            _set_up_worker(self.config.source)
+            try:
+                for crash_id in crash_ids:
+                    yield regenerate_signature(crash_id)
+            finally:
+                _close_worker()
+            return
+
+        # the workers are forked, the config doesn't need to be picklable
+        pool = multiprocessing.Pool(
+            self.config.number_of_processes,
+            _set_up_worker,
+            (self.config.source,)
+        )
+        try:
+            for result in pool.imap_unordered(
+                regenerate_signature,
+                crash_ids,
+                self.config.chunk_size
+            ):
+                yield result
+            pool.close()
+        except BaseException:
+            pool.terminate()
+            raise
+        finally:
+            pool.join()
+
+    def main(self):
+        counts = collections.Counter()
+        changes = collections.Counter()
+
+        crash_ids_file = self._open(self.config.crash_ids_file, sys.stdin)
+        report_file = self._open(self.config.report_file, sys.stdout)
+        if self.config.changed_crash_ids_file:
+            changed_file = open(self.config.changed_crash_ids_file, 'w')
+        else:
+            changed_file = None
+        try:
+            report = csv.writer(report_file, quoting=csv.QUOTE_ALL)
+            report.writerow(['crashid', 'old', 'new', 'same?', 'notes'])
+            for crash_id, old_sig, new_sig, notes, error in self._results(
+                self._crash_ids(crash_ids_file)
+            ):
+                if error is not None:
+                    self.config.logger.warning('%s: failed: %s', crash_id, error)
+                    counts['failed'] += 1
+                    report.writerow([crash_id, '', '', 'error', _utf8(error)])
+                    continue
+                if old_sig is None:
+                    self.config.logger.warning('%s: not found', crash_id)
+                    counts['missing'] += 1
+                    continue
+                same = old_sig == new_sig
+                counts['same' if same else 'changed'] += 1
+                if not same:
+                    changes[(old_sig, new_sig)] += 1
+                    if changed_file is not None:
+                        changed_file.write(crash_id + '\n')
+                elif self.config.changed_only:
+                    continue
+                report.writerow([
+                    crash_id,
+                    _utf8(old_sig),
+                    _utf8(new_sig),
+                    str(same),
+                    notes
+                ])
+        finally:
+            for a_file, default in (
+                (crash_ids_file, sys.stdin),
+                (report_file, sys.stdout),
+                (changed_file, None),
+            ):
+                if a_file is not None and a_file is not default:
+                    a_file.close()
+
+        self.config.logger.info(
+            '%d crashes: %d changed signature, %d kept it, %d were not found, '
+            '%d failed',
+            sum(counts.values()),
+            counts['changed'],
+            counts['same'],
+            counts['missing'],
+            counts['failed']
+        )
+        for (old_sig, new_sig), count in changes.most_common(
+            self.config.number_of_top_changes
+        ):
+            self.config.logger.info('%6d: %s -> %s', count, old_sig, new_sig)
+        return 0
+
+
+if __name__ == '__main__':
+    main(SignatureBatchApp)
@@ -2,9 +2,11 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+from collections import OrderedDict
 from itertools import islice
 import logging
 import re
+import threading
 
 import ujson
 
@@ -78,6 +80,90 @@ class SignatureTool(object):
         raise NotImplementedError
 
 
+_DELIMITERS_RE = {}
+
+
+def _delimiters_re(open_string, close_string):
+    """returns a regular expression finding either delimiter"""
+    try:
+        return _DELIMITERS_RE[(open_string, close_string)]
+    except KeyError:
+        delimiters_re = re.compile(
+            '%s|%s' % (re.escape(open_string), re.escape(close_string))
+        )
+        _DELIMITERS_RE[(open_string, close_string)] = delimiters_re
+        return delimiters_re
+
+
+class SiglistClassifier(object):
+    """labels the frames of a stack with what the siglists say about them.
+
+    The irrelevant, trim dll and prefix regular expressions are compiled into
+    a single one, each list in a group of its own, so that a frame is matched
+    once rather than once per list.  The group that matched tells which list
+    did, the earlier lists taking precedence like they do in
+    CSignatureTool._do_generate.  The patterns in the lists must not use
+    numbered backreferences, as their groups are renumbered.
+
+    The sentinels are found by looking each frame up in a set, in the same
+    single pass over the stack."""
+
+    IRRELEVANT = 'irrelevant'
+    TRIM = 'trim'
+    PREFIX = 'prefix'
+    PLAIN = 'plain'
+
+    def __init__(self, irrelevant, trim_dll, prefix, sentinels):
+        parts = []
+        self._groups = []
+        group = 1
+        for label, patterns in (
+            (self.IRRELEVANT, irrelevant),
+            (self.TRIM, trim_dll),
+            (self.PREFIX, prefix),
+        ):
+            pattern = '|'.join(patterns)
+            parts.append('(%s)' % pattern)
+            self._groups.append((group, label))
+            group += 1 + re.compile(pattern).groups
+        self._classifier_re = re.compile('|'.join(parts))
+
+        self._sentinels = set()
+        # the sentinels that only count when a condition holds for the stack
+        self._conditions = {}
+        for a_sentinel in sentinels:
+            if type(a_sentinel) == tuple:
+                a_sentinel, condition_fn = a_sentinel
+                self._conditions.setdefault(a_sentinel, []).append(condition_fn)
+            else:
+                self._sentinels.add(a_sentinel)
+        self._all_sentinels = self._sentinels.union(self._conditions)
+
+    def classify(self, frame):
+        """returns IRRELEVANT, TRIM, PREFIX or PLAIN"""
+        match = self._classifier_re.match(frame)
+        if match is None:
+            return self.PLAIN
+        for group, label in self._groups:
+            if match.start(group) != -1:
+                return label
+
+    def find_sentinel(self, source_list):
+        """returns the index of the first sentinel in source_list, None if
+        there isn't one"""
+        for index, frame in enumerate(source_list):
+            if frame not in self._all_sentinels:
+                continue
+            if frame in self._sentinels:
+                return index
+            if any(
+                condition_fn(source_list)
+                for condition_fn in self._conditions[frame]
+            ):
+                return index
+        return None
+
+
 class CSignatureTool(SignatureTool):
     """This is the class for signature generation tools that work on
     breakpad C/C++ stacks.  It provides a method to normalize signatures
@@ -88,7 +174,7 @@ class CSignatureTool(SignatureTool):
         1: "chromehang"
     }
 
-    def __init__(self, quit_check_callback=None):
+    def __init__(self, quit_check_callback=None, cache_size=10000):
         super(CSignatureTool, self).__init__(quit_check_callback)
 
         self.irrelevant_signature_re = re.compile(
@@ -104,18 +190,33 @@ class CSignatureTool(SignatureTool):
             '|'.join(siglists.TRIM_DLL_SIGNATURE_RE)
         )
         self.signature_sentinels = siglists.SIGNATURE_SENTINELS
+        self.siglist_classifier = SiglistClassifier(
+            siglists.IRRELEVANT_SIGNATURE_RE,
+            siglists.TRIM_DLL_SIGNATURE_RE,
+            siglists.PREFIX_SIGNATURE_RE,
+            self.signature_sentinels,
+        )
 
         self.collapse_arguments = True
 
         self.fixup_space = re.compile(r' (?=[\*&,])')
         self.fixup_comma = re.compile(r',(?! )')
 
+        # the same few frames (mozalloc_abort, RtlUserThreadStart...) show up
+        # in crash after crash, their normalized forms are remembered rather
+        # than worked out again each time.  0 turns the cache off.
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+
     @staticmethod
-    def _is_exception(exception_list, remaining_original_line, line_up_to_current_position):
+    def _is_exception(exception_list, function_signature_str, index):
+        """whether the delimiter at index is preceded or followed by one of the
+        exceptions.  The string is compared in place, nothing is sliced."""
         for an_exception in exception_list:
-            if remaining_original_line.startswith(an_exception):
+            if function_signature_str.startswith(an_exception, index + 1):
                 return True
-            if line_up_to_current_position.endswith(an_exception):
+            if function_signature_str.endswith(an_exception, 0, index):
                 return True
         return False
 
@@ -131,41 +232,49 @@ class CSignatureTool(SignatureTool):
         """this method takes a string representing a C/C++ function signature
         and replaces anything between to possibly nested delimiters
 
+        Only the delimiters are looked at one by one, the text between two of
+        them is copied or dropped as a whole.
+
         :arg list exception_substring_list: list of exceptions that shouldn't collapse
 
         """
         target_counter = 0
         collapsed_list = []
         exception_mode = False
+        copied_up_to = 0
 
-        def append_if_not_in_collapse_mode(a_character):
+        delimiters_re = _delimiters_re(open_string, close_string)
+        for a_match in delimiters_re.finditer(function_signature_str):
+            index = a_match.start()
             if not target_counter:
-                collapsed_list.append(a_character)
+                collapsed_list.append(function_signature_str[copied_up_to:index])
+            copied_up_to = index + 1
 
-        for index, a_character in enumerate(function_signature_str):
-            if a_character == open_string:
+            if function_signature_str[index] == open_string:
                 if self._is_exception(
                     exception_substring_list,
-                    function_signature_str[index + 1:],
-                    function_signature_str[:index]
+                    function_signature_str,
+                    index
                 ):
                     exception_mode = True
-                    append_if_not_in_collapse_mode(a_character)
+                    if not target_counter:
+                        collapsed_list.append(open_string)
                     continue
-                append_if_not_in_collapse_mode(replacement_open_string)
+                if not target_counter:
+                    collapsed_list.append(replacement_open_string)
                 target_counter += 1
-            elif a_character == close_string:
-                if exception_mode:
-                    append_if_not_in_collapse_mode(a_character)
-                    exception_mode = False
-                else:
-                    target_counter -= 1
-                    append_if_not_in_collapse_mode(replacement_close_string)
+            elif exception_mode:
+                if not target_counter:
+                    collapsed_list.append(close_string)
+                exception_mode = False
             else:
-                append_if_not_in_collapse_mode(a_character)
+                target_counter -= 1
+                if not target_counter:
+                    collapsed_list.append(replacement_close_string)
 
-        edited_function = ''.join(collapsed_list)
-        return edited_function
+        if not target_counter:
+            collapsed_list.append(function_signature_str[copied_up_to:])
+        return ''.join(collapsed_list)
 
     def normalize_signature(
         self,
@@ -188,6 +297,45 @@ class CSignatureTool(SignatureTool):
         """
         if normalized is not None:
             return normalized
+        if not self.cache_size:
+            return self._normalize_signature(
+                module, function, file, line, module_offset, offset
+            )
+
+        # the offset only matters to frames that have nothing else
+        key = (
+            module,
+            function,
+            file,
+            line,
+            module_offset,
+            offset if not (module or module_offset) else None,
+            self.collapse_arguments,
+        )
+        with self._cache_lock:
+            try:
+                signature = self._cache.pop(key)
+            except KeyError:
+                pass
+            except TypeError:
+                # a frame with a value that can't be hashed
+                return self._normalize_signature(
+                    module, function, file, line, module_offset, offset
+                )
+            else:
+                self._cache[key] = signature
+                return signature
+
+        signature = self._normalize_signature(
+            module, function, file, line, module_offset, offset
+        )
+        with self._cache_lock:
+            self._cache[key] = signature
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return signature
+
+    def _normalize_signature(self, module, function, file, line, module_offset, offset):
         if function:
             function = self._collapse(
                 function,
@@ -238,30 +386,25 @@ class CSignatureTool(SignatureTool):
         """
         signature_notes = []
 
+        classifier = self.siglist_classifier
+
         # shorten source_list to the first signatureSentinel
-        sentinel_locations = []
-        for a_sentinel in self.signature_sentinels:
-            if type(a_sentinel) == tuple:
-                a_sentinel, condition_fn = a_sentinel
-                if not condition_fn(source_list):
-                    continue
-            try:
-                sentinel_locations.append(source_list.index(a_sentinel))
-            except ValueError:
-                pass
-        if sentinel_locations:
-            source_list = source_list[min(sentinel_locations):]
+        sentinel_location = classifier.find_sentinel(source_list)
+        if sentinel_location is not None:
+            source_list = source_list[sentinel_location:]
 
         # Get all the relevant frame signatures.
         new_signature_list = []
         for a_signature in source_list:
+            label = classifier.classify(a_signature)
+
             # If the signature matches the irrelevant signatures regex, skip to the next frame.
-            if self.irrelevant_signature_re.match(a_signature):
+            if label == classifier.IRRELEVANT:
                 continue
 
             # If the signature matches the trim dll signatures regex, rewrite it to remove all but
             # the module name.
-            if self.trim_dll_signature_re.match(a_signature):
+            if label == classifier.TRIM:
                 a_signature = a_signature.split('@')[0]
 
                 # If this trimmed DLL signature is the same as the previous frame's, we do not want
@@ -269,11 +412,16 @@ class CSignatureTool(SignatureTool):
                 if new_signature_list and a_signature == new_signature_list[-1]:
                     continue
 
+                # The trimmed signature may or may not be a prefix.
+                is_prefix = self.prefix_signature_re.match(a_signature)
+            else:
+                is_prefix = label == classifier.PREFIX
+
             new_signature_list.append(a_signature)
 
             # If the signature does not match the prefix signatures regex, then it is the last one
             # we add to the list.
-            if not self.prefix_signature_re.match(a_signature):
+            if not is_prefix:
                 break
 
         # Add a special marker for hang crash reports.
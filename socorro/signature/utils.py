@@ -0,0 +1,53 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+from socorro.lib.treelib import tree_get
+
+
+def convert_to_crash_data(raw_crash, processed_crash):
+    """Takes a raw crash and a processed crash and returns the minimal versions of them
+    that signature generation needs
+
+    :arg dict raw_crash: the raw crash data
+    :arg dict processed_crash: the processed crash data
+
+    :returns: tuple of (raw_crash_minimal, processed_crash_minimal)
+
+    """
+    raw_crash_minimal = {
+        'JavaStackTrace': raw_crash.get('JavaStackTrace', None),
+        'OOMAllocationSize': raw_crash.get('OOMAllocationSize', None),
+        'AbortMessage': raw_crash.get('AbortMessage', None),
+        'AsyncShutdownTimeout': raw_crash.get('AsyncShutdownTimeout', None),
+        'ipc_channel_error': raw_crash.get('ipc_channel_error', None),
+        'additional_minidumps': raw_crash.get('additional_minidumps', None),
+        'IPCMessageName': raw_crash.get('IPCMessageName', None),
+    }
+
+    processed_crash_minimal = {
+        'hang_type': processed_crash.get('hang_type', None),
+        'json_dump': {
+            'threads': tree_get(processed_crash, 'json_dump.threads', default=[]),
+            'system_info': {
+                'os': tree_get(processed_crash, 'json_dump.system_info.os', default=''),
+            },
+            'crash_info': {
+                'crashing_thread': tree_get(
+                    processed_crash, 'json_dump.crash_info.crashing_thread', default=None
+                ),
+            },
+        },
+        # NOTE(willkg): Classifications aren't available via the public API.
+        'classifications': {
+            'jit': {
+                'category': tree_get(processed_crash, 'classifications.jit.category', ''),
+            },
+        },
+        'mdsw_status_string': processed_crash.get('mdsw_status_string', None),
+
+        # This needs to be an empty string--the signature generator fills it in.
+        'signature': ''
+    }
+
+    return raw_crash_minimal, processed_crash_minimal
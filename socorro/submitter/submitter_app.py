@@ -154,8 +154,9 @@ class SubmitterFileSystemWalkerSource(CrashStorageBase):
             # yield the pathnames of all the crash parts - normally, this
             # method in a crashstorage class yields just a crash_id.  In this
             # case however, we have only pathnames to work with. So we return
-            # this (args, kwargs) form instead
-            yield (((prefix, crash_pathnames), ), {})
+            # this (args, kwargs) form instead.  It is all tuples so that it
+            # can be a key of the prefetched crashes.
+            yield (((prefix, tuple(crash_pathnames)), ), {})
 
 
 # this class was relocated to a more appropriate module and given a new name.
@@ -219,15 +220,29 @@ class SubmitterApp(FetchTransformSaveWithSeparateNewCrashSourceApp):
         """
         return current_value is None
 
+    def _fetch_crash(self, crash_id):
+        """the dumps are left in their files, they are read as the crash is
+        submitted"""
+        raw_crash = self.source.get_raw_crash(crash_id)
+        dumps = self.source.get_raw_dumps_as_files(crash_id)
+        return raw_crash, dumps
+
+    def _fetched_crash_size(self, fetched_crash):
+        # the dumps are still in their files
+        return 0
+
     def _transform(self, crash_id):
         """Transfers raw data from the source to the destination without changing the data
 
         """
         if self.config.submitter.dry_run:
+            if self.prefetcher is not None:
+                # the crash may have been fetched ahead, it must be claimed
+                # to make room for the next ones
+                self.prefetcher.claim(crash_id)
             print crash_id
         else:
-            raw_crash = self.source.get_raw_crash(crash_id)
-            dumps = self.source.get_raw_dumps_as_files(crash_id)
+            raw_crash, dumps = self._get_crash(crash_id)
             self.destination.save_raw_crash_with_file_dumps(
                 raw_crash,
                 dumps,
@@ -2,6 +2,8 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import threading
+
 from mock import Mock
 
 import pytest
@@ -39,6 +41,7 @@ class TestFetchTransformSaveApp(TestCase):
           'number_of_threads': 2,
           'maximum_queue_size': 2,
           'number_of_submissions': 'all',
+          'prefetch': DotDict({'number_of_threads': 0}),
           'source': DotDict({'crashstorage_class': None}),
           'destination': DotDict({'crashstorage_class': None}),
           'producer_consumer': DotDict({'producer_consumer_class':
@@ -110,6 +113,7 @@ class TestFetchTransformSaveApp(TestCase):
           'number_of_threads': 2,
           'maximum_queue_size': 2,
           'number_of_submissions': 'all',
+          'prefetch': DotDict({'number_of_threads': 0}),
           'source': DotDict({'crashstorage_class':
                                  FakeStorageSource}),
           'destination': DotDict({'crashstorage_class':
@@ -135,6 +139,69 @@ class TestFetchTransformSaveApp(TestCase):
         assert source.number_of_close_calls == 1
         assert destination.number_of_close_calls == 1
 
+    def test_prefetch(self):
+        class NonInfiniteFTSAppClass(FetchTransformSaveApp):
+            def _basic_iterator(self):
+                for x in self.source.new_crashes():
+                    yield ((x,), {})
+
+        class FakeStorageSource(object):
+            def __init__(self, config, quit_check_callback):
+                self.store = dict(
+                    (str(x), DotDict({'ooid': str(x)})) for x in range(20)
+                )
+                self.fetched_by = {}
+
+            def get_raw_crash(self, ooid):
+                self.fetched_by[ooid] = threading.current_thread().name
+                return self.store[ooid]
+
+            def get_raw_dumps(self, ooid):
+                return {'upload_file_minidump': 'this is a fake dump'}
+
+            def new_crashes(self):
+                for k in sorted(self.store.keys()):
+                    yield k
+
+        class FakeStorageDestination(object):
+            def __init__(self, config, quit_check_callback):
+                self.store = DotDict()
+
+            def save_raw_crash(self, raw_crash, dump, crash_id):
+                self.store[crash_id] = raw_crash
+
+        logger = SilentFakeLogger()
+        config = DotDict({
+          'logger': logger,
+          'number_of_submissions': 'all',
+          'prefetch': DotDict({'number_of_threads': 2,
+                               'maximum_crashes': 4,
+                               'maximum_bytes': 1000}),
+          'source': DotDict({'crashstorage_class':
+                                 FakeStorageSource}),
+          'destination': DotDict({'crashstorage_class':
+                                     FakeStorageDestination}),
+          'producer_consumer': DotDict({'producer_consumer_class':
+                                          ThreadedTaskManager,
+                                        'logger': logger,
+                                        'number_of_threads': 2,
+                                        'maximum_queue_size': 4}
+                                      )
+        })
+
+        fts_app = NonInfiniteFTSAppClass(config)
+        fts_app.main()
+
+        assert fts_app.destination.store == fts_app.source.store
+        fetched_by = fts_app.source.fetched_by.values()
+        assert any(name.startswith('Prefetcher') for name in fetched_by)
+        # the prefetcher is gone with its threads
+        assert fts_app.prefetcher is None
+        assert not [
+            a_thread for a_thread in threading.enumerate()
+            if a_thread.name.startswith('Prefetcher')
+        ]
+
     def test_source_iterator(self):
 
         faked_finished_func =  Mock()
@@ -178,6 +245,7 @@ class TestFetchTransformSaveApp(TestCase):
           'number_of_threads': 2,
           'maximum_queue_size': 2,
           'number_of_submissions': 'forever',
+          'prefetch': DotDict({'number_of_threads': 0}),
           'source': DotDict({'crashstorage_class':
                                  FakeStorageSource}),
           'destination': DotDict({'crashstorage_class':
@@ -234,6 +302,7 @@ class TestFetchTransformSaveApp(TestCase):
           'number_of_threads': 2,
           'maximum_queue_size': 2,
           'number_of_submissions': 'forever',
+          'prefetch': DotDict({'number_of_threads': 0}),
           'source': DotDict({'crashstorage_class':
                                  None}),
           'destination': DotDict({'crashstorage_class':
@@ -286,6 +355,7 @@ class TestFetchTransformSaveApp(TestCase):
           'number_of_threads': 2,
           'maximum_queue_size': 2,
           'number_of_submissions': 'forever',
+          'prefetch': DotDict({'number_of_threads': 0}),
           'source': DotDict({'crashstorage_class':
                                  FakeStorageSource}),
           'destination': DotDict({'crashstorage_class':
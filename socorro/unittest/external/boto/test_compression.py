@@ -0,0 +1,58 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import json
+
+import mock
+import pytest
+
+from socorro.external.boto import compression
+from socorro.external.boto.compression import (
+    GzipCodec,
+    PlainCodec,
+    ZstdCodec,
+    decode,
+)
+from socorro.lib.util import DotDict
+
+
+a_processed_crash = json.dumps({
+    'uuid': '936ce666-ff3b-4c7a-9674-367fe2120408',
+    'json_dump': {
+        'threads': [
+            {'frames': [{'function': 'js::GCMarker::processMarkStackTop'}] * 50}
+        ] * 10
+    },
+})
+
+
+class TestCodecs(object):
+    def test_plain(self):
+        codec = PlainCodec(DotDict())
+        assert codec.encode(a_processed_crash) == a_processed_crash
+        assert decode(a_processed_crash) == a_processed_crash
+
+    def test_gzip(self):
+        codec = GzipCodec(DotDict({'compression_level': 6}))
+        encoded = codec.encode(a_processed_crash)
+        assert encoded.startswith(GzipCodec.magic)
+        assert len(encoded) < len(a_processed_crash) / 10
+        assert decode(encoded) == a_processed_crash
+
+    def test_zstd_without_zstandard(self):
+        with mock.patch.object(compression, 'zstandard', None):
+            with pytest.raises(ImportError):
+                ZstdCodec(DotDict({'compression_level': 3}))
+            with pytest.raises(ImportError):
+                decode(ZstdCodec.magic + 'whatever')
+
+    @pytest.mark.skipif(
+        compression.zstandard is None,
+        reason='the zstandard package is not installed'
+    )
+    def test_zstd(self):
+        codec = ZstdCodec(DotDict({'compression_level': 3}))
+        encoded = codec.encode(a_processed_crash)
+        assert encoded.startswith(ZstdCodec.magic)
+        assert decode(encoded) == a_processed_crash
@@ -6,12 +6,14 @@ import datetime
 import json
 
 import mock
+import pytest
 
 from socorro.lib.util import DotDict
 from socorro.external.boto.connection_context import (
     DatePrefixKeyBuilder,
     SimpleDatePrefixKeyBuilder,
     KeyBuilderBase,
+    KeyLayoutResolver,
     KeyNotFound,
     S3ConnectionContext,
     RegionalS3ConnectionContext,
@@ -20,6 +22,7 @@ from socorro.external.boto.connection_context import (
 from socorro.database.transaction_executor import (
     TransactionExecutor,
 )
+from socorro.external.boto.compression import PlainCodec
 import socorro.unittest.testbase
 
 
@@ -73,7 +76,9 @@ class ConnectionContextTestCase(socorro.unittest.testbase.TestCase):
             'bucket_name': 'silliness',
             'keybuilder_class': KeyBuilderBase,
             'prefix': 'dev',
-            'calling_format': mock.Mock()
+            'calling_format': mock.Mock(),
+            'key_layout_cache_size': 1000,
+            'codec_class': PlainCodec,
         })
         config.update(extra)
         s3_conn = resource_class(config)
@@ -318,7 +323,9 @@ class MultiplePathsBase(socorro.unittest.testbase.TestCase):
             'bucket_name': 'silliness',
             'keybuilder_class': keybuilder_class,
             'prefix': 'dev',
-            'calling_format': mock.Mock()
+            'calling_format': mock.Mock(),
+            'key_layout_cache_size': 1000,
+            'codec_class': PlainCodec,
         })
         config.update(extra)
         s3_conn = resource_class(config)
@@ -580,3 +587,176 @@ class MultiplePathsTestCase(MultiplePathsBase):
             )
         assert connection_source._mocked_connection.get_bucket.call_count == 1
         assert connection_source._mocked_connection.get_bucket.return_value.get_key.call_count == 2
+
+    def mock_keys(self, connection_source, existing_keys):
+        """have the mocked bucket hold existing_keys and return a list of the
+        keys that are looked up"""
+        looked_up = []
+
+        def get_key(key):
+            looked_up.append(key)
+            if key in existing_keys:
+                key_object = mock.Mock()
+                key_object.get_contents_as_string.return_value = thing_as_str
+                return key_object
+            return None
+
+        bucket_mock = connection_source._mocked_connection.get_bucket.return_value
+        bucket_mock.get_key.side_effect = get_key
+        return looked_up
+
+    def test_fetch_tries_the_key_that_held_the_last_one_first(self):
+        connection_source = self.setup_mocked_s3_storage()
+        looked_up = self.mock_keys(connection_source, [
+            'dev/v1/raw_crash/fff13cf0-5671-4496-ab89-47a922141114',
+            'dev/v1/raw_crash/aaa13cf0-5671-4496-ab89-47a922141114',
+        ])
+
+        connection_source.fetch('fff13cf0-5671-4496-ab89-47a922141114', 'raw_crash')
+        assert len(looked_up) == 2
+        assert connection_source.key_layouts.misses == 1
+
+        # a crash of the same day goes straight to the v1 key
+        del looked_up[:]
+        result = connection_source.fetch(
+            'aaa13cf0-5671-4496-ab89-47a922141114', 'raw_crash'
+        )
+        assert result == thing_as_str
+        assert looked_up == [
+            'dev/v1/raw_crash/aaa13cf0-5671-4496-ab89-47a922141114'
+        ]
+        assert connection_source.key_layouts.hits == 1
+
+        # a crash of another day doesn't
+        del looked_up[:]
+        with pytest.raises(KeyNotFound):
+            connection_source.fetch(
+                'bbb13cf0-5671-4496-ab89-47a922141115', 'raw_crash'
+            )
+        assert looked_up == [
+            'dev/v2/raw_crash/bbb/20141115/bbb13cf0-5671-4496-ab89-47a922141115',
+            'dev/v1/raw_crash/bbb13cf0-5671-4496-ab89-47a922141115',
+        ]
+        assert connection_source.key_layouts.misses == 2
+
+    def test_fetch_falls_back_on_the_other_keys(self):
+        connection_source = self.setup_mocked_s3_storage()
+        looked_up = self.mock_keys(connection_source, [
+            'dev/v1/raw_crash/fff13cf0-5671-4496-ab89-47a922141114',
+            'dev/v2/raw_crash/aaa/20141114/aaa13cf0-5671-4496-ab89-47a922141114',
+        ])
+        connection_source.fetch('fff13cf0-5671-4496-ab89-47a922141114', 'raw_crash')
+
+        del looked_up[:]
+        result = connection_source.fetch(
+            'aaa13cf0-5671-4496-ab89-47a922141114', 'raw_crash'
+        )
+        assert result == thing_as_str
+        assert looked_up == [
+            'dev/v1/raw_crash/aaa13cf0-5671-4496-ab89-47a922141114',
+            'dev/v2/raw_crash/aaa/20141114/aaa13cf0-5671-4496-ab89-47a922141114',
+        ]
+        # the wrong guess is a miss
+        assert connection_source.key_layouts.hits == 0
+        assert connection_source.key_layouts.misses == 2
+        # and it's the v2 key that's tried first from now on
+        assert connection_source.key_layouts.order(
+            'raw_crash', 'fff13cf0-5671-4496-ab89-47a922141114', ['v2', 'v1']
+        ) == ['v2', 'v1']
+
+    def test_fetch_counts_go_to_metrics(self):
+        metrics = mock.Mock()
+        connection_source = self.setup_mocked_s3_storage(metrics=metrics)
+        self.mock_keys(connection_source, [
+            'dev/v1/raw_crash/fff13cf0-5671-4496-ab89-47a922141114',
+            'dev/v1/raw_crash/aaa13cf0-5671-4496-ab89-47a922141114',
+        ])
+        for crash_id in (
+            'fff13cf0-5671-4496-ab89-47a922141114',
+            'aaa13cf0-5671-4496-ab89-47a922141114',
+        ):
+            connection_source.fetch(crash_id, 'raw_crash')
+        assert metrics.increment.call_args_list == [
+            mock.call('boto.key_layouts.misses'),
+            mock.call('boto.key_layouts.hits'),
+        ]
+
+    def test_fetch_counts_without_metrics(self):
+        # no metrics in the configuration
+        connection_source = self.setup_mocked_s3_storage()
+        self.mock_keys(connection_source, [
+            'dev/v1/raw_crash/fff13cf0-5671-4496-ab89-47a922141114',
+        ])
+        connection_source.fetch('fff13cf0-5671-4496-ab89-47a922141114', 'raw_crash')
+        assert connection_source.key_layouts.misses == 1
+
+    def test_fetch_without_key_layout_cache(self):
+        connection_source = self.setup_mocked_s3_storage(key_layout_cache_size=0)
+        looked_up = self.mock_keys(connection_source, [
+            'dev/v1/raw_crash/fff13cf0-5671-4496-ab89-47a922141114',
+        ])
+        for i in range(2):
+            connection_source.fetch('fff13cf0-5671-4496-ab89-47a922141114', 'raw_crash')
+        assert len(looked_up) == 4
+        assert connection_source.key_layouts.hits == 0
+        assert connection_source.key_layouts.misses == 0
+
+
+class KeyLayoutResolverTestCase(socorro.unittest.testbase.TestCase):
+    def test_single_key_is_not_counted(self):
+        resolver = KeyLayoutResolver(10)
+        crash_id = 'fff13cf0-5671-4496-ab89-47a922141114'
+        resolver.record('dump', crash_id, ['v1'], 'v1')
+        assert resolver.order('dump', crash_id, ['v1']) == ['v1']
+        assert resolver.hits == resolver.misses == 0
+
+    def test_bounded(self):
+        resolver = KeyLayoutResolver(2)
+        for day in ('01', '02', '03'):
+            resolver.record(
+                'raw_crash', 'fff13cf0-5671-4496-ab89-47a9221411' + day,
+                ['v2', 'v1'], 'v1'
+            )
+        assert resolver.order(
+            'raw_crash', 'fff13cf0-5671-4496-ab89-47a922141101', ['v2', 'v1']
+        ) == ['v2', 'v1']
+        assert resolver.order(
+            'raw_crash', 'fff13cf0-5671-4496-ab89-47a922141103', ['v2', 'v1']
+        ) == ['v1', 'v2']
+
+    def test_hits_and_misses(self):
+        resolver = KeyLayoutResolver(10)
+        crash_id = 'fff13cf0-5671-4496-ab89-47a922141114'
+        keys = ['v2', 'v1']
+
+        # nothing to guess from
+        resolver.record('raw_crash', crash_id, keys, 'v1')
+        assert (resolver.hits, resolver.misses) == (0, 1)
+
+        # the guess held it
+        resolver.record('raw_crash', crash_id, keys, 'v1')
+        assert (resolver.hits, resolver.misses) == (1, 1)
+
+        # the guess was wrong
+        resolver.record('raw_crash', crash_id, keys, 'v2')
+        assert (resolver.hits, resolver.misses) == (1, 2)
+
+        # none of the keys held it, the last layout is still remembered
+        resolver.record('raw_crash', crash_id, keys, None)
+        assert (resolver.hits, resolver.misses) == (1, 3)
+        assert resolver.order('raw_crash', crash_id, keys) == ['v2', 'v1']
+        assert (resolver.hits, resolver.misses) == (1, 3)
+
+    def test_count_func(self):
+        count_func = mock.Mock()
+        resolver = KeyLayoutResolver(10, count_func=count_func)
+        crash_id = 'fff13cf0-5671-4496-ab89-47a922141114'
+        keys = ['v2', 'v1']
+        resolver.record('raw_crash', crash_id, keys, 'v1')
+        resolver.record('raw_crash', crash_id, keys, 'v1')
+        resolver.record('raw_crash', crash_id, keys, None)
+        assert count_func.call_args_list == [
+            mock.call('misses'),
+            mock.call('hits'),
+            mock.call('misses'),
+        ]
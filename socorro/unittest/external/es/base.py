@@ -782,12 +782,22 @@ def minimum_es_version(minimum_version):
 
 class SuperSearchWithFields(SuperSearch):
     """SuperSearch's get method requires to be passed the list of all fields.
-    This class does that automatically so we can just use `get()`. """
+    This class does that automatically so we can just use `get()`,
+    `get_batch()` and `iter_hits()`. """
 
     def get(self, **kwargs):
         kwargs['_fields'] = copy.deepcopy(SUPERSEARCH_FIELDS)
         return super(SuperSearchWithFields, self).get(**kwargs)
 
+    def get_batch(self, queries):
+        for kwargs in queries:
+            kwargs['_fields'] = copy.deepcopy(SUPERSEARCH_FIELDS)
+        return super(SuperSearchWithFields, self).get_batch(queries)
+
+    def iter_hits(self, **kwargs):
+        kwargs['_fields'] = copy.deepcopy(SUPERSEARCH_FIELDS)
+        return super(SuperSearchWithFields, self).iter_hits(**kwargs)
+
 
 class TestCaseWithConfig(TestCase):
     """A simple TestCase class that can create configuration objects.
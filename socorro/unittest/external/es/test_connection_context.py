@@ -2,9 +2,20 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
+import datetime
+import decimal
+import json
+
 import elasticsearch
+import mock
+import pytest
 
-from socorro.external.es.connection_context import ConnectionContext
+from socorro.external.es.connection_context import (
+    ConnectionContext,
+    JSONSerializer,
+    KnownIndices,
+)
+from socorro.lib.serializers import UJSONSerializer
 from socorro.unittest.external.es.base import ElasticsearchTestCase
 
 
@@ -43,3 +54,148 @@ class IntegrationTestConnectionContext(ElasticsearchTestCase):
         # exhaustive and well outside of the scope of this test suite; in the
         # interest of safety however, we'll check one here.
         assert client._connection.index
+
+
+class TestJSONSerializer(object):
+    def test_dumps(self):
+        serializer = JSONSerializer()
+        document = {
+            'date': datetime.datetime(2012, 4, 8, 10, 56, 41, 558922),
+            'dates': [datetime.date(2012, 4, 8)],
+            'price': decimal.Decimal('1.5'),
+            'path': 'a/b',
+        }
+        assert json.loads(serializer.dumps(document)) == {
+            'date': '2012-04-08T10:56:41.558922',
+            'dates': ['2012-04-08'],
+            'price': 1.5,
+            'path': 'a/b',
+        }
+        assert serializer.dumps('{"already": "serialized"}') == (
+            '{"already": "serialized"}'
+        )
+
+    @pytest.mark.parametrize('with_hooks', [False, True])
+    @pytest.mark.parametrize('ujson_refuses_unknown_types', [
+        UJSONSerializer._ujson_refuses_unknown_types,
+        # as with ujson 1.x, which writes dates as epoch integers
+        False,
+    ])
+    def test_dates_in_lists(self, ujson_refuses_unknown_types, with_hooks):
+        serializer = JSONSerializer()
+        if with_hooks:
+            serializer.hooks.append(mock.Mock())
+        document = {
+            'dates': [datetime.datetime(2012, 4, 8, 10, 56, 41, 558922)],
+            'frames': [{'date': datetime.date(2012, 4, 8)}],
+            'prices': [decimal.Decimal('1.5')],
+        }
+        with mock.patch.object(
+            UJSONSerializer,
+            '_ujson_refuses_unknown_types',
+            ujson_refuses_unknown_types
+        ):
+            body = serializer.dumps(document)
+        assert json.loads(body) == {
+            'dates': ['2012-04-08T10:56:41.558922'],
+            'frames': [{'date': '2012-04-08'}],
+            'prices': [1.5],
+        }
+
+    def test_unserializable(self):
+        with pytest.raises(elasticsearch.exceptions.SerializationError):
+            JSONSerializer().dumps({'a': [object()]})
+
+    def test_hooks(self):
+        serializer = JSONSerializer()
+        hook = mock.Mock()
+        serializer.hooks.append(hook)
+        document = {'a': {'b': [1, 2]}, 'c': 'd', 1: None}
+
+        body = serializer.dumps(document)
+
+        assert json.loads(body) == {'a': {'b': [1, 2]}, 'c': 'd', '1': None}
+        hook.assert_called_once_with(document, {
+            'a': len('{"b":[1,2]}'),
+            'c': len('"d"'),
+            1: len('null'),
+        })
+
+        # only mappings are measured
+        serializer.dumps([document])
+        assert hook.call_count == 1
+
+
+class TestKnownIndices(object):
+    def get_es_context(self):
+        es_context = mock.Mock()
+        es_context.indices_client.return_value.get_aliases.return_value = {
+            'socorro201801_20180101': {'aliases': {'socorro201801': {}}},
+            'socorro201802': {'aliases': {}},
+        }
+        return es_context
+
+    def test_existing(self):
+        es_context = self.get_es_context()
+        known_indices = KnownIndices(refresh_interval=60)
+
+        indices = ['socorro201801', 'socorro201802', 'socorro201803']
+        assert known_indices.existing(es_context, indices) == [
+            'socorro201801', 'socorro201802'
+        ]
+        assert 'socorro201801_20180101' in known_indices
+
+        # the list isn't asked again before the refresh interval
+        known_indices.add('socorro201803')
+        assert known_indices.existing(es_context, indices) == indices
+        get_aliases = es_context.indices_client.return_value.get_aliases
+        assert get_aliases.call_count == 1
+
+    def test_refresh(self):
+        es_context = self.get_es_context()
+        known_indices = KnownIndices(refresh_interval=60)
+        known_indices.add('socorro201803')
+
+        with mock.patch('socorro.external.es.connection_context.time') as mocked_time:
+            mocked_time.time.return_value = 1000
+            assert known_indices.existing(es_context, ['socorro201803']) == []
+            mocked_time.time.return_value = 1059
+            known_indices.add('socorro201803')
+            assert known_indices.existing(es_context, ['socorro201803']) == [
+                'socorro201803'
+            ]
+            # the index was deleted since
+            mocked_time.time.return_value = 1060
+            assert known_indices.existing(es_context, ['socorro201803']) == []
+
+        get_aliases = es_context.indices_client.return_value.get_aliases
+        assert get_aliases.call_count == 2
+
+    def test_refresh_errors(self):
+        es_context = self.get_es_context()
+        get_aliases = es_context.indices_client.return_value.get_aliases
+        get_aliases.side_effect = elasticsearch.exceptions.ConnectionError()
+        known_indices = KnownIndices(refresh_interval=60)
+        indices = ['socorro201801', 'socorro201803']
+
+        with mock.patch('socorro.external.es.connection_context.time') as mocked_time:
+            mocked_time.time.return_value = 1000
+            # no list yet, nothing is trimmed
+            assert known_indices.existing(es_context, indices) == indices
+            # and the cluster isn't asked again before the refresh interval
+            assert known_indices.existing(es_context, indices) == indices
+            assert get_aliases.call_count == 1
+
+            get_aliases.side_effect = None
+            mocked_time.time.return_value = 1060
+            assert known_indices.existing(es_context, indices) == [
+                'socorro201801'
+            ]
+
+            # the previous list is kept
+            get_aliases.side_effect = elasticsearch.exceptions.ConnectionError()
+            mocked_time.time.return_value = 1120
+            assert known_indices.existing(es_context, indices) == [
+                'socorro201801'
+            ]
+        assert get_aliases.call_count == 3
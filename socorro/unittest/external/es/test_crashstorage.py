@@ -10,6 +10,7 @@ import mock
 import pytest
 
 from socorro.external.crashstorage_base import Redactor
+from socorro.external.es import connection_context
 from socorro.external.es.crashstorage import (
     is_valid_key,
     ESCrashStorage,
@@ -19,6 +20,7 @@ from socorro.external.es.crashstorage import (
     RawCrashRedactor,
 )
 from socorro.lib.datetimeutil import string_to_datetime
+from socorro.lib.serializers import iso_serializer
 from socorro.unittest.external.es.base import (
     ElasticsearchTestCase,
     TestCaseWithConfig,
@@ -134,6 +136,13 @@ a_raw_crash = {
 }
 
 
+def with_datetimes(processed_crash):
+    """returns a copy of the processed crash as ESCrashStorage indexes it"""
+    processed_crash = deepcopy(processed_crash)
+    ESCrashStorage.reconstitute_datetimes(processed_crash)
+    return processed_crash
+
+
 class TestRawCrashRedactor(TestCaseWithConfig):
     """Test the custom RawCrashRedactor class does indeed redact crashes.
     """
@@ -317,7 +326,8 @@ class TestESCrashStorage(ElasticsearchTestCase):
         self.config = self.get_tuned_config(ESCrashStorage)
 
     def setUp(self):
-        pass
+        # the indices created by the other tests are known to exist
+        connection_context._known_indices.clear()
 
     def tearDown(self):
         pass
@@ -414,7 +424,7 @@ class TestESCrashStorage(ElasticsearchTestCase):
         # The actual call to index the document (crash).
         document = {
             'crash_id': crash_id,
-            'processed_crash': a_processed_crash,
+            'processed_crash': with_datetimes(a_processed_crash),
             'raw_crash': a_raw_crash
         }
 
@@ -451,6 +461,7 @@ class TestESCrashStorage(ElasticsearchTestCase):
         espy_mock.Elasticsearch.return_value = sub_mock
 
         es_storage = ESCrashStorageRedactedSave(config=modified_config)
+        assert es_storage.is_mutator()
 
         crash_id = a_processed_crash['uuid']
 
@@ -605,7 +616,7 @@ class TestESCrashStorage(ElasticsearchTestCase):
         # The actual call to index the document (crash).
         document = {
             'crash_id': crash_id,
-            'processed_crash': a_processed_crash,
+            'processed_crash': with_datetimes(a_processed_crash),
             'raw_crash': a_raw_crash  # Note here we expect the original dict
         }
 
@@ -720,7 +731,7 @@ class TestESCrashStorage(ElasticsearchTestCase):
         # The actual call to index the document (crash).
         document = {
             'crash_id': crash_id,
-            'processed_crash': a_processed_crash,
+            'processed_crash': with_datetimes(a_processed_crash),
             'raw_crash': a_raw_crash
         }
 
@@ -807,6 +818,93 @@ class TestESCrashStorage(ElasticsearchTestCase):
             id=crash_id
         )
 
+        # The crash itself is left as it is for the other crash stores.
+        assert processed_crash == {
+            'date_processed': '2012-04-08 10:56:41.558922',
+            'bogus-field': 'some bogus value',
+            'foo': 'bar',
+        }
+
+    @mock.patch('elasticsearch.client')
+    @mock.patch('elasticsearch.Elasticsearch')
+    def test_indexing_bogus_nested_field(self, es_class_mock, es_client_mock):
+        backoff_config = self.config
+        backoff_config['backoff_delays'] = [0, 0, 0]
+        backoff_config['wait_log_interval'] = 0
+
+        es_storage = ESCrashStorage(config=self.config)
+        assert not es_storage.is_mutator()
+
+        crash_id = a_processed_crash['uuid']
+        raw_crash = {
+            'ProductName': 'WaterWolf',
+            'bad key': 'value',
+        }
+        processed_crash = {
+            'date_processed': '2012-04-08 10:56:41.558922',
+            'json_dump': {
+                'bogus-field': 1234567890,
+                'foo': 'bar',
+            },
+        }
+
+        def mock_index(*args, **kwargs):
+            json_dump = kwargs['body']['processed_crash']['json_dump']
+            if 'bogus-field' in json_dump:
+                raise elasticsearch.exceptions.TransportError(
+                    400,
+                    'MapperParsingException[failed to parse '
+                    '[processed_crash.json_dump.bogus-field]]; nested: '
+                    'NumberFormatException[For input string: '
+                    '"18446744073709480735"]; '
+                )
+
+            return True
+
+        es_class_mock().index.side_effect = mock_index
+
+        es_storage.save_raw_and_processed(
+            raw_crash,
+            None,
+            processed_crash,
+            crash_id
+        )
+
+        expected_doc = {
+            'crash_id': crash_id,
+            'removed_fields': 'processed_crash.json_dump.bogus-field',
+            'processed_crash': {
+                'date_processed': string_to_datetime(
+                    '2012-04-08 10:56:41.558922'
+                ),
+                'json_dump': {
+                    'foo': 'bar',
+                },
+            },
+            'raw_crash': {
+                'ProductName': 'WaterWolf',
+            },
+        }
+        es_class_mock().index.assert_called_with(
+            index=self.config.elasticsearch.elasticsearch_index,
+            doc_type=self.config.elasticsearch.elasticsearch_doctype,
+            body=expected_doc,
+            id=crash_id
+        )
+
+        # The crash itself is left as it is for the other crash stores.
+        assert raw_crash == {
+            'ProductName': 'WaterWolf',
+            'bad key': 'value',
+        }
+        assert processed_crash == {
+            'date_processed': '2012-04-08 10:56:41.558922',
+            'json_dump': {
+                'bogus-field': 1234567890,
+                'foo': 'bar',
+            },
+        }
+
     @mock.patch('elasticsearch.client')
     @mock.patch('elasticsearch.Elasticsearch')
     def test_indexing_bogus_number_field(self, es_class_mock, es_client_mock):
@@ -926,18 +1024,37 @@ class TestESCrashStorage(ElasticsearchTestCase):
     def test_crash_size_capture(self):
         """Verify we capture raw/processed crash sizes in ES crashstorage"""
         es_storage = ESCrashStorage(config=self.config)
+        crash_document = {
+            'crash_id': a_processed_crash['uuid'],
+            'processed_crash': a_processed_crash_with_no_stackwalker,
+            'raw_crash': a_raw_crash,
+        }
 
-        es_storage._submit_crash_to_elasticsearch = mock.Mock()
+        # the sizes are those of the body sent to elasticsearch
+        body = es_storage.es_context.serializer.dumps(crash_document)
 
-        es_storage.save_raw_and_processed(
-            raw_crash=a_raw_crash,
-            dumps=None,
-            processed_crash=a_processed_crash,
-            crash_id=a_processed_crash['uuid']
+        raw_crash_size = len(iso_serializer.dumps(a_raw_crash))
+        processed_crash_size = len(
+            iso_serializer.dumps(a_processed_crash_with_no_stackwalker)
         )
-
-        mock_calls = [str(call) for call in self.config.metrics.mock_calls]
-        # NOTE(willkg): The sizes of these json documents depend on what's in them. If we changed
-        # a_processed_crash and a_raw_crash, then these numbers will change.
-        assert 'call.histogram(\'processor.es.raw_crash_size\', 27)' in mock_calls
-        assert 'call.histogram(\'processor.es.processed_crash_size\', 1785)' in mock_calls
+        assert iso_serializer.dumps(a_raw_crash) in body
+        self.config.metrics.histogram.assert_has_calls([
+            mock.call('processor.es.raw_crash_size', raw_crash_size),
+            mock.call('processor.es.processed_crash_size', processed_crash_size),
+        ], any_order=True)
+        assert self.config.metrics.histogram.call_count == 2
+
+        # other documents are left alone
+        es_storage.es_context.serializer.dumps({'query': {'match_all': {}}})
+        assert self.config.metrics.histogram.call_count == 2
+
+    def test_crash_size_capture_failure(self):
+        es_storage = ESCrashStorage(config=self.config)
+        self.config.metrics.histogram.side_effect = ValueError('no metrics')
+        body = es_storage.es_context.serializer.dumps({
+            'crash_id': a_processed_crash['uuid'],
+            'processed_crash': {},
+            'raw_crash': a_raw_crash,
+        })
+        assert '"raw_crash":' in body
+        assert self.config.logger.exception.call_count == 2
@@ -830,6 +830,51 @@ class IntegrationTestSuperSearch(ElasticsearchTestCase):
         assert res['hits']
         assert len(res['hits']) == res['total']
 
+    @minimum_es_version('1.0')
+    def test_get_with_no_results(self):
+        self.index_crash({
+            'signature': 'js::break_your_browser',
+            'product': 'WaterWolf',
+            'date_processed': self.now,
+        })
+        self.index_crash({
+            'signature': 'js::break_your_browser',
+            'product': 'NightTrain',
+            'date_processed': self.now,
+        })
+        self.index_crash({
+            'signature': 'foo(bar)',
+            'product': 'WaterWolf',
+            'date_processed': self.now,
+        })
+        self.refresh_index()
+
+        # Only the facets are asked for, the total still counts all the
+        # crashes that match.
+        res = self.api.get(
+            _results_number=0,
+            _facets=['signature'],
+        )
+        assert res['hits'] == []
+        assert res['total'] == 3
+        assert res['facets']['signature'] == [
+            {'term': 'js::break_your_browser', 'count': 2},
+            {'term': 'foo(bar)', 'count': 1},
+        ]
+
+        # With filters.
+        res = self.api.get(
+            _results_number=0,
+            _facets=['signature'],
+            product='WaterWolf',
+        )
+        assert res['hits'] == []
+        assert res['total'] == 2
+        assert res['facets']['signature'] == [
+            {'term': 'foo(bar)', 'count': 1},
+            {'term': 'js::break_your_browser', 'count': 1},
+        ]
+
     @minimum_es_version('1.0')
     def test_get_with_cardinality(self):
         self.index_crash({
@@ -1832,6 +1877,78 @@ class IntegrationTestSuperSearch(ElasticsearchTestCase):
         assert 'aggs' in query
         assert 'size' in query
 
+    @minimum_es_version('1.0')
+    def test_get_batch(self):
+        self.index_crash({
+            'signature': 'js::break_your_browser',
+            'product': 'WaterWolf',
+            'date_processed': self.now,
+        })
+        self.index_crash({
+            'signature': 'foo(bar)',
+            'product': 'NightTrain',
+            'date_processed': self.now,
+        })
+        self.refresh_index()
+
+        queries = [
+            {'signature': '=foo(bar)', '_columns': ['signature']},
+            {'_results_number': 0, '_facets': ['product']},
+            {'signature': 'js', '_return_query': True},
+        ]
+        res = self.api.get_batch(queries)
+        assert len(res) == 3
+
+        assert res[0]['total'] == 1
+        assert res[0]['hits'] == [{'signature': 'foo(bar)'}]
+
+        assert res[1]['total'] == 2
+        assert res[1]['hits'] == []
+        assert res[1]['facets']['product'] == [
+            {'term': 'NightTrain', 'count': 1},
+            {'term': 'WaterWolf', 'count': 1},
+        ]
+
+        assert 'query' in res[2]
+        assert 'indices' in res[2]
+
+        # Each result is the one of a call to get().
+        assert res[0] == self.api.get(
+            signature='=foo(bar)', _columns=['signature']
+        )
+
+    @minimum_es_version('1.0')
+    def test_get_batch_with_missing_indices(self):
+        config = self.get_base_config(es_index='socorro_test_reports_%W')
+        api = SuperSearchWithFields(config=config)
+
+        res = api.get_batch([
+            {'date': ['>2000-01-01T00:00:00', '<2000-01-10T00:00:00']},
+        ])
+        assert len(res) == 1
+        assert res[0]['total'] == 0
+        assert len(res[0]['hits']) == 0
+        assert len(res[0]['errors']) == 3  # 3 weeks are missing
+        for error in res[0]['errors']:
+            assert error['type'] == 'missing_index'
+
+    @minimum_es_version('1.0')
+    def test_iter_hits(self):
+        self.index_many_crashes(25, {
+            'signature': 'js::break_your_browser',
+            'date_processed': self.now,
+        })
+        self.refresh_index()
+
+        hits = self.api.iter_hits(_columns=['signature'], _results_number=2)
+        assert list(hits) == [{'signature': 'js::break_your_browser'}] * 25
+
+        with pytest.raises(BadArgumentError):
+            self.api.iter_hits(_results_number=-1)
+
+        with pytest.raises(BadArgumentError):
+            self.api.iter_hits(_columns=['signature'], _results_number=0)
+
     @minimum_es_version('1.0')
     def test_get_with_zero(self):
         res = self.api.get(
@@ -14,7 +14,6 @@ from configman.dotdict import DotDict
 from socorro.external.fs.crashstorage import (
     TarFileWritingCrashStore,
     TarFileSequentialReadingCrashStore,
-    dates_to_strings_for_json
 )
 from socorro.external.crashstorage_base import Redactor
 from socorro.unittest.testbase import TestCase
@@ -64,10 +63,6 @@ class TestTarFileWritingCrashStorage(TestCase):
             'payload': 'nothing to see here',
             'some_date': datetime(1960, 5, 4, 15, 10)
         }
-        processed_crash_as_str = json.dumps(
-            processed_crash,
-            default=dates_to_strings_for_json
-        )
 
         # the call to be tested
         tar_store.save_processed(processed_crash)
@@ -84,8 +79,12 @@ class TestTarFileWritingCrashStorage(TestCase):
         reconstituted_processed_crash_as_str = result_gzip_fp.read().strip()
 
         eq_(
-            processed_crash_as_str,
-            reconstituted_processed_crash_as_str
+            json.loads(reconstituted_processed_crash_as_str),
+            {
+                'crash_id': '091204bd-87c0-42ba-8f58-554492141212',
+                'payload': 'nothing to see here',
+                'some_date': '1960-05-04T15:10:00'
+            }
         )
 
 
@@ -6,7 +6,7 @@ import time
 
 import mock
 from nose.tools import eq_, ok_, assert_raises
-from psycopg2 import OperationalError
+from psycopg2 import OperationalError, ProgrammingError
 
 from configman import ConfigurationManager
 from configman.dotdict import DotDict
@@ -17,6 +17,7 @@ from socorro.database.transaction_executor import (
 )
 from socorro.external.postgresql.crashstorage import (
     PostgreSQLBasicCrashStorage,
+    PostgreSQLBatchedCrashStorage,
     PostgreSQLCrashStorage,
 )
 from socorro.unittest.testbase import TestCase
@@ -421,8 +422,8 @@ class TestPostgresCrashStorage(TestCase):
             """, {
                 'crash_id': '936ce666-ff3b-4c7a-9674-367fe2120408',
                 'raw_crash': (
-                    '{"submitted_timestamp": "2012-04-08 10:52:42.0", '
-                    '"Version": "6.02E23", "ProductName": "Fennicky"}'
+                    '{"submitted_timestamp":"2012-04-08 10:52:42.0",'
+                    '"Version":"6.02E23","ProductName":"Fennicky"}'
                 ),
                 'date_processed': "2012-04-08 10:52:42.0"
             }),),)
@@ -654,3 +655,144 @@ class TestPostgresCrashStorage(TestCase):
                     'select raw_crash from raw_crashes_20120402 where uuid = %s',
                     ('936ce666-ff3b-4c7a-9674-367fe2120408',)
                 )
+
+
+class TestPostgresBatchedCrashStorage(TestCase):
+    """
+    Tests where the actual PostgreSQL part is mocked.
+    """
+
+    def _get_crashstorage(self, batch_size=100, batch_max_age=60):
+        config = DotDict()
+        config.database_class = mock.MagicMock()
+        config.transaction_executor_class = TransactionExecutorWithInfiniteBackoff
+        config.redactor_class = mock.Mock()
+        config.backoff_delays = [1]
+        config.wait_log_interval = 10
+        config.logger = mock.Mock()
+        config.batch_size = batch_size
+        config.batch_max_age = batch_max_age
+
+        mocked_connection = (
+            config.database_class.return_value.return_value
+            .__enter__.return_value
+        )
+        self.mocked_cursor = (
+            mocked_connection.cursor.return_value.__enter__.return_value
+        )
+        self.mocked_cursor.mogrify.side_effect = (
+            lambda sql, row: sql % tuple(repr(value) for value in row)
+        )
+        crashstorage = PostgreSQLBatchedCrashStorage(config)
+        self.addCleanup(crashstorage.close)
+        return crashstorage
+
+    def _executed_sql(self):
+        return [a_call[0][0] for a_call in self.mocked_cursor.execute.call_args_list]
+
+    @staticmethod
+    def _processed_crash(crash_id):
+        processed_crash = dict(a_processed_crash)
+        processed_crash['uuid'] = crash_id
+        return processed_crash
+
+    def test_save_when_the_batch_is_full(self):
+        crashstorage = self._get_crashstorage(batch_size=2)
+        crash_id = a_processed_crash['uuid']
+
+        crashstorage.save_raw_crash(a_raw_crash, empty_tuple, crash_id)
+        eq_(self.mocked_cursor.execute.call_count, 0)
+        crashstorage.save_processed(a_processed_crash)
+
+        executed_sql = self._executed_sql()
+        eq_(len(executed_sql), 4)
+        sql_fragments = [
+            'INSERT INTO batch_raw_crashes_20120402',
+            'INSERT INTO batch_reports_20120402',
+            'INSERT INTO batch_processed_crashes_20120402',
+            'INSERT INTO plugins',
+        ]
+        for sql, a_fragment in zip(executed_sql, sql_fragments):
+            ok_(a_fragment in sql)
+        ok_('UPDATE raw_crashes_20120402 SET' in executed_sql[0])
+        ok_("'dwight.txt', 'wilma'" in executed_sql[3])
+
+    def test_a_batch_of_several_crashes_and_partitions(self):
+        crashstorage = self._get_crashstorage(batch_size=3)
+        crash_ids = [
+            '936ce666-ff3b-4c7a-9674-367fe2120408',
+            '2b6f0667-cd5b-4c10-a0a1-d82fb2120408',
+            '6bf8e6b4-f7f0-4dfe-b2d7-9f1b02120416',
+        ]
+        for crash_id in crash_ids:
+            crashstorage.save_processed(self._processed_crash(crash_id))
+
+        executed_sql = self._executed_sql()
+        # one merge per table and partition, the plugin is inserted once
+        eq_(len(executed_sql), 5)
+        ok_('INSERT INTO batch_reports_20120402' in executed_sql[0])
+        ok_(crash_ids[0] in executed_sql[0])
+        ok_(crash_ids[1] in executed_sql[0])
+        ok_(crash_ids[2] not in executed_sql[0])
+        ok_('INSERT INTO batch_reports_20120416' in executed_sql[2])
+        ok_(crash_ids[2] in executed_sql[2])
+        eq_(executed_sql[4].count('dwight.txt'), 1)
+
+    def test_the_last_save_of_a_crash_wins(self):
+        crashstorage = self._get_crashstorage()
+        crash_id = a_processed_crash['uuid']
+        raw_crash = dict(a_raw_crash)
+        crashstorage.save_raw_crash(raw_crash, empty_tuple, crash_id)
+        raw_crash['ProductName'] = 'Firefox'
+        crashstorage.save_raw_crash(raw_crash, empty_tuple, crash_id)
+        # the rows were made at save time
+        raw_crash['ProductName'] = 'Thunderbird'
+
+        crashstorage.close()
+        executed_sql = self._executed_sql()
+        eq_(len(executed_sql), 1)
+        eq_(executed_sql[0].count(crash_id), 1)
+        ok_('Firefox' in executed_sql[0])
+        ok_('Fennicky' not in executed_sql[0])
+
+    def test_save_old_batch(self):
+        crashstorage = self._get_crashstorage(batch_max_age=0.01)
+        crashstorage.save_raw_crash(
+            a_raw_crash,
+            empty_tuple,
+            a_processed_crash['uuid']
+        )
+
+        for x in range(100):
+            if self.mocked_cursor.execute.call_count:
+                break
+            time.sleep(0.01)
+        eq_(self.mocked_cursor.execute.call_count, 1)
+        ok_('INSERT INTO batch_raw_crashes_20120402' in self._executed_sql()[0])
+
+    def test_save_crashes_one_at_a_time_when_the_batch_fails(self):
+        crashstorage = self._get_crashstorage(batch_size=2)
+        good_crash_id = '936ce666-ff3b-4c7a-9674-367fe2120408'
+        bad_crash_id = '2b6f0667-cd5b-4c10-a0a1-d82fb2120408'
+
+        def execute(sql):
+            if bad_crash_id in sql:
+                raise ProgrammingError('bad')
+        self.mocked_cursor.execute.side_effect = execute
+
+        crashstorage.save_processed(self._processed_crash(good_crash_id))
+        crashstorage.save_processed(self._processed_crash(bad_crash_id))
+
+        executed_sql = self._executed_sql()
+        # the batch, then the good crash alone, then the bad crash alone
+        eq_(len(executed_sql), 5)
+        ok_(good_crash_id in executed_sql[0] and bad_crash_id in executed_sql[0])
+        ok_(good_crash_id in executed_sql[1])
+        ok_(good_crash_id in executed_sql[2])
+        ok_('INSERT INTO plugins' in executed_sql[3])
+        ok_(bad_crash_id in executed_sql[4])
+        crashstorage.config.logger.error.assert_called_once_with(
+            'could not save %s to postgres',
+            bad_crash_id,
+            exc_info=True
+        )
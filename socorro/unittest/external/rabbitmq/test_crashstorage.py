@@ -1,3 +1,5 @@
+from collections import OrderedDict
+
 from mock import Mock, MagicMock, patch
 
 from nose.tools import eq_, ok_
@@ -5,6 +7,7 @@ from nose.tools import eq_, ok_
 from socket import timeout
 
 from socorro.external.rabbitmq.crashstorage import (
+    RabbitMQConsumerCrashStorage,
     RabbitMQCrashStorage,
 )
 from socorro.lib.util import DotDict
@@ -464,3 +467,242 @@ class TestCrashStorage(TestCase):
         expected = ['normal_crash_id', 'reprocessing_crash_id']
         for result in crash_store.new_crashes():
             eq_(expected.pop(), result)
+
+
+class FakeChannel(object):
+    """a channel of a pika BlockingConnection that delivers the crashes of
+    its queues to their consumers, no more than the prefetch count of
+    unacknowledged crashes per consumer"""
+
+    def __init__(self, queues):
+        self.queues = queues
+        self.consumers = []
+        self.acks = []
+        self.delivery_tag = 0
+        self.prefetch_count = 0
+        self.unacknowledged_tags = {}
+        self.basic_qos = Mock(side_effect=self._set_prefetch_count)
+
+    def _set_prefetch_count(self, prefetch_count):
+        self.prefetch_count = prefetch_count
+
+    def basic_consume(self, consumer_callback, queue):
+        self.consumers.append((queue, consumer_callback))
+
+    def deliver(self, time_limit=None):
+        for queue, consumer_callback in self.consumers:
+            while self.queues.get(queue) and (
+                not self.prefetch_count or
+                self.unacknowledged_count(queue) < self.prefetch_count
+            ):
+                self.delivery_tag += 1
+                self.unacknowledged_tags[self.delivery_tag] = queue
+                method_frame = DotDict()
+                method_frame.delivery_tag = self.delivery_tag
+                consumer_callback(
+                    self, method_frame, None, self.queues[queue].pop(0)
+                )
+
+    def unacknowledged_count(self, queue):
+        return self.unacknowledged_tags.values().count(queue)
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+        if multiple:
+            for a_tag in list(self.unacknowledged_tags):
+                if a_tag <= delivery_tag:
+                    del self.unacknowledged_tags[a_tag]
+        else:
+            del self.unacknowledged_tags[delivery_tag]
+
+    def queue_declare(self, queue, durable, passive):
+        queue_status = DotDict()
+        queue_status.method = DotDict()
+        queue_status.method.message_count = len(self.queues.get(queue, ()))
+        return queue_status
+
+
+class TestConsumerCrashStorage(TestCase):
+
+    def _setup_config(self):
+        config = DotDict()
+        config.transaction_executor_class = TransactionExecutor
+        config.backoff_delays = (0, 0, 0)
+        config.logger = Mock()
+        config.metrics = Mock()
+        config.rabbitmq_class = MagicMock()
+        config.routing_key = 'socorro.normal'
+        config.filter_on_legacy_processing = True
+        config.redactor_class = Redactor
+        config.forbidden_keys = Redactor.required_config.forbidden_keys.default
+        config.throttle = 100
+        config.prefetch_count = 10
+        config.priority_queue_weight = 4
+        config.standard_queue_weight = 2
+        config.reprocessing_queue_weight = 1
+        config.lag_metrics_interval = 60
+        return config
+
+    def _setup_crash_store(self, config, queues):
+        config.rabbitmq_class.return_value.config.standard_queue_name = \
+            'socorro.normal'
+        config.rabbitmq_class.return_value.config.reprocessing_queue_name = \
+            'socorro.reprocessing'
+        config.rabbitmq_class.return_value.config.priority_queue_name = \
+            'socorro.priority'
+        crash_store = RabbitMQConsumerCrashStorage(config)
+        self.connection = \
+            crash_store.rabbitmq.return_value.__enter__.return_value
+        self.connect(queues)
+        return crash_store
+
+    def connect(self, queues):
+        self.channel = FakeChannel(queues)
+        self.connection.channel = self.channel
+        self.connection.connection.process_data_events.side_effect = \
+            self.channel.deliver
+
+    def test_weighted_schedule(self):
+        schedule = RabbitMQConsumerCrashStorage._weighted_schedule(
+            OrderedDict((('p', 4), ('s', 2), ('r', 1)))
+        )
+        eq_(''.join(schedule), 'psprpsp')
+        eq_(
+            RabbitMQConsumerCrashStorage._weighted_schedule(
+                OrderedDict((('p', 1), ('s', 1), ('r', 1)))
+            ),
+            ['p', 's', 'r']
+        )
+
+    def test_new_crashes_in_weighted_order(self):
+        config = self._setup_config()
+        crash_store = self._setup_crash_store(config, {
+            'socorro.priority': ['p1', 'p2', 'p3', 'p4', 'p5'],
+            'socorro.normal': ['n1', 'n2', 'n3'],
+            'socorro.reprocessing': ['r1', 'r2'],
+        })
+
+        eq_(
+            list(crash_store.new_crashes()),
+            [
+                'p1', 'n1', 'p2', 'r1', 'p3', 'n2', 'p4',
+                'p5', 'n3', 'r2',
+            ]
+        )
+        self.channel.basic_qos.assert_called_once_with(prefetch_count=10)
+        eq_(
+            [queue for queue, _ in self.channel.consumers],
+            ['socorro.priority', 'socorro.normal', 'socorro.reprocessing']
+        )
+
+    def test_acknowledgements_are_batched(self):
+        config = self._setup_config()
+        crash_store = self._setup_crash_store(config, {
+            'socorro.normal': ['crash_1', 'crash_2', 'crash_3', 'crash_4'],
+        })
+        new_crashes = crash_store.new_crashes()
+        eq_(
+            [next(new_crashes) for x in range(3)],
+            ['crash_1', 'crash_2', 'crash_3']
+        )
+
+        # crash_1 holds back the others
+        crash_store.ack_crash('crash_3')
+        crash_store.ack_crash('crash_2')
+        eq_(next(new_crashes), 'crash_4')
+        eq_(self.channel.acks, [])
+
+        crash_store.ack_crash('crash_1')
+        crash_store.ack_crash('crash_4')
+        eq_(list(new_crashes), [])
+        eq_(self.channel.acks, [(4, True)])
+        eq_(crash_store.acknowledgement_token_cache, {})
+
+    def test_acknowledgements_held_back_too_long(self):
+        config = self._setup_config()
+        config.prefetch_count = 4
+        crash_store = self._setup_crash_store(config, {
+            'socorro.normal': [
+                'crash_1', 'crash_2', 'crash_3', 'crash_4', 'crash_5',
+                'crash_6',
+            ],
+            'socorro.priority': ['crash_7'],
+        })
+        new_crashes = crash_store.new_crashes()
+        eq_(
+            [next(new_crashes) for x in range(4)],
+            ['crash_7', 'crash_1', 'crash_2', 'crash_3']
+        )
+        # the prefetch limit of the queue is reached
+        eq_(self.channel.queues['socorro.normal'], ['crash_5', 'crash_6'])
+
+        # crash_1 holds back half of the prefetch limit of its queue
+        crash_store.ack_crash('crash_7')
+        crash_store.ack_crash('crash_2')
+        crash_store.ack_crash('crash_3')
+        eq_(next(new_crashes), 'crash_4')
+        eq_(self.channel.acks, [(1, True), (3, False), (4, False)])
+
+        # so RabbitMQ goes on delivering
+        eq_(list(new_crashes), ['crash_5', 'crash_6'])
+        eq_(self.channel.queues['socorro.normal'], [])
+
+        for crash_id in ('crash_1', 'crash_4', 'crash_5', 'crash_6'):
+            crash_store.ack_crash(crash_id)
+        eq_(list(crash_store.new_crashes()), [])
+        eq_(
+            self.channel.acks,
+            [(1, True), (3, False), (4, False), (7, True)]
+        )
+        eq_(self.channel.unacknowledged_tags, {})
+
+    def test_duplicate_crashes(self):
+        config = self._setup_config()
+        crash_store = self._setup_crash_store(config, {
+            'socorro.normal': ['crash_1', 'crash_1', 'crash_2'],
+        })
+
+        eq_(list(crash_store.new_crashes()), ['crash_1', 'crash_2'])
+        crash_store.ack_crash('crash_1')
+        crash_store.ack_crash('crash_2')
+        eq_(list(crash_store.new_crashes()), [])
+        eq_(self.channel.acks, [(3, True)])
+
+    def test_queue_lag(self):
+        config = self._setup_config()
+        crash_store = self._setup_crash_store(config, {
+            'socorro.normal': ['crash_1', 'crash_2'],
+        })
+        eq_(next(crash_store.new_crashes()), 'crash_1')
+
+        # the crashes delivered but not yet yielded are waiting too
+        eq_(config.metrics.gauge.call_count, 3)
+        config.metrics.gauge.assert_any_call(
+            'processor.rabbitmq.queue_lag',
+            2,
+            tags=['queue:socorro.normal']
+        )
+        config.metrics.gauge.assert_any_call(
+            'processor.rabbitmq.queue_lag',
+            0,
+            tags=['queue:socorro.priority']
+        )
+
+        # not again before lag_metrics_interval
+        eq_(next(crash_store.new_crashes()), 'crash_2')
+        eq_(config.metrics.gauge.call_count, 3)
+
+    def test_new_connection(self):
+        config = self._setup_config()
+        crash_store = self._setup_crash_store(config, {
+            'socorro.normal': ['crash_1', 'crash_2'],
+        })
+        new_crashes = crash_store.new_crashes()
+        eq_(next(new_crashes), 'crash_1')
+
+        # the connection is lost, RabbitMQ delivers both crashes again
+        self.connect({'socorro.normal': ['crash_1', 'crash_2']})
+        crash_store.ack_crash('crash_1')
+        eq_(list(new_crashes), ['crash_1', 'crash_2'])
+        eq_(len(self.channel.consumers), 3)
+        eq_(self.channel.acks, [])
@@ -3,7 +3,10 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import copy
+import threading
+import time
 
+from concurrent import futures
 from configman import Namespace, ConfigurationManager
 from configman.dotdict import DotDict
 import mock
@@ -22,8 +25,12 @@ from socorro.external.crashstorage_base import (
     BenchmarkingCrashStorage,
     MemoryDumpsMapping,
     FileDumpsMapping,
+    MemoryFileDumpsMapping,
     socorrodotdict_to_dict
 )
+from socorro.lib.copy_on_write import CopyOnWriteDotDict
+from socorro.lib.memory_file import memory_files_supported
+from socorro.lib.serializers import UJSONSerializer, iso_serializer
 from socorro.lib.util import DotDict as SocorroDotDict
 from socorro.unittest.testbase import TestCase
 
@@ -78,6 +85,13 @@ class MutatingProcessedCrashCrashStorage(CrashStorageBase):
         del processed_crash['foo']
 
 
+class FewKeysMutatingProcessedCrashCrashStorage(
+    MutatingProcessedCrashCrashStorage
+):
+    def mutates_few_keys(self):
+        return True
+
+
 def fake_quit_check():
     return False
 
@@ -469,6 +483,291 @@ class TestBase(TestCase):
             assert processed_crash['foo']['other'] == 'thing'
             assert processed_crash['bar']['something'] == 'else'
 
+    def test_poly_crash_storage_crash_copies(self):
+        raw_crash = {'ooid': '12345'}
+        processed_crash = {'foo': {'other': 'thing'}}
+        config = DotDict({'logger': mock.Mock(), 'redactor_class': Redactor})
+        config.forbidden_keys = ''
+
+        # the stores that don't mutate the crash share it
+        copies = PolyCrashStorage._crash_copies_for_store(
+            NonMutatingProcessedCrashCrashStorage(config),
+            raw_crash,
+            processed_crash
+        )
+        assert copies[0] is raw_crash
+        assert copies[1] is processed_crash
+
+        # the others get deep copies
+        copies = PolyCrashStorage._crash_copies_for_store(
+            MutatingProcessedCrashCrashStorage(config),
+            raw_crash,
+            processed_crash
+        )
+        assert isinstance(copies[1], SocorroDotDict)
+        assert copies[1] == processed_crash
+        assert copies[1]['foo'] is not processed_crash['foo']
+
+        # unless they touch only a few keys
+        copies = PolyCrashStorage._crash_copies_for_store(
+            FewKeysMutatingProcessedCrashCrashStorage(config),
+            raw_crash,
+            processed_crash
+        )
+        assert isinstance(copies[0], CopyOnWriteDotDict)
+        assert isinstance(copies[1], CopyOnWriteDotDict)
+        assert dict(copies[1]) == processed_crash
+
+    def test_poly_crash_storage_parallel_saves(self):
+        n = Namespace()
+        n.add_option(
+            'storage',
+            default=PolyCrashStorage,
+        )
+        n.add_option(
+            'logger',
+            default=mock.Mock(),
+        )
+        value = {
+            'storage_classes': (
+                'socorro.unittest.external.test_crashstorage_base.A,'
+                'socorro.unittest.external.test_crashstorage_base.A,'
+                'socorro.unittest.external.test_crashstorage_base'
+                '.MutatingProcessedCrashCrashStorage'
+            ),
+            'number_of_save_threads': 2,
+        }
+        cm = ConfigurationManager(n, values_source_list=[value])
+        with cm.context() as config:
+            poly_store = config.storage(config)
+            assert sorted(poly_store.save_executors) == [
+                'storage0', 'storage1', 'storage2'
+            ]
+
+            raw_crash = {'ooid': '12345'}
+            dump = '12345'
+            processed_crash = {'foo': 'bar'}
+            saving_threads = set()
+
+            def save(*args):
+                saving_threads.add(threading.currentThread().getName())
+
+            poly_store.stores.storage0.save_raw_and_processed = Mock(
+                side_effect=save
+            )
+            poly_store.stores.storage1.save_raw_and_processed = Mock(
+                side_effect=save
+            )
+
+            poly_store.save_raw_and_processed(
+                raw_crash,
+                dump,
+                processed_crash,
+                'n'
+            )
+            for a_store in (poly_store.stores.storage0,
+                            poly_store.stores.storage1):
+                a_store.save_raw_and_processed.assert_called_once_with(
+                    raw_crash, dump, processed_crash, 'n'
+                )
+            # the saves ran in the pool, not in this thread
+            assert threading.currentThread().getName() not in saving_threads
+            # the mutating store got its own copy
+            assert processed_crash['foo'] == 'bar'
+
+            # every failure is gathered even though the saves were parallel
+            poly_store.stores.storage0.save_raw_and_processed.side_effect = (
+                Exception('this is messed up')
+            )
+            del processed_crash['foo']  # makes the mutating store fail
+            with pytest.raises(PolyStorageError) as exception_info:
+                poly_store.save_raw_and_processed(
+                    raw_crash,
+                    dump,
+                    processed_crash,
+                    'n'
+                )
+            assert len(exception_info.value) == 2
+            assert poly_store.stores.storage1.save_raw_and_processed \
+                .call_count == 2
+
+            poly_store.close()
+
+    def test_poly_crash_storage_parallel_save_timeout(self):
+        n = Namespace()
+        n.add_option(
+            'storage',
+            default=PolyCrashStorage,
+        )
+        n.add_option(
+            'logger',
+            default=mock.Mock(),
+        )
+        value = {
+            'storage_classes': (
+                'socorro.unittest.external.test_crashstorage_base.A,'
+                'socorro.unittest.external.test_crashstorage_base.A'
+            ),
+            'number_of_save_threads': 2,
+            'store_save_timeout': 0.1,
+        }
+        cm = ConfigurationManager(n, values_source_list=[value])
+        with cm.context() as config:
+            poly_store = config.storage(config)
+            poly_store.stores.storage0.save_raw_and_processed = Mock(
+                side_effect=lambda *args: time.sleep(1)
+            )
+            poly_store.stores.storage1.save_raw_and_processed = Mock()
+
+            with pytest.raises(PolyStorageError) as exception_info:
+                poly_store.save_raw_and_processed({}, {}, {}, 'n')
+            assert len(exception_info.value) == 1
+            assert exception_info.value[0][0] is futures.TimeoutError
+            poly_store.stores.storage1.save_raw_and_processed \
+                .assert_called_once_with({}, {}, {}, 'n')
+
+            poly_store.close()
+
+    def test_poly_crash_storage_hung_store(self):
+        n = Namespace()
+        n.add_option(
+            'storage',
+            default=PolyCrashStorage,
+        )
+        n.add_option(
+            'logger',
+            default=mock.Mock(),
+        )
+        value = {
+            'storage_classes': (
+                'socorro.unittest.external.test_crashstorage_base.A,'
+                'socorro.unittest.external.test_crashstorage_base.A'
+            ),
+            'number_of_save_threads': 1,
+            'store_save_timeout': 0.1,
+        }
+        cm = ConfigurationManager(n, values_source_list=[value])
+        with cm.context() as config:
+            poly_store = config.storage(config)
+            hung = threading.Event()
+            poly_store.stores.storage0.save_raw_and_processed = Mock(
+                side_effect=lambda *args: hung.wait()
+            )
+            poly_store.stores.storage1.save_raw_and_processed = Mock()
+
+            for x in range(2):
+                with pytest.raises(PolyStorageError) as exception_info:
+                    poly_store.save_raw_and_processed({}, {}, {}, 'n')
+                assert len(exception_info.value) == 1
+                assert exception_info.value[0][0] is futures.TimeoutError
+            # the hung store holds its own thread, not the other store's
+            assert poly_store.stores.storage1.save_raw_and_processed \
+                .call_count == 2
+
+            hung.set()
+            poly_store.close()
+            # the save that never started was dropped
+            assert poly_store.stores.storage0.save_raw_and_processed \
+                .call_count == 1
+
+    def test_poly_crash_storage_timeout_starts_with_the_save(self):
+        n = Namespace()
+        n.add_option(
+            'storage',
+            default=PolyCrashStorage,
+        )
+        n.add_option(
+            'logger',
+            default=mock.Mock(),
+        )
+        value = {
+            'storage_classes': (
+                'socorro.unittest.external.test_crashstorage_base.A'
+            ),
+            'number_of_save_threads': 1,
+            'store_save_timeout': 0.5,
+        }
+        cm = ConfigurationManager(n, values_source_list=[value])
+        with cm.context() as config:
+            poly_store = config.storage(config)
+            poly_store.stores.storage0.save_raw_and_processed = Mock(
+                side_effect=lambda *args: time.sleep(0.3)
+            )
+            errors = []
+
+            def save():
+                try:
+                    poly_store.save_raw_and_processed({}, {}, {}, 'n')
+                except Exception as exception:
+                    errors.append(exception)
+
+            # the second save waits for the first one, it ends more than
+            # store_save_timeout seconds after it was submitted
+            threads = [threading.Thread(target=save) for x in range(2)]
+            for a_thread in threads:
+                a_thread.start()
+            for a_thread in threads:
+                a_thread.join()
+            assert errors == []
+            assert poly_store.stores.storage0.save_raw_and_processed \
+                .call_count == 2
+
+            poly_store.close()
+
+    def test_poly_crash_storage_shared_serializations(self):
+        n = Namespace()
+        n.add_option(
+            'storage',
+            default=PolyCrashStorage,
+        )
+        n.add_option(
+            'logger',
+            default=mock.Mock(),
+        )
+        for number_of_save_threads in (0, 2):
+            value = {
+                'storage_classes': (
+                    'socorro.unittest.external.test_crashstorage_base.A,'
+                    'socorro.unittest.external.test_crashstorage_base.A'
+                ),
+                'number_of_save_threads': number_of_save_threads,
+            }
+            cm = ConfigurationManager(n, values_source_list=[value])
+            with cm.context() as config:
+                poly_store = config.storage(config)
+                serialized = []
+
+                def save(raw_crash, dump, processed_crash, crash_id):
+                    serialized.append(iso_serializer.dumps(processed_crash))
+
+                poly_store.stores.storage0.save_raw_and_processed = Mock(
+                    side_effect=save
+                )
+                poly_store.stores.storage1.save_raw_and_processed = Mock(
+                    side_effect=save
+                )
+
+                with mock.patch(
+                    'socorro.lib.serializers.ujson'
+                ) as mocked_ujson, mock.patch.object(
+                    UJSONSerializer, '_ujson_refuses_unknown_types', True
+                ):
+                    mocked_ujson.dumps.return_value = '{"foo":"bar"}'
+                    poly_store.save_raw_and_processed(
+                        {}, {}, {'foo': 'bar'}, 'n'
+                    )
+                    # the crash was serialized once for both stores
+                    assert serialized == ['{"foo":"bar"}'] * 2
+                    assert mocked_ujson.dumps.call_count == 1
+
+                    # but once per save
+                    poly_store.save_raw_and_processed(
+                        {}, {}, {'foo': 'bar'}, 'n'
+                    )
+                    assert mocked_ujson.dumps.call_count == 2
+
+                poly_store.close()
+
     def test_fallback_crash_storage(self):
         n = Namespace()
         n.add_option(
@@ -1088,3 +1387,20 @@ class TestDumpsMappings(TestCase):
         )
         assert fdm.as_file_dumps_mapping() is fdm
         assert fdm.as_memory_dumps_mapping() == mdm
+
+    @pytest.mark.skipif(
+        not memory_files_supported(),
+        reason='memory files are not supported here'
+    )
+    def test_memory_files(self):
+        mdm = MemoryDumpsMapping({
+            'upload_file_minidump': 'binary_data',
+            'moar_dump': "more binary data",
+        })
+        mfdm = mdm.as_memory_file_dumps_mapping('a')
+        assert isinstance(mfdm, MemoryFileDumpsMapping)
+        assert sorted(mfdm.keys()) == ['moar_dump', 'upload_file_minidump']
+        assert 'TEMPORARY' not in ''.join(mfdm.values())
+        assert mfdm.as_memory_dumps_mapping() == mdm
+        mfdm.close()
+        assert mfdm.memory_files == []
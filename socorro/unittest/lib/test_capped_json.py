@@ -0,0 +1,116 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import json
+from cStringIO import StringIO
+
+import pytest
+
+from socorro.lib.capped_json import CappedJSONParser, DROP, load
+from socorro.unittest.testbase import TestCase
+
+
+def get_document(number_of_threads=5, number_of_frames=4):
+    return {
+        'crash_info': {'crashing_thread': 3, 'type': 'EXCEPTION "}]'},
+        'modules': [{'filename': 'a.dll'}, {'filename': 'b\\".dll'}],
+        'threads': [
+            {
+                'frame_count': number_of_frames,
+                'frames': [
+                    {'frame': frame, 'function': 'f[%d]{}' % frame}
+                    for frame in range(number_of_frames)
+                ],
+            }
+            for thread in range(number_of_threads)
+        ],
+        'status': 'OK',
+        'empty': [],
+        'numbers': [1, -2.5, 3e10, True, False, None],
+    }
+
+
+CAPS = {
+    ('threads',): 2,
+    ('threads', '*', 'frames'): 3,
+}
+
+
+class TestCappedJSONParser(TestCase):
+
+    def test_nothing_to_cap(self):
+        document = get_document(number_of_threads=2, number_of_frames=3)
+        text = json.dumps(document)
+        # the chunk sizes make sure that values are cut by chunk ends
+        for chunk_size in (1, 7, 65536):
+            for bulk_size in (10, 1048576):
+                parser = CappedJSONParser(CAPS, chunk_size, bulk_size)
+                assert parser.load(StringIO(text)) == document
+                assert parser.truncations == []
+
+    def test_capping(self):
+        document = get_document()
+        text = json.dumps(document, indent=2)
+        for chunk_size in (1, 7, 65536):
+            for bulk_size in (10, 1048576):
+                parser = CappedJSONParser(CAPS, chunk_size, bulk_size)
+                result = parser.load(StringIO(text))
+                assert len(result['threads']) == 2
+                assert result['threads'][0]['frames'] == (
+                    document['threads'][0]['frames'][:3]
+                )
+                assert result['modules'] == document['modules']
+                assert result['crash_info'] == document['crash_info']
+                assert sorted(parser.truncations) == [
+                    (('threads',), 5, 2),
+                    (('threads', 0, 'frames'), 4, 3),
+                    (('threads', 1, 'frames'), 4, 3),
+                ]
+
+    def test_cap_of_zero(self):
+        result, truncations = load(
+            StringIO(json.dumps(get_document())),
+            {('threads', '*', 'frames'): 0}
+        )
+        assert all(thread['frames'] == [] for thread in result['threads'])
+        assert len(truncations) == 5
+
+    def test_hooks(self):
+
+        class KeepTheFourth(CappedJSONParser):
+            def _keep_beyond_cap(self, pattern, location, index):
+                return index == 3
+
+            def _dropped_element(self, pattern, location, index):
+                if index < 3:
+                    return 'gone'
+                return DROP
+
+        for bulk_size in (1, 1048576):
+            parser = KeepTheFourth({(): 1}, bulk_size=bulk_size)
+            result = parser.load(StringIO('[0, 1, 2, 3, 4, 5]'))
+            assert result == [0, 'gone', 'gone', 3]
+            assert parser.truncations == [((), 6, 2)]
+
+    def test_bad_documents(self):
+        for text in (
+            '{"threads": [1, 2',
+            '{"threads": [1 2]}',
+            '{"threads" [1]}',
+            '{"threads": [1]',
+            '{"threads": "unterminated',
+            '{"threads": [1]} trailing',
+            '',
+        ):
+            with pytest.raises(ValueError):
+                load(StringIO(text), CAPS)
+
+    def test_not_a_string(self):
+
+        class FakeFile(object):
+            def read(self, size):
+                return 17
+
+        with pytest.raises(TypeError):
+            load(FakeFile(), CAPS)
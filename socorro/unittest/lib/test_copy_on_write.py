@@ -0,0 +1,185 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import collections
+import copy
+import json
+
+from configman.dotdict import DotDict as ConfigmanDotDict
+
+from socorro.external.crashstorage_base import Redactor
+from socorro.lib.copy_on_write import (
+    copy_on_write,
+    CopyOnWriteDotDict,
+    CopyOnWriteList,
+)
+from socorro.lib.serializers import JSONSerializer, iso_serializer
+from socorro.lib.util import DotDict
+from socorro.unittest.testbase import TestCase
+
+
+def get_crash():
+    return DotDict({
+        'uuid': '1234',
+        'url': 'http://example.com',
+        'json_dump': {
+            'sensitive': {'exploitability': 'high'},
+            'system_info': {'os': 'Windows NT'},
+            'threads': [
+                {'frames': [{'function': 'f', 'frame': 0}]},
+            ],
+        },
+    })
+
+
+class TestCopyOnWriteDotDict(TestCase):
+
+    def test_reads(self):
+        crash = get_crash()
+        view = CopyOnWriteDotDict(crash)
+        assert view == crash
+        assert view['uuid'] == '1234'
+        assert view.uuid == '1234'
+        assert view.json_dump.system_info.os == 'Windows NT'
+        assert view.get('nothing') is None
+        assert view.get('uuid') == '1234'
+        assert sorted(view.keys()) == sorted(crash.keys())
+        for serializer in (JSONSerializer(), iso_serializer):
+            assert json.loads(serializer.dumps(view)) == json.loads(
+                json.dumps(crash)
+            )
+
+    def test_unread_branches_are_shared(self):
+        crash = get_crash()
+        view = CopyOnWriteDotDict(crash)
+        assert view._values['json_dump'] is crash['json_dump']
+        view['json_dump']
+        assert view._values['json_dump'] is not crash['json_dump']
+        # only one level was copied
+        assert (
+            view['json_dump']._values['threads'] is
+            crash['json_dump']['threads']
+        )
+
+    def test_changes_do_not_reach_the_original(self):
+        crash = get_crash()
+        original = copy.deepcopy(dict(crash))
+        view = CopyOnWriteDotDict(crash)
+
+        del view['url']
+        view.uuid = '5678'
+        del view['json_dump']['sensitive']['exploitability']
+        view.json_dump.system_info['cpu'] = 'x86'
+        view.json_dump.threads[0]['frames'][0]['function'] = 'g'
+        view.json_dump.threads.append({'frames': []})
+        view.json_dump.pop('sensitive')
+        view.setdefault('new', {})['key'] = 'value'
+        view.update(added=17)
+
+        assert crash == original
+        assert 'url' not in view
+        assert view.uuid == '5678'
+        assert view.json_dump.system_info == {
+            'os': 'Windows NT',
+            'cpu': 'x86'
+        }
+        assert view.json_dump.threads[0]['frames'][0]['function'] == 'g'
+        assert len(view.json_dump.threads) == 2
+        assert 'sensitive' not in view.json_dump
+        assert view.new == {'key': 'value'}
+        assert view.added == 17
+
+    def test_changes_through_iteration_do_not_reach_the_original(self):
+        crash = get_crash()
+        original = copy.deepcopy(dict(crash))
+        view = CopyOnWriteDotDict(crash)
+
+        for key, value in view.items():
+            if isinstance(value, collections.MutableMapping):
+                value.clear()
+        for value in view.json_dump.itervalues():
+            value.clear()
+        assert crash == original
+        assert view.json_dump == {}
+
+    def test_changes_through_a_dict_do_not_reach_the_original(self):
+        crash = {'a': {'b': [1]}}
+        view = CopyOnWriteDotDict(crash)
+        d = dict(view)
+        d['a']['b'].append(5)
+        d['a']['c'] = 2
+        assert crash == {'a': {'b': [1]}}
+        assert view == {'a': {'b': [1, 5], 'c': 2}}
+
+    def test_redactor(self):
+        crash = get_crash()
+        original = copy.deepcopy(dict(crash))
+        config = DotDict()
+        config.forbidden_keys = 'url, json_dump.sensitive, json_dump.threads'
+        view = CopyOnWriteDotDict(crash)
+
+        Redactor(config)(view)
+
+        assert crash == original
+        assert view == {
+            'uuid': '1234',
+            'json_dump': {'system_info': {'os': 'Windows NT'}},
+        }
+
+    def test_views_of_views(self):
+        crash = get_crash()
+        view = CopyOnWriteDotDict(crash)
+        view.json_dump.system_info['cpu'] = 'x86'
+        view_of_view = view.copy()
+        view_of_view.json_dump.system_info['cpu'] = 'arm'
+        del view_of_view['uuid']
+
+        assert view.json_dump.system_info['cpu'] == 'x86'
+        assert view.uuid == '1234'
+        assert 'cpu' not in crash['json_dump']['system_info']
+
+    def test_configman_dotdicts(self):
+        crash = {'foo': ConfigmanDotDict({'other': 'thing'})}
+        view = CopyOnWriteDotDict(crash)
+        assert json.loads(iso_serializer.dumps(view)) == {
+            'foo': {'other': 'thing'}
+        }
+        del view['foo']['other']
+        assert crash['foo']['other'] == 'thing'
+
+    def test_deepcopy(self):
+        view = CopyOnWriteDotDict(get_crash())
+        a_copy = copy.deepcopy(view)
+        assert a_copy == view
+        assert a_copy is not view
+
+    def test_copy(self):
+        crash = get_crash()
+        view = CopyOnWriteDotDict(crash)
+        a_copy = copy.copy(view)
+        a_copy['uuid'] = '5678'
+        a_copy.json_dump.system_info['cpu'] = 'x86'
+        assert view.uuid == '1234'
+        assert view.json_dump.system_info == {'os': 'Windows NT'}
+
+
+class TestCopyOnWrite(TestCase):
+
+    def test_types(self):
+        assert isinstance(copy_on_write({}), CopyOnWriteDotDict)
+        assert isinstance(copy_on_write(DotDict()), CopyOnWriteDotDict)
+        assert isinstance(copy_on_write([]), CopyOnWriteList)
+        assert copy_on_write('a string') == 'a string'
+        assert copy_on_write(17) == 17
+        a_tuple = (1, 2)
+        assert copy_on_write(a_tuple) is a_tuple
+
+    def test_lists(self):
+        a_list = [{'a': 1}, [2], 3]
+        view = copy_on_write(a_list)
+        view[0]['a'] = 'one'
+        view[1].append(2)
+        view.append(4)
+        assert a_list == [{'a': 1}, [2], 3]
+        assert view == [{'a': 'one'}, [2, 2], 3, 4]
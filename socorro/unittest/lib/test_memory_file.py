@@ -0,0 +1,41 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import subprocess
+
+import pytest
+
+from socorro.lib.memory_file import MemoryFile, memory_files_supported
+from socorro.unittest.testbase import TestCase
+
+
+@pytest.mark.skipif(
+    not memory_files_supported(),
+    reason='memory files are not supported here'
+)
+class TestMemoryFile(TestCase):
+
+    def test_read_by_pathname(self):
+        data = 'minidump' * 100000
+        with MemoryFile('a_dump', data) as memory_file:
+            assert memory_file.pathname == '/proc/%d/fd/%d' % (
+                os.getpid(),
+                memory_file.fd
+            )
+            with open(memory_file.pathname, 'rb') as f:
+                assert f.read() == data
+            # a child process sees it too
+            output = subprocess.check_output(['wc', '-c', memory_file.pathname])
+            assert output.split()[0] == str(len(data))
+
+    def test_close(self):
+        memory_file = MemoryFile(u'a_dump', 'data')
+        fd = memory_file.fd
+        memory_file.close()
+        assert memory_file.fd is None
+        with pytest.raises(OSError):
+            os.fstat(fd)
+        # closing twice is harmless
+        memory_file.close()
@@ -0,0 +1,139 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import threading
+import time
+
+import pytest
+
+from socorro.lib.prefetcher import Prefetcher
+from socorro.unittest.testbase import TestCase
+
+
+class Fetcher(object):
+    """fetches 'data-<key>' and records which thread fetched what"""
+
+    def __init__(self):
+        self.fetched_by = {}
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, key):
+        self.release.wait()
+        self.fetched_by.setdefault(key, []).append(
+            threading.current_thread().name
+        )
+        if key == 'bad':
+            raise KeyError(key)
+        return 'data-%s' % key
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.time() + timeout
+    while not predicate():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.01)
+
+
+class TestPrefetcher(TestCase):
+
+    def test_prefetched(self):
+        fetcher = Fetcher()
+        prefetcher = Prefetcher(fetcher, 2, 10, 1000, size_func=len)
+        try:
+            for key in ('a', 'b', 'c'):
+                assert prefetcher.submit(key)
+            wait_for(lambda: len(fetcher.fetched_by) == 3)
+            assert prefetcher.pending_bytes == 18
+
+            assert prefetcher.claim('b') == 'data-b'
+            assert prefetcher.claim('a') == 'data-a'
+            assert prefetcher.claim('c') == 'data-c'
+            assert prefetcher.pending_bytes == 0
+            for key in ('a', 'b', 'c'):
+                assert fetcher.fetched_by[key][0].startswith('Prefetcher')
+
+            # a key that was never submitted is fetched by the claimer
+            assert prefetcher.claim('d') == 'data-d'
+            assert fetcher.fetched_by['d'] == ['MainThread']
+        finally:
+            prefetcher.close()
+
+    def test_errors_are_raised_by_claim(self):
+        fetcher = Fetcher()
+        prefetcher = Prefetcher(fetcher, 1, 10, 1000)
+        try:
+            prefetcher.submit('bad')
+            wait_for(lambda: 'bad' in fetcher.fetched_by)
+            with pytest.raises(KeyError):
+                prefetcher.claim('bad')
+        finally:
+            prefetcher.close()
+
+    def test_claim_waits_for_fetch_in_progress(self):
+        fetcher = Fetcher()
+        fetcher.release.clear()
+        prefetcher = Prefetcher(fetcher, 1, 10, 1000)
+        try:
+            prefetcher.submit('a')
+            wait_for(lambda: prefetcher._entries['a'].state == 'fetching')
+            threading.Timer(0.1, fetcher.release.set).start()
+            assert prefetcher.claim('a') == 'data-a'
+            assert fetcher.fetched_by['a'] == ['Prefetcher00']
+        finally:
+            prefetcher.close()
+
+    def test_maximum_pending(self):
+        fetcher = Fetcher()
+        prefetcher = Prefetcher(fetcher, 1, 2, 1000)
+        try:
+            assert prefetcher.submit('a')
+            assert prefetcher.submit('b')
+            assert not prefetcher.submit('c')
+            assert prefetcher.claim('c') == 'data-c'
+            assert fetcher.fetched_by['c'] == ['MainThread']
+        finally:
+            prefetcher.close()
+
+    def test_maximum_bytes(self):
+        fetcher = Fetcher()
+        prefetcher = Prefetcher(fetcher, 1, 10, 6, size_func=len)
+        try:
+            prefetcher.submit('a')
+            prefetcher.submit('b')
+            wait_for(lambda: 'a' in fetcher.fetched_by)
+            # 'a' spent the budget, 'b' waits for it to be claimed
+            time.sleep(0.1)
+            assert 'b' not in fetcher.fetched_by
+
+            assert prefetcher.claim('a') == 'data-a'
+            wait_for(lambda: 'b' in fetcher.fetched_by)
+            assert prefetcher.claim('b') == 'data-b'
+            assert fetcher.fetched_by['b'] == ['Prefetcher00']
+
+            # a key waiting for room in the budget is fetched by its claimer
+            prefetcher.submit('c')
+            prefetcher.submit('d')
+            wait_for(lambda: 'c' in fetcher.fetched_by)
+            assert prefetcher.claim('d') == 'data-d'
+            assert fetcher.fetched_by['d'] == ['MainThread']
+            assert prefetcher.claim('c') == 'data-c'
+            time.sleep(0.1)
+            assert fetcher.fetched_by['d'] == ['MainThread']
+        finally:
+            prefetcher.close()
+
+    def test_close_discards_unclaimed(self):
+        fetcher = Fetcher()
+        discarded = []
+        prefetcher = Prefetcher(
+            fetcher, 2, 10, 1000, discard_func=discarded.append
+        )
+        prefetcher.submit('a')
+        prefetcher.submit('b')
+        wait_for(lambda: len(fetcher.fetched_by) == 2)
+        prefetcher.claim('a')
+        prefetcher.close()
+        assert discarded == ['data-b']
+        assert not prefetcher.submit('c')
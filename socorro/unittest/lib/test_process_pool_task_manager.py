@@ -0,0 +1,211 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import time
+import threading
+import multiprocessing
+from functools import partial
+
+from socorro.lib.process_pool_task_manager import (
+    ProcessPoolTaskManager,
+    _JobQueue,
+)
+from socorro.lib.util import DotDict, SilentFakeLogger
+from socorro.unittest.testbase import TestCase
+
+
+def drain(a_queue):
+    items = []
+    while True:
+        item = a_queue.get(timeout=5)
+        if item is None:
+            return items
+        items.append(item)
+
+
+class TestProcessPoolTaskManager(TestCase):
+
+    def setUp(self):
+        super(TestProcessPoolTaskManager, self).setUp()
+        self.logger = SilentFakeLogger()
+
+    def get_config(self, number_of_processes=2):
+        config = DotDict()
+        config.logger = self.logger
+        config.number_of_threads = 1
+        config.number_of_processes = number_of_processes
+        config.maximum_queue_size = 4
+        config.statistics_log_interval = 0
+        config.idle_delay = 1
+        config.quit_on_empty_queue = False
+        return config
+
+    def test_constructor(self):
+        config = self.get_config(number_of_processes=3)
+        pptm = ProcessPoolTaskManager(config)
+        assert pptm.config == config
+        assert pptm.number_of_threads == 3
+        assert not pptm.quit
+
+    def test_doing_work_in_other_processes(self):
+        config = self.get_config()
+        done = multiprocessing.Queue()
+
+        def task(x):
+            done.put((x, os.getpid()))
+
+        pptm = ProcessPoolTaskManager(
+            config,
+            task_func=task,
+            job_source_iterator=(((x,), {}) for x in xrange(10))
+        )
+        pptm.blocking_start()
+        done.put(None)
+        results = drain(done)
+        assert sorted(x for x, pid in results) == range(10)
+        assert os.getpid() not in set(pid for x, pid in results)
+        assert len(pptm.worker_statistics) == 2
+        assert sum(s.jobs for s in pptm.worker_statistics.values()) == 10
+
+    def test_finished_func_called_in_parent(self):
+        config = self.get_config()
+        acknowledged = []
+
+        def task(x, finished_func=None):
+            # the finished_func must never make it to the worker
+            assert finished_func is None
+
+        def iterator():
+            for x in xrange(6):
+                yield (
+                    (x,),
+                    {'finished_func': partial(acknowledged.append, x)}
+                )
+
+        pptm = ProcessPoolTaskManager(
+            config,
+            task_func=task,
+            job_source_iterator=iterator
+        )
+        pptm.blocking_start()
+        assert sorted(acknowledged) == range(6)
+        assert pptm.task_queue.finished_funcs == {}
+
+    def test_failed_jobs_are_finished_and_counted(self):
+        config = self.get_config(number_of_processes=1)
+        acknowledged = []
+
+        def task(x):
+            if x % 2:
+                raise Exception('bad job')
+
+        def iterator():
+            for x in xrange(4):
+                yield (
+                    (x,),
+                    {'finished_func': partial(acknowledged.append, x)}
+                )
+
+        pptm = ProcessPoolTaskManager(
+            config,
+            task_func=lambda x: task(x),
+            job_source_iterator=iterator
+        )
+        pptm.blocking_start()
+        assert sorted(acknowledged) == range(4)
+        statistics = pptm.worker_statistics['Worker-0']
+        assert statistics.jobs == 4
+        assert statistics.failures == 2
+
+    def test_worker_setup_and_close(self):
+        config = self.get_config()
+        events = multiprocessing.Queue()
+        pptm = ProcessPoolTaskManager(
+            config,
+            job_source_iterator=(((x,), {}) for x in xrange(3)),
+            worker_setup_func=lambda: events.put(('setup', os.getpid())),
+            worker_close_func=lambda: events.put(('close', os.getpid())),
+        )
+        pptm.blocking_start()
+        events.put(None)
+        results = drain(events)
+        setups = [pid for event, pid in results if event == 'setup']
+        closes = [pid for event, pid in results if event == 'close']
+        assert len(setups) == 2
+        assert sorted(setups) == sorted(closes)
+        assert os.getpid() not in setups
+
+    def test_dead_worker_is_replaced(self):
+        config = self.get_config(number_of_processes=1)
+        done = multiprocessing.Queue()
+
+        def task(x):
+            if x == 0:
+                os._exit(1)
+            done.put(x)
+
+        def iterator():
+            yield ((0,), {})
+            # give the worker time to die
+            time.sleep(1.5)
+            for x in xrange(1, 4):
+                yield ((x,), {})
+
+        pptm = ProcessPoolTaskManager(
+            config,
+            task_func=task,
+            job_source_iterator=iterator
+        )
+        forking_threads = []
+        start_worker_process = pptm._start_worker_process
+
+        def recording_start_worker_process():
+            forking_threads.append(threading.currentThread().getName())
+            return start_worker_process()
+
+        pptm._start_worker_process = recording_start_worker_process
+        pptm.blocking_start()
+        done.put(None)
+        assert sorted(drain(done)) == [1, 2, 3]
+        assert sorted(pptm.worker_statistics.keys()) == [
+            'Worker-0', 'Worker-1'
+        ]
+        # the replacement is forked by the queuing thread, never by the
+        # results thread
+        assert forking_threads == ['MainThread', 'QueuingThread']
+        assert all(not p.is_alive() for p in pptm.thread_list)
+
+    def test_no_replacement_after_quit(self):
+        config = self.get_config(number_of_processes=1)
+        pptm = ProcessPoolTaskManager(config)
+        dead_process = multiprocessing.Process(target=os._exit, args=(1,))
+        dead_process.start()
+        dead_process.join()
+        pptm.thread_list.append(dead_process)
+        pptm.quit = True
+        pptm._replace_dead_workers()
+        assert pptm.thread_list == [dead_process]
+        assert pptm.worker_statistics == {}
+
+    def test_executor_identity(self):
+        pptm = ProcessPoolTaskManager(self.get_config())
+        assert pptm.executor_identity() == '%s-MainThread' % os.getpid()
+
+
+class TestJobQueue(TestCase):
+
+    def test_put_holds_back_finished_func(self):
+        job_queue = _JobQueue(4)
+        finished = object()
+        job_queue.put((len, (('a',), {'finished_func': finished, 'b': 1})))
+        job_queue.put((len, ('c',)))
+        assert job_queue.get(timeout=5) == (0, ('a',), {'b': 1})
+        assert job_queue.get(timeout=5) == (1, ('c',), {})
+        assert job_queue.finished_funcs == {0: finished}
+
+    def test_death_token(self):
+        job_queue = _JobQueue(4)
+        job_queue.put((None, None))
+        assert job_queue.get(timeout=5) is None
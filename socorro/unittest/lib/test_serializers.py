@@ -0,0 +1,138 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import datetime
+import json
+import threading
+
+import mock
+import pytest
+from configman.dotdict import DotDict as ConfigmanDotDict
+
+from socorro.lib.serializers import (
+    JSONSerializer,
+    UJSONSerializer,
+    database_serializer,
+    iso_serializer,
+    shared_serializations,
+)
+from socorro.lib.util import DotDict
+
+
+a_date = datetime.datetime(2012, 4, 8, 10, 56, 50, 902884)
+
+
+def get_processed_crash():
+    processed_crash = DotDict({
+        'uuid': '0bba929f-8721-460c-dead-a43c20071027',
+        'date_processed': a_date,
+        'client_crash_date': a_date.date(),
+        'url': 'http://example.com/a/b',
+        'uptime': 1 / 3.0,
+        'signature': u'caf\xe9',
+        'json_dump': {
+            'threads': [
+                {'frames': [DotDict({'frame': 0, 'module': 'xul.dll'})]},
+            ],
+            'system_info': {'cpu_count': 4, 'started': a_date},
+        },
+    })
+    processed_crash.classifications = ConfigmanDotDict()
+    processed_crash.classifications.skunk = 'works'
+    return processed_crash
+
+
+expected_processed_crash = {
+    'uuid': '0bba929f-8721-460c-dead-a43c20071027',
+    'date_processed': '2012-04-08T10:56:50.902884',
+    'client_crash_date': '2012-04-08',
+    'url': 'http://example.com/a/b',
+    'uptime': 1 / 3.0,
+    'signature': u'caf\xe9',
+    'json_dump': {
+        'threads': [
+            {'frames': [{'frame': 0, 'module': 'xul.dll'}]},
+        ],
+        'system_info': {'cpu_count': 4, 'started': '2012-04-08T10:56:50.902884'},
+    },
+    'classifications': {'skunk': 'works'},
+}
+
+
+class TestSerializers(object):
+    @pytest.mark.parametrize('serializer_class', [JSONSerializer, UJSONSerializer])
+    def test_dumps(self, serializer_class):
+        serializer = serializer_class()
+        as_string = serializer.dumps(get_processed_crash())
+        assert json.loads(as_string) == expected_processed_crash
+        assert serializer.loads(as_string) == expected_processed_crash
+
+    def test_same_as_the_standard_library(self):
+        processed_crash = get_processed_crash()
+        from_ujson = json.loads(UJSONSerializer().dumps(processed_crash))
+        assert from_ujson == json.loads(JSONSerializer().dumps(processed_crash))
+
+    def test_date_format(self):
+        assert json.loads(database_serializer.dumps({'date_processed': a_date})) == {
+            'date_processed': '2012-04-08 10:56:50.902884'
+        }
+
+    @pytest.mark.parametrize('ujson_refuses_unknown_types', [
+        UJSONSerializer._ujson_refuses_unknown_types,
+        # as with ujson 1.x, which writes dates as epoch integers
+        False,
+    ])
+    def test_dates_in_lists(self, ujson_refuses_unknown_types):
+        with mock.patch.object(
+            UJSONSerializer,
+            '_ujson_refuses_unknown_types',
+            ujson_refuses_unknown_types
+        ):
+            assert iso_serializer.dumps({'dates': [a_date]}) == (
+                '{"dates":["2012-04-08T10:56:50.902884"]}'
+            )
+            assert iso_serializer.dumps([a_date]) == (
+                '["2012-04-08T10:56:50.902884"]'
+            )
+            assert json.loads(iso_serializer.dumps(get_processed_crash())) == (
+                expected_processed_crash
+            )
+
+    def test_unserializable(self):
+        with pytest.raises(TypeError):
+            iso_serializer.dumps({'a': [object()]})
+
+    def test_loads_with_object_hook(self):
+        result = iso_serializer.loads('{"a": {"b": 1.5}}', object_hook=DotDict)
+        assert isinstance(result, DotDict)
+        assert result.a.b == 1.5
+
+    def test_shared_serializations(self):
+        processed_crash = get_processed_crash()
+        serializations = {}
+        with mock.patch('socorro.lib.serializers.ujson') as mocked_ujson, \
+                mock.patch.object(
+                    UJSONSerializer, '_ujson_refuses_unknown_types', True):
+            mocked_ujson.dumps.return_value = '{}'
+            with shared_serializations(serializations):
+                assert iso_serializer.dumps(processed_crash) == '{}'
+                assert iso_serializer.dumps(processed_crash) == '{}'
+                assert mocked_ujson.dumps.call_count == 1
+
+                # a date format of its own
+                database_serializer.dumps(processed_crash)
+                assert mocked_ujson.dumps.call_count == 2
+
+                # only in the thread of the context
+                thread = threading.Thread(
+                    target=iso_serializer.dumps,
+                    args=(processed_crash,)
+                )
+                thread.start()
+                thread.join()
+                assert mocked_ujson.dumps.call_count == 3
+
+            iso_serializer.dumps(processed_crash)
+            assert mocked_ujson.dumps.call_count == 4
+        assert len(serializations) == 2
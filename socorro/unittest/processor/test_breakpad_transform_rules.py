@@ -5,6 +5,8 @@
 import copy
 import ujson
 
+from cStringIO import StringIO
+
 from mock import Mock, patch
 from nose.tools import eq_, ok_
 from contextlib import contextmanager
@@ -16,6 +18,7 @@ from socorro.lib.util import DotDict
 from socorro.processor.breakpad_transform_rules import (
     BreakpadStackwalkerRule,
     BreakpadStackwalkerRule2015,
+    BreakpadStackwalkerServerRule2015,
     CrashingThreadRule,
     ExternalProcessRule,
     DumpLookupExternalRule,
@@ -602,6 +605,9 @@ class TestBreakpadTransformRule2015(TestCase):
         config.private_symbols_url = 'https://localhost'
         config.symbol_cache_path = '/mnt/socorro/symbols'
         config.temporary_file_system_storage_path = '/tmp'
+        config.raw_crash_over_stdin = False
+        config.max_threads = 500
+        config.max_frames_per_thread = 100
         return config
 
     def get_basic_processor_meta(self):
@@ -706,6 +712,110 @@ class TestBreakpadTransformRule2015(TestCase):
             ]
         )
 
+    @patch('socorro.processor.breakpad_transform_rules.os.unlink')
+    @patch('socorro.processor.breakpad_transform_rules.subprocess')
+    def test_raw_crash_over_stdin(self, mocked_subprocess_module,
+                                  mocked_unlink):
+        config = self.get_basic_config()
+        config.raw_crash_over_stdin = True
+
+        raw_crash = copy.copy(canonical_standard_raw_crash)
+        raw_dumps = {config.dump_field: 'a_fake_dump.dump'}
+        processed_crash = DotDict()
+        processor_meta = self.get_basic_processor_meta()
+
+        mocked_subprocess_handle = (
+            mocked_subprocess_module.Popen.return_value
+        )
+        mocked_subprocess_handle.stdout.read.return_value = (
+            cannonical_stackwalker_output_str
+        )
+        mocked_subprocess_handle.wait.return_value = 0
+
+        rule = BreakpadStackwalkerRule2015(config)
+
+        # the call to be tested
+        rule.act(raw_crash, raw_dumps, processed_crash, processor_meta)
+
+        eq_(processed_crash.json_dump, cannonical_stackwalker_output)
+        ok_(processed_crash.success)
+        mocked_subprocess_module.Popen.assert_called_once_with(
+            'timeout -s KILL 30 /bin/stackwalker '
+            '--raw-json /dev/stdin --symbols-url https://localhost '
+            '--symbols-url https://localhost '
+            '--symbols-cache /mnt/socorro/symbols a_fake_dump.dump '
+            '2>/dev/null',
+            shell=True,
+            stdin=mocked_subprocess_module.PIPE,
+            stdout=mocked_subprocess_module.PIPE
+        )
+        written = mocked_subprocess_handle.stdin.write.call_args[0][0]
+        eq_(ujson.loads(written), ujson.loads(ujson.dumps(raw_crash)))
+        mocked_subprocess_handle.stdin.close.assert_called_once_with()
+        # no temporary file was written
+        ok_(not mocked_unlink.called)
+
+    @patch('socorro.processor.breakpad_transform_rules.subprocess')
+    def test_output_is_capped(self, mocked_subprocess_module):
+        config = self.get_basic_config()
+        config.max_threads = 2
+        config.max_frames_per_thread = 3
+
+        raw_crash = copy.copy(canonical_standard_raw_crash)
+        raw_dumps = {config.dump_field: 'a_fake_dump.dump'}
+        processed_crash = DotDict()
+        processor_meta = self.get_basic_processor_meta()
+
+        frames = [{'frame': x, 'function': 'f'} for x in range(5)]
+        stackwalker_output = {
+            'status': 'OK',
+            'crash_info': {'crashing_thread': 3},
+            'crashing_thread': {
+                'frames': frames,
+                'threads_index': 3,
+                'total_frames': 5,
+            },
+            'thread_count': 6,
+            'threads': [
+                {'frames': frames, 'frame_count': 5} for x in range(6)
+            ],
+        }
+        mocked_subprocess_handle = (
+            mocked_subprocess_module.Popen.return_value
+        )
+        mocked_subprocess_handle.stdout.read.side_effect = [
+            ujson.dumps(stackwalker_output),
+            '',
+        ]
+        mocked_subprocess_handle.wait.return_value = 0
+
+        rule = BreakpadStackwalkerRule2015(config)
+
+        # the call to be tested
+        rule.act(raw_crash, raw_dumps, processed_crash, processor_meta)
+
+        ok_(processed_crash.success)
+        threads = processed_crash.json_dump['threads']
+        # the crashing thread is kept, at its index
+        eq_(len(threads), 4)
+        eq_(threads[2], {'frames': [], 'frame_count': 0})
+        for index in (0, 1, 3):
+            eq_(threads[index]['frames'], frames[:3])
+            ok_(threads[index]['frames_truncated'])
+            eq_(threads[index]['total_frames'], 5)
+        crashing_thread = processed_crash.json_dump['crashing_thread']
+        eq_(crashing_thread['frames'], frames[:3])
+        ok_(crashing_thread['frames_truncated'])
+        eq_(processed_crash.json_dump['thread_count'], 6)
+        eq_(
+            processor_meta.processor_notes,
+            [
+                'MDSW output had 6 threads, 3 were kept',
+                'MDSW output had more than 3 frames in 4 threads, the other '
+                'frames were dropped',
+            ]
+        )
+
 
 class TestJitCrashCategorizeRule(TestCase):
 
@@ -1068,3 +1178,139 @@ class TestJitCrashCategorizeRule(TestCase):
         rule = JitCrashCategorizeRule(config)
 
         assert rule._predicate({}, {}, processed_crash, {}) is True
+
+
+class TestBreakpadStackwalkerServerRule2015(TestCase):
+
+    def get_basic_config(self):
+        config = CDotDict()
+        config.logger = Mock()
+        config.chatty = False
+        config.dump_field = 'upload_file_minidump'
+        config.command_line = (
+            BreakpadStackwalkerRule2015.required_config.command_line.default
+        )
+        config.server_command_line = (
+            BreakpadStackwalkerServerRule2015.required_config
+            .server_command_line.default
+        )
+        config.stackwalker_timeout = 30
+        config.stackwalker_max_requests = 10
+        config.command_pathname = '/bin/stackwalker'
+        config.public_symbols_url = 'https://localhost'
+        config.private_symbols_url = 'https://localhost'
+        config.symbol_cache_path = '/mnt/socorro/symbols'
+        config.temporary_file_system_storage_path = '/tmp'
+        config.raw_crash_over_stdin = False
+        config.max_threads = 500
+        config.max_frames_per_thread = 100
+        return config
+
+    def get_basic_processor_meta(self):
+        processor_meta = DotDict()
+        processor_meta.processor_notes = []
+        processor_meta.quit_check = lambda: False
+        return processor_meta
+
+    def fake_request(self, output_line, return_code=0):
+        """a stand in for StackwalkerServer.request answering with
+        output_line"""
+        def request(dump_pathname, raw_crash=None, load=None):
+            if return_code:
+                return None, return_code
+            return load(StringIO(output_line)), 0
+        return request
+
+    @patch('socorro.processor.breakpad_transform_rules.StackwalkerServer')
+    def test_everything_we_hoped_for(self, mocked_server_class):
+        config = self.get_basic_config()
+        mocked_server = mocked_server_class.return_value
+        mocked_server.request.side_effect = self.fake_request(
+            cannonical_stackwalker_output_str
+        )
+
+        rule = BreakpadStackwalkerServerRule2015(config)
+        for x in range(2):
+            raw_crash = copy.copy(canonical_standard_raw_crash)
+            raw_dumps = {config.dump_field: 'a_fake_dump.dump'}
+            processed_crash = DotDict()
+            processor_meta = self.get_basic_processor_meta()
+
+            # the call to be tested
+            rule.act(raw_crash, raw_dumps, processed_crash, processor_meta)
+
+            eq_(processed_crash.json_dump, cannonical_stackwalker_output)
+            eq_(processed_crash.mdsw_return_code, 0)
+            eq_(processed_crash.mdsw_status_string, "OK")
+            ok_(processed_crash.success)
+            eq_(processor_meta.processor_notes, [])
+
+        # one server for the thread, used for both crashes
+        mocked_server_class.assert_called_once_with(
+            '/bin/stackwalker --server '
+            '--symbols-url https://localhost '
+            '--symbols-url https://localhost '
+            '--symbols-cache /mnt/socorro/symbols',
+            30,
+            10,
+            config.logger
+        )
+        eq_(mocked_server.request.call_count, 2)
+        args, kwargs = mocked_server.request.call_args
+        eq_(args, ('a_fake_dump.dump', raw_crash))
+        # the output is parsed as it is read
+        ok_(callable(kwargs['load']))
+
+        rule.close()
+        mocked_server.close.assert_called_once_with()
+
+    @patch('socorro.processor.breakpad_transform_rules.StackwalkerServer')
+    def test_stackwalker_times_out(self, mocked_server_class):
+        config = self.get_basic_config()
+        mocked_server_class.return_value.request.side_effect = (
+            self.fake_request('', 124)
+        )
+        raw_crash = copy.copy(canonical_standard_raw_crash)
+        raw_dumps = {config.dump_field: 'a_fake_dump.dump'}
+        processed_crash = DotDict()
+        processor_meta = self.get_basic_processor_meta()
+
+        rule = BreakpadStackwalkerServerRule2015(config)
+        rule.act(raw_crash, raw_dumps, processed_crash, processor_meta)
+
+        eq_(processed_crash.json_dump, {})
+        eq_(processed_crash.mdsw_return_code, 124)
+        eq_(processed_crash.mdsw_status_string, "unknown error")
+        ok_(not processed_crash.success)
+        eq_(
+            processor_meta.processor_notes,
+            ["MDSW terminated with SIGKILL due to timeout"]
+        )
+
+    @patch('socorro.processor.breakpad_transform_rules.StackwalkerServer')
+    def test_stackwalker_bad_output(self, mocked_server_class):
+        config = self.get_basic_config()
+        mocked_server_class.return_value.request.side_effect = (
+            self.fake_request('not json')
+        )
+        raw_crash = copy.copy(canonical_standard_raw_crash)
+        raw_dumps = {config.dump_field: 'a_fake_dump.dump'}
+        processed_crash = DotDict()
+        processor_meta = self.get_basic_processor_meta()
+
+        rule = BreakpadStackwalkerServerRule2015(config)
+        rule.act(raw_crash, raw_dumps, processed_crash, processor_meta)
+
+        eq_(processed_crash.json_dump, {})
+        eq_(processed_crash.mdsw_return_code, 0)
+        ok_(not processed_crash.success)
+        eq_(len(processor_meta.processor_notes), 2)
+        ok_(
+            processor_meta.processor_notes[0].startswith(
+                '/bin/stackwalker output failed in json'
+            )
+        )
+        eq_(
+            processor_meta.processor_notes[1],
+            "MDSW failed on 'a_fake_dump.dump': unknown error"
+        )
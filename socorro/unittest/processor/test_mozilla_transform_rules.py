@@ -3,11 +3,13 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import copy
+from decimal import Decimal
 import re
 import json
+import time
 from StringIO import StringIO
 
-from mock import Mock, patch, call
+from mock import DEFAULT, MagicMock, Mock, patch, call
 from nose.tools import eq_, ok_
 
 from configman.dotdict import DotDict as CDotDict
@@ -1743,6 +1745,9 @@ class TestMissingSymbols(TestCase):
         config = CDotDict()
         config.logger = Mock()
         config.chatty = False
+        config.flush_interval = 60
+        config.seen_rows_cache_size = 100
+        config.max_queued_rows = 100
         return config
 
     def get_basic_processor_meta(self):
@@ -1751,13 +1756,7 @@ class TestMissingSymbols(TestCase):
 
         return processor_meta
 
-    def test_everything_we_hoped_for(self):
-        config = self.get_basic_config()
-        config.database_class = Mock()
-        config.transaction_executor_class = Mock()
-
-        raw_crash = copy.copy(canonical_standard_raw_crash)
-        raw_dumps = {}
+    def get_processed_crash(self):
         processed_crash = DotDict()
         processed_crash.date_processed = '2014-12-31'
         processed_crash.json_dump = {
@@ -1789,46 +1788,229 @@ class TestMissingSymbols(TestCase):
                 },
             ]
         }
+        return processed_crash
+
+    def test_everything_we_hoped_for(self):
+        config = self.get_basic_config()
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+
+        raw_crash = copy.copy(canonical_standard_raw_crash)
+        raw_dumps = {}
+        processed_crash = self.get_processed_crash()
 
         processor_meta = self.get_basic_processor_meta()
 
         rule = MissingSymbolsRule(config)
 
-        expected_sql = rule.sql % '20141229'
-
         # the call to be tested
         rule.act(raw_crash, raw_dumps, processed_crash, processor_meta)
 
-        from socorro.external.postgresql.dbapi2_util import execute_no_results
-        eq_(config.transaction_executor_class.return_value.call_count, 2)
-        expected_execute_args = [
-            call(execute_no_results, expected_sql,
-                 ('2014-12-31', 'some-file.pdb', 'ABCDEFG', 'debug.py', '123')),
-            call(execute_no_results, expected_sql,
-                 ('2014-12-31', 'yet-another-file.pdb', 'CDEFGHI', None, None))
-        ]
-        config.transaction_executor_class.return_value.assert_has_calls(
-            expected_execute_args
-        )
+        # nothing is inserted by the processor thread
+        eq_(config.transaction_executor_class.return_value.call_count, 0)
 
         # make sure it works a second time
         # the call to be tested
         rule.act(raw_crash, raw_dumps, processed_crash, processor_meta)
-        eq_(config.transaction_executor_class.return_value.call_count, 4)
+        processed_crash.date_processed = datetime_from_isodate_string(
+            '2015-01-05T10:00:00'
+        )
+        rule.act(raw_crash, raw_dumps, processed_crash, processor_meta)
+
+        rule.close()
+        # the rows of the same day are inserted once, a transaction per
+        # partition
         expected_execute_args = [
-            call(execute_no_results, expected_sql,
-                 ('2014-12-31', 'some-file.pdb', 'ABCDEFG', 'debug.py', '123')),
-            call(execute_no_results, expected_sql,
-                 ('2014-12-31', 'yet-another-file.pdb', 'CDEFGHI', None, None)),
-            call(execute_no_results, expected_sql,
-                 ('2014-12-31', 'some-file.pdb', 'ABCDEFG', 'debug.py', '123')),
-            call(execute_no_results, expected_sql,
-                 ('2014-12-31', 'yet-another-file.pdb', 'CDEFGHI', None, None)),
+            call(rule._insert_rows, '20141229', [
+                ('2014-12-31', 'some-file.pdb', 'ABCDEFG', 'debug.py', '123'),
+                ('2014-12-31', 'yet-another-file.pdb', 'CDEFGHI', None, None),
+            ]),
+            call(rule._insert_rows, '20150105', [
+                (
+                    datetime_from_isodate_string('2015-01-05').date(),
+                    'some-file.pdb', 'ABCDEFG', 'debug.py', '123'
+                ),
+                (
+                    datetime_from_isodate_string('2015-01-05').date(),
+                    'yet-another-file.pdb', 'CDEFGHI', None, None
+                ),
+            ]),
         ]
-        config.transaction_executor_class.return_value.assert_has_calls(
+        eq_(
+            config.transaction_executor_class.return_value.call_args_list,
             expected_execute_args
         )
 
+    def test_insert_rows(self):
+        config = self.get_basic_config()
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        rule = MissingSymbolsRule(config)
+        self.addCleanup(rule.close)
+
+        connection = MagicMock()
+        cursor = connection.cursor.return_value.__enter__.return_value
+        rule._insert_rows(connection, '20141229', [
+            ('2014-12-31', 'some-file.pdb', 'ABCDEFG', 'debug.py', '123'),
+            ('2014-12-31', 'yet-another-file.pdb', 'CDEFGHI', None, None),
+        ])
+        cursor.execute.assert_called_once_with(
+            "INSERT INTO missing_symbols_20141229"
+            " (date_processed, debug_file, debug_id, code_file, code_id)"
+            " VALUES (%s, %s, %s, %s, %s), (%s, %s, %s, %s, %s)",
+            [
+                '2014-12-31', 'some-file.pdb', 'ABCDEFG', 'debug.py', '123',
+                '2014-12-31', 'yet-another-file.pdb', 'CDEFGHI', None, None,
+            ]
+        )
+
+    def test_flushing_thread(self):
+        config = self.get_basic_config()
+        config.flush_interval = 0.01
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        transaction = config.transaction_executor_class.return_value
+
+        rule = MissingSymbolsRule(config)
+        self.addCleanup(rule.close)
+        rule.act(
+            copy.copy(canonical_standard_raw_crash),
+            {},
+            self.get_processed_crash(),
+            self.get_basic_processor_meta()
+        )
+
+        for x in range(100):
+            if transaction.call_count:
+                break
+            time.sleep(0.01)
+        eq_(transaction.call_count, 1)
+
+    def test_failed_rows_are_queued_again(self):
+        config = self.get_basic_config()
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        transaction = config.transaction_executor_class.return_value
+        transaction.side_effect = ValueError('no such partition')
+
+        rule = MissingSymbolsRule(config)
+        raw_crash = copy.copy(canonical_standard_raw_crash)
+        processor_meta = self.get_basic_processor_meta()
+        rule.act(raw_crash, {}, self.get_processed_crash(), processor_meta)
+        rule.flush()
+        # the batch, then each of its rows
+        eq_(transaction.call_count, 3)
+        eq_(config.logger.error.call_count, 2)
+
+        transaction.side_effect = None
+        rule.act(raw_crash, {}, self.get_processed_crash(), processor_meta)
+        rule.close()
+        eq_(transaction.call_count, 4)
+        eq_(len(transaction.call_args[0][2]), 2)
+
+    def test_failed_batch_is_inserted_one_row_at_a_time(self):
+        config = self.get_basic_config()
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        transaction = config.transaction_executor_class.return_value
+
+        def insert(function, partition, rows):
+            if any(row[1] == 'yet-another-file.pdb' for row in rows):
+                raise ValueError('bad row')
+        transaction.side_effect = insert
+
+        rule = MissingSymbolsRule(config)
+        raw_crash = copy.copy(canonical_standard_raw_crash)
+        processor_meta = self.get_basic_processor_meta()
+        rule.act(raw_crash, {}, self.get_processed_crash(), processor_meta)
+        rule.close()
+        eq_(
+            transaction.call_args_list[1:],
+            [
+                call(rule._insert_rows, '20141229', [
+                    (
+                        '2014-12-31', 'some-file.pdb', 'ABCDEFG', 'debug.py',
+                        '123'
+                    ),
+                ]),
+                call(rule._insert_rows, '20141229', [
+                    (
+                        '2014-12-31', 'yet-another-file.pdb', 'CDEFGHI',
+                        None, None
+                    ),
+                ]),
+            ]
+        )
+        eq_(config.logger.error.call_count, 1)
+        # only the bad row may be queued again
+        eq_(
+            list(rule.seen_rows),
+            [('2014-12-31', 'some-file.pdb', 'ABCDEFG', 'debug.py', '123')]
+        )
+
+    def test_flushing_thread_survives_errors(self):
+        config = self.get_basic_config()
+        config.flush_interval = 0.01
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+
+        rule = MissingSymbolsRule(config)
+        self.addCleanup(rule.close)
+        with patch.object(
+            rule,
+            '_take_queued_rows',
+            side_effect=[RuntimeError('oops'), {}]
+        ) as take_queued_rows:
+            for x in range(100):
+                if take_queued_rows.call_count == 2:
+                    break
+                time.sleep(0.01)
+            eq_(take_queued_rows.call_count, 2)
+        ok_(config.logger.error.called)
+        ok_(rule.flushing_thread.is_alive())
+
+    def test_max_queued_rows(self):
+        config = self.get_basic_config()
+        config.max_queued_rows = 1
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        transaction = config.transaction_executor_class.return_value
+
+        rule = MissingSymbolsRule(config)
+        raw_crash = copy.copy(canonical_standard_raw_crash)
+        processor_meta = self.get_basic_processor_meta()
+        rule.act(raw_crash, {}, self.get_processed_crash(), processor_meta)
+        rule.flush()
+        eq_(
+            transaction.call_args[0][2],
+            [('2014-12-31', 'some-file.pdb', 'ABCDEFG', 'debug.py', '123')]
+        )
+        ok_(config.logger.warning.called)
+
+        # the dropped row wasn't seen, the next crash queues it
+        rule.act(raw_crash, {}, self.get_processed_crash(), processor_meta)
+        rule.close()
+        eq_(
+            transaction.call_args[0][2],
+            [('2014-12-31', 'yet-another-file.pdb', 'CDEFGHI', None, None)]
+        )
+
+    def test_seen_rows_cache_size(self):
+        config = self.get_basic_config()
+        config.seen_rows_cache_size = 1
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        transaction = config.transaction_executor_class.return_value
+
+        rule = MissingSymbolsRule(config)
+        raw_crash = copy.copy(canonical_standard_raw_crash)
+        processor_meta = self.get_basic_processor_meta()
+        rule.act(raw_crash, {}, self.get_processed_crash(), processor_meta)
+        rule.act(raw_crash, {}, self.get_processed_crash(), processor_meta)
+        rule.close()
+        # each row pushed the other one out, both were queued twice
+        eq_(len(transaction.call_args[0][2]), 4)
+
 
 class TestBetaVersion(TestCase):
 
@@ -1836,8 +2018,22 @@ class TestBetaVersion(TestCase):
         config = CDotDict()
         config.logger = Mock()
         config.chatty = False
+        config.version_cache_size = 100
+        config.preload_days = 30
+        config.refresh_interval = 600
+        config.unknown_version_ttl = 60
         return config
 
+    def get_transaction(self, preloaded_versions=()):
+        """returns a mock transaction that answers the query of the recent
+        builds with preloaded_versions and the other queries with its
+        return_value"""
+        def transaction(function, sql, params):
+            if 'since' in params:
+                return preloaded_versions
+            return DEFAULT
+        return Mock(side_effect=transaction)
+
     def get_basic_processor_meta(self):
         processor_meta = DotDict()
         processor_meta.processor_notes = []
@@ -1857,7 +2053,7 @@ class TestBetaVersion(TestCase):
 
         processor_meta = self.get_basic_processor_meta()
 
-        transaction = Mock()
+        transaction = self.get_transaction()
         config.transaction_executor_class.return_value = transaction
 
         rule = BetaVersionRule(config)
@@ -1928,7 +2124,7 @@ class TestBetaVersion(TestCase):
 
         processor_meta = self.get_basic_processor_meta()
 
-        transaction = Mock()
+        transaction = self.get_transaction()
         config.transaction_executor_class.return_value = transaction
 
         rule = BetaVersionRule(config)
@@ -1943,6 +2139,110 @@ class TestBetaVersion(TestCase):
         eq_(processed_crash['version'], '3.0b1')
         eq_(len(processor_meta.processor_notes), 0)
 
+    def test_preloaded_versions(self):
+        config = self.get_basic_config()
+        config.metrics = Mock()
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        transaction = self.get_transaction(preloaded_versions=[
+            ('WaterWolf', '3.0', Decimal('20001001101010'), '3.0b1'),
+            ('WaterWolf', '3.0', Decimal('20001002101010'), '3.0b2'),
+        ])
+        config.transaction_executor_class.return_value = transaction
+
+        rule = BetaVersionRule(config)
+
+        eq_(rule._get_version_data('WaterWolf', '3.0', 20001002101010), '3.0b2')
+        eq_(rule._get_version_data('WaterWolf', '3.0', 20001001101010), '3.0b1')
+        # the recent builds are loaded in one query
+        eq_(transaction.call_count, 1)
+        eq_(
+            config.metrics.increment.call_args_list,
+            [call('processor.betaversionrule.cache_hit')] * 2
+        )
+
+        # the other builds are looked up one at a time
+        transaction.return_value = (('2.0b9',),)
+        eq_(rule._get_version_data('WaterWolf', '2.0', 20000101101010), '2.0b9')
+        eq_(rule._get_version_data('WaterWolf', '2.0', 20000101101010), '2.0b9')
+        eq_(transaction.call_count, 2)
+        eq_(
+            config.metrics.increment.call_args_list[2:],
+            [
+                call('processor.betaversionrule.cache_miss'),
+                call('processor.betaversionrule.cache_hit'),
+            ]
+        )
+
+    @patch('socorro.processor.mozilla_transform_rules.time')
+    def test_refresh(self, mocked_time):
+        mocked_time.time.return_value = 1000.0
+        config = self.get_basic_config()
+        config.unknown_version_ttl = 3600
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        preloaded_versions = []
+        transaction = self.get_transaction(preloaded_versions)
+        config.transaction_executor_class.return_value = transaction
+
+        rule = BetaVersionRule(config)
+        transaction.return_value = ()
+        eq_(rule._get_version_data('WaterWolf', '3.0', 20001001101010), None)
+        eq_(transaction.call_count, 2)
+
+        # the new build arrives in the database
+        preloaded_versions.append(
+            ('WaterWolf', '3.0', Decimal('20001001101010'), '3.0b1')
+        )
+        mocked_time.time.return_value = 1000.0 + 599
+        eq_(rule._get_version_data('WaterWolf', '3.0', 20001001101010), None)
+        eq_(transaction.call_count, 2)
+
+        mocked_time.time.return_value = 1000.0 + 600
+        eq_(rule._get_version_data('WaterWolf', '3.0', 20001001101010), '3.0b1')
+        eq_(transaction.call_count, 3)
+
+    @patch('socorro.processor.mozilla_transform_rules.time')
+    def test_unknown_versions_expire(self, mocked_time):
+        mocked_time.time.return_value = 1000.0
+        config = self.get_basic_config()
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        transaction = self.get_transaction()
+        config.transaction_executor_class.return_value = transaction
+
+        rule = BetaVersionRule(config)
+        transaction.return_value = ()
+        eq_(rule._get_version_data('WaterWolf', '3.0', 20001001101010), None)
+        eq_(rule._get_version_data('WaterWolf', '3.0', 20001001101010), None)
+        # the recent builds and the build
+        eq_(transaction.call_count, 2)
+
+        transaction.return_value = (('3.0b1',),)
+        mocked_time.time.return_value = 1000.0 + 60
+        eq_(rule._get_version_data('WaterWolf', '3.0', 20001001101010), '3.0b1')
+        eq_(transaction.call_count, 3)
+
+    def test_version_cache_size(self):
+        config = self.get_basic_config()
+        config.version_cache_size = 2
+        config.database_class = Mock()
+        config.transaction_executor_class = Mock()
+        transaction = self.get_transaction()
+        config.transaction_executor_class.return_value = transaction
+        transaction.return_value = (('3.0b1',),)
+
+        rule = BetaVersionRule(config)
+        for build_id in (20001001101010, 20001002101010, 20001003101010):
+            rule._get_version_data('WaterWolf', '3.0', build_id)
+        eq_(
+            list(rule._versions_data_cache),
+            [
+                ('WaterWolf', '3.0', 20001002101010),
+                ('WaterWolf', '3.0', 20001003101010),
+            ]
+        )
+
 
 class TestOsPrettyName(TestCase):
 
@@ -3,6 +3,7 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import mock
+import pytest
 from nose.tools import eq_, assert_raises
 
 from configman.dotdict import DotDict
@@ -10,8 +11,10 @@ from configman.dotdict import DotDict
 from socorro.processor.processor_app import ProcessorApp
 from socorro.external.crashstorage_base import (
     CrashIDNotFound,
+    MemoryDumpsMapping,
     PolyStorageError,
 )
+from socorro.lib.memory_file import memory_files_supported
 from socorro.unittest.testbase import TestCase
 
 
@@ -49,6 +52,7 @@ class TestProcessorApp(TestCase):
         )
 
         config.number_of_submissions = 'forever'
+        config.dumps_in_memory_files = False
         config.new_crash_source = DotDict()
 
         class FakedNewCrashSource(object):
@@ -129,6 +133,97 @@ class TestProcessorApp(TestCase):
         )
         eq_(finished_func.call_count, 1)
 
+    @pytest.mark.skipif(
+        not memory_files_supported(),
+        reason='memory files are not supported here'
+    )
+    def test_transform_with_memory_files(self):
+        config = self.get_standard_config()
+        config.dumps_in_memory_files = True
+        pa = ProcessorApp(config)
+        pa._setup_source_and_destination()
+
+        fake_raw_crash = DotDict()
+        pa.source.get_raw_crash = mock.Mock(return_value=fake_raw_crash)
+        pa.source.get_raw_dumps = mock.Mock(return_value=MemoryDumpsMapping({
+            'upload_file_minidump': 'a dump',
+        }))
+        pa.source.get_unredacted_processed = mock.Mock(return_value=DotDict())
+
+        dumps_seen = {}
+
+        def process_crash(raw_crash, dumps, processed_crash):
+            for name, pathname in dumps.items():
+                with open(pathname) as f:
+                    dumps_seen[name] = f.read()
+            return 7
+
+        pa.processor.process_crash = process_crash
+        with mock.patch('socorro.processor.processor_app.os.unlink') as unlink:
+            # the call being tested
+            pa.transform(17, mock.Mock())
+
+        eq_(dumps_seen, {'upload_file_minidump': 'a dump'})
+        assert not pa.source.get_raw_dumps_as_files.called
+        assert not unlink.called
+        pa.destination.save_raw_and_processed.assert_called_with(
+            fake_raw_crash, None, 7, 17
+        )
+
+    def test_transform_prefetched(self):
+        config = self.get_standard_config()
+        pa = ProcessorApp(config)
+        pa._setup_source_and_destination()
+
+        fake_raw_crash = DotDict()
+        fake_dump = {'upload_file_minidump': 'fake_dump_TEMPORARY.dump'}
+        fake_processed_crash = DotDict()
+        pa.prefetcher = mock.Mock()
+        pa.prefetcher.claim.return_value = (
+            fake_raw_crash,
+            fake_dump,
+            fake_processed_crash
+        )
+        pa.processor.process_crash.return_value = 7
+        with mock.patch('socorro.processor.processor_app.os.unlink') as unlink:
+            # the call being tested
+            pa.transform(17, mock.Mock())
+
+        pa.prefetcher.claim.assert_called_with(17)
+        assert not pa.source.get_raw_crash.called
+        pa.processor.process_crash.assert_called_with(
+            fake_raw_crash,
+            fake_dump,
+            fake_processed_crash
+        )
+        unlink.assert_called_with('fake_dump_TEMPORARY.dump')
+
+    def test_fetch_crash_cleans_up_on_error(self):
+        config = self.get_standard_config()
+        pa = ProcessorApp(config)
+        pa._setup_source_and_destination()
+        pa.source.get_raw_dumps_as_files.return_value = {
+            'upload_file_minidump': 'fake_dump_TEMPORARY.dump'
+        }
+        pa.source.get_unredacted_processed.side_effect = Exception('bummer')
+
+        with mock.patch('socorro.processor.processor_app.os.unlink') as unlink:
+            with pytest.raises(Exception):
+                pa._fetch_crash(17)
+        unlink.assert_called_with('fake_dump_TEMPORARY.dump')
+
+    def test_discard_fetched_crash(self):
+        config = self.get_standard_config()
+        pa = ProcessorApp(config)
+        fetched_crash = (
+            DotDict(),
+            {'upload_file_minidump': 'fake_dump_TEMPORARY.dump'},
+            DotDict()
+        )
+        with mock.patch('socorro.processor.processor_app.os.unlink') as unlink:
+            pa._discard_fetched_crash(fetched_crash)
+        unlink.assert_called_with('fake_dump_TEMPORARY.dump')
+
     def test_transform_crash_id_missing(self):
         config = self.get_standard_config()
         pa = ProcessorApp(config)
@@ -0,0 +1,183 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+from mock import Mock
+import pytest
+
+from socorro.processor.stackwalker_server import StackwalkerServer
+from socorro.unittest.testbase import TestCase
+
+
+# a stand in for 'stackwalker --server'.  It echoes the minidump it was asked
+# about along with its pid.  A minidump named 'hang' makes it hang, one named
+# 'die' makes it exit and one named 'big' makes its output a megabyte long.
+FAKE_STACKWALKER = """
+import os
+import sys
+import json
+import time
+
+for line in iter(sys.stdin.readline, ''):
+    request = json.loads(line)
+    if request['minidump'] == 'hang':
+        time.sleep(60)
+    if request['minidump'] == 'die':
+        sys.exit(3)
+    sys.stdout.write(json.dumps({
+        'status': 'OK',
+        'minidump': request['minidump'],
+        'raw_crash': request.get('raw_crash'),
+        'pid': os.getpid(),
+        'padding': 'x' * 1000000 if request['minidump'] == 'big' else '',
+    }) + '\\n')
+    sys.stdout.flush()
+"""
+
+
+class TestStackwalkerServer(TestCase):
+
+    def setUp(self):
+        super(TestStackwalkerServer, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.script = os.path.join(self.temp_dir, 'fake_stackwalker.py')
+        with open(self.script, 'w') as f:
+            f.write(FAKE_STACKWALKER)
+
+    def tearDown(self):
+        super(TestStackwalkerServer, self).tearDown()
+        shutil.rmtree(self.temp_dir)
+
+    def get_server(self, timeout=5, max_requests=0):
+        return StackwalkerServer(
+            '%s %s' % (sys.executable, self.script),
+            timeout,
+            max_requests,
+            Mock()
+        )
+
+    def test_requests_go_to_the_same_process(self):
+        server = self.get_server()
+        try:
+            line, return_code = server.request('a.dump', {'ProductName': 'X'})
+            assert return_code == 0
+            first = json.loads(line)
+            assert first['minidump'] == 'a.dump'
+            assert first['raw_crash'] == {'ProductName': 'X'}
+
+            line, return_code = server.request('b.dump')
+            assert return_code == 0
+            second = json.loads(line)
+            assert second['minidump'] == 'b.dump'
+            assert second['raw_crash'] is None
+            assert second['pid'] == first['pid']
+        finally:
+            server.close()
+        assert server.process is None
+
+    def test_timeout_kills_the_process(self):
+        server = self.get_server(timeout=0.5)
+        try:
+            line, return_code = server.request('hang')
+            assert (line, return_code) == ('', 124)
+            assert server.process is None
+
+            # the next request gets a new stackwalker
+            line, return_code = server.request('a.dump')
+            assert return_code == 0
+            assert json.loads(line)['minidump'] == 'a.dump'
+        finally:
+            server.close()
+
+    def test_long_output(self):
+        server = self.get_server()
+        try:
+            line, return_code = server.request('big')
+            assert return_code == 0
+            output = json.loads(line)
+            assert output['minidump'] == 'big'
+            assert len(output['padding']) == 1000000
+
+            line, return_code = server.request('a.dump')
+            assert return_code == 0
+            assert json.loads(line)['minidump'] == 'a.dump'
+        finally:
+            server.close()
+
+    def test_load(self):
+        server = self.get_server()
+        try:
+            output, return_code = server.request('big', load=json.load)
+            assert return_code == 0
+            assert output['minidump'] == 'big'
+
+            # what load doesn't read of the line is skipped
+            output, return_code = server.request(
+                'big',
+                load=lambda fp: fp.read(10)
+            )
+            assert return_code == 0
+            assert output.startswith('{')
+            assert len(output) < 1000000
+
+            def broken_load(fp):
+                fp.read()
+                raise ValueError('broken')
+
+            with pytest.raises(ValueError):
+                server.request('big', load=broken_load)
+
+            output, return_code = server.request('a.dump', load=json.load)
+            assert return_code == 0
+            assert output['minidump'] == 'a.dump'
+        finally:
+            server.close()
+
+    def test_load_gets_no_timeouts(self):
+        def careless_load(fp):
+            try:
+                return fp.read()
+            except Exception:
+                return 'swallowed'
+
+        server = self.get_server(timeout=0.5)
+        try:
+            output, return_code = server.request('hang', load=careless_load)
+            assert (output, return_code) == (None, 124)
+            assert server.process is None
+
+            output, return_code = server.request('die', load=careless_load)
+            assert (output, return_code) == (None, 3)
+            assert server.process is None
+        finally:
+            server.close()
+
+    def test_died(self):
+        server = self.get_server()
+        try:
+            line, return_code = server.request('die')
+            assert (line, return_code) == ('', 3)
+            assert server.process is None
+            line, return_code = server.request('a.dump')
+            assert return_code == 0
+        finally:
+            server.close()
+
+    def test_max_requests(self):
+        server = self.get_server(max_requests=2)
+        try:
+            pids = [
+                json.loads(server.request('%d.dump' % x)[0])['pid']
+                for x in range(4)
+            ]
+        finally:
+            server.close()
+        assert pids[0] == pids[1]
+        assert pids[2] == pids[3]
+        assert pids[1] != pids[2]
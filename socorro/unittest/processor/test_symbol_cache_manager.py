@@ -2,14 +2,19 @@
 # License, v. 2.0. If a copy of the MPL was not distributed with this
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 import os
+import shutil
+import sqlite3
+import tempfile
+import time
 
 from configman.dotdict import DotDict
-from mock import Mock
+from mock import Mock, patch
 from nose.tools import eq_, ok_
 import pytest
 
 from socorro.processor.symbol_cache_manager import (
     EventHandler,
+    SymbolIndexedCacheManager,
     from_string_to_parse_size,
 )
 from socorro.unittest.testbase import TestCase
@@ -232,3 +237,200 @@ class Test_SymbolLRUCacheManager(TestCase):
         config.symbol_cache_path = '/tmp'
         config.symbol_cache_size = 1024
         config.verbosity = 0
+
+
+# =============================================================================
+class TestSymbolIndexedCacheManager(TestCase):
+
+    # -------------------------------------------------------------------------
+    def setUp(self):
+        super(TestSymbolIndexedCacheManager, self).setUp()
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.temp_dir, 'symbols')
+        os.mkdir(self.cache_dir)
+
+    # -------------------------------------------------------------------------
+    def tearDown(self):
+        super(TestSymbolIndexedCacheManager, self).tearDown()
+        shutil.rmtree(self.temp_dir)
+
+    # -------------------------------------------------------------------------
+    def get_config(self):
+        config = DotDict()
+        config.symbol_cache_path = self.cache_dir
+        config.symbol_cache_size = 1024
+        config.low_watermark = 0.5
+        config.index_path = os.path.join(self.temp_dir, 'index.sqlite')
+        config.rescan_interval = 3600
+        config.eviction_batch_size = 2
+        config.verbosity = 0
+        config.logger = Mock()
+        return config
+
+    # -------------------------------------------------------------------------
+    def make_file(self, name, size, last_access):
+        path = os.path.join(self.cache_dir, name, 'ABCDEF0', name + '.sym')
+        os.makedirs(os.path.dirname(path))
+        with open(path, 'w') as f:
+            f.write('x' * size)
+        os.utime(path, (last_access, last_access))
+        return path
+
+    # -------------------------------------------------------------------------
+    def get_indexed_files(self):
+        index = sqlite3.connect(self.get_config().index_path)
+        try:
+            return dict(
+                (path, size) for path, size in
+                index.execute('SELECT path, size FROM files')
+            )
+        finally:
+            index.close()
+
+    # -------------------------------------------------------------------------
+    def stopped_manager(self, config):
+        """returns a manager whose thread has stopped, after at most a pass"""
+        manager = SymbolIndexedCacheManager(config)
+        manager._done.set()
+        manager._scanning_thread.join()
+        self.addCleanup(manager.close)
+        return manager
+
+    # -------------------------------------------------------------------------
+    def wait_for(self, condition):
+        for x in range(200):
+            if condition():
+                return
+            time.sleep(0.01)
+
+    # -------------------------------------------------------------------------
+    def test_index_and_evict(self):
+        a_path = self.make_file('a.pdb', 400, 1000)
+        b_path = self.make_file('b.pdb', 400, 2000)
+        c_path = self.make_file('c.pdb', 400, 3000)
+
+        manager = SymbolIndexedCacheManager(self.get_config())
+        self.wait_for(lambda: not os.path.exists(b_path))
+        manager.close()
+
+        # over 1024 bytes, the oldest files go until the cache is under 512
+        ok_(not os.path.exists(a_path))
+        ok_(not os.path.exists(b_path))
+        ok_(os.path.exists(c_path))
+        # and so do their empty directories
+        eq_(os.listdir(self.cache_dir), ['c.pdb'])
+        eq_(self.get_indexed_files(), {c_path: 400})
+        eq_(manager.total_size, 400)
+
+    # -------------------------------------------------------------------------
+    def test_the_index_is_kept(self):
+        c_path = self.make_file('c.pdb', 400, 3000)
+        manager = SymbolIndexedCacheManager(self.get_config())
+        self.wait_for(lambda: manager.num_files == 1)
+        manager.close()
+
+        # starting again doesn't need to go through the cache
+        manager = self.stopped_manager(self.get_config())
+        eq_(manager.total_size, 400)
+        eq_(manager.num_files, 1)
+        eq_(self.get_indexed_files(), {c_path: 400})
+
+    # -------------------------------------------------------------------------
+    def test_scan_entry(self):
+        a_path = self.make_file('a.pdb', 100, 1000)
+        manager = self.stopped_manager(self.get_config())
+        manager._scan_entry('a.pdb')
+        eq_(self.get_indexed_files(), {a_path: 100})
+
+        # a file that is added, one that grows and one that goes away
+        b_path = os.path.join(self.cache_dir, 'a.pdb', 'BCDEF01', 'a.sym')
+        os.makedirs(os.path.dirname(b_path))
+        with open(b_path, 'w') as f:
+            f.write('x' * 10)
+        with open(a_path, 'a') as f:
+            f.write('x' * 20)
+        manager._scan_entry('a.pdb')
+        eq_(self.get_indexed_files(), {a_path: 120, b_path: 10})
+        eq_(manager.total_size, 130)
+
+        os.unlink(a_path)
+        manager._scan_entry('a.pdb')
+        eq_(self.get_indexed_files(), {b_path: 10})
+        eq_(manager.total_size, 10)
+
+    # -------------------------------------------------------------------------
+    def test_files_used_since_they_were_indexed_are_kept(self):
+        a_path = self.make_file('a.pdb', 400, 1000)
+        b_path = self.make_file('b.pdb', 400, 2000)
+        config = self.get_config()
+        config.symbol_cache_size = 10000
+        manager = self.stopped_manager(config)
+        manager._scan_entry('a.pdb')
+        manager._scan_entry('b.pdb')
+
+        # a.pdb is read
+        os.utime(a_path, (3000, 1000))
+        manager.max_size = 1024
+        manager.low_size = 512
+        c_path = self.make_file('c.pdb', 400, 2500)
+        manager._scan_entry('c.pdb')
+        manager._evict()
+
+        ok_(os.path.exists(a_path))
+        ok_(not os.path.exists(b_path))
+        ok_(not os.path.exists(c_path))
+        eq_(self.get_indexed_files(), {a_path: 400})
+
+    # -------------------------------------------------------------------------
+    def test_unchanged_directories_are_not_listed_again(self):
+        a_path = self.make_file('a.pdb', 100, 1000)
+        # long enough ago to be trusted
+        id_directory = os.path.dirname(a_path)
+        for directory in (id_directory, os.path.dirname(id_directory)):
+            os.utime(directory, (1000, 1000))
+        manager = self.stopped_manager(self.get_config())
+        manager._scan_entry('a.pdb')
+        eq_(self.get_indexed_files(), {a_path: 100})
+
+        with patch(
+            'socorro.processor.symbol_cache_manager.os.listdir',
+            side_effect=os.listdir
+        ) as mocked_listdir:
+            manager._scan_entry('a.pdb')
+            eq_(mocked_listdir.call_count, 0)
+
+            # a file added to a directory changes its mtime
+            b_path = os.path.join(id_directory, 'b.sym')
+            with open(b_path, 'w') as f:
+                f.write('x' * 10)
+            manager._scan_entry('a.pdb')
+            eq_(
+                mocked_listdir.call_args_list,
+                [((id_directory,),)]
+            )
+        eq_(self.get_indexed_files(), {a_path: 100, b_path: 10})
+        eq_(manager.total_size, 110)
+
+    # -------------------------------------------------------------------------
+    def test_removed_directories_are_forgotten(self):
+        self.make_file('a.pdb', 100, 1000)
+        b_path = self.make_file('b.pdb', 10, 1000)
+        manager = self.stopped_manager(self.get_config())
+        manager._scan_entry('a.pdb')
+        manager._scan_entry('b.pdb')
+
+        shutil.rmtree(os.path.join(self.cache_dir, 'a.pdb'))
+        eq_(
+            sorted(manager._indexed_subdirectories(self.cache_dir)),
+            [
+                os.path.join(self.cache_dir, 'a.pdb'),
+                os.path.join(self.cache_dir, 'b.pdb'),
+            ]
+        )
+        manager._scan_entry('a.pdb')
+        eq_(self.get_indexed_files(), {b_path: 10})
+        eq_(manager.total_size, 10)
+        eq_(
+            manager._indexed_subdirectories(self.cache_dir),
+            [os.path.join(self.cache_dir, 'b.pdb')]
+        )
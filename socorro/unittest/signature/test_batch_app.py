@@ -0,0 +1,152 @@
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+
+import csv
+import os
+import shutil
+import tempfile
+
+import mock
+
+from socorro.external.crashstorage_base import CrashIDNotFound
+from socorro.lib.util import DotDict
+from socorro.signature.batch_app import SignatureBatchApp
+
+
+def frames(*functions):
+    return [{'function': a_function, 'frame': index} for index, a_function in enumerate(functions)]
+
+
+class FakeCrashStorage(object):
+    """a crash storage holding a few crashes"""
+
+    crashes = {
+        'same': (
+            {},
+            {
+                'signature': 'f',
+                'json_dump': {
+                    'crash_info': {'crashing_thread': 0},
+                    'threads': [{'frames': frames('f', 'g')}],
+                },
+            },
+        ),
+        'changed': (
+            {},
+            {
+                'signature': 'g',
+                'json_dump': {
+                    'crash_info': {'crashing_thread': 0},
+                    'threads': [{'frames': frames('h(int)', 'g')}],
+                },
+            },
+        ),
+        'broken': ({}, None),
+        'oom': (
+            {'OOMAllocationSize': '1048576'},
+            {
+                'signature': 'f',
+                'json_dump': {
+                    'crash_info': {'crashing_thread': 0},
+                    'threads': [{'frames': frames('f')}],
+                },
+            },
+        ),
+    }
+
+    def __init__(self, config):
+        self.config = config
+
+    def get_raw_crash(self, crash_id):
+        try:
+            return self.crashes[crash_id][0]
+        except KeyError:
+            raise CrashIDNotFound(crash_id)
+
+    def get_unredacted_processed(self, crash_id):
+        if crash_id == 'broken':
+            raise ValueError('bad json')
+        try:
+            return self.crashes[crash_id][1]
+        except KeyError:
+            raise CrashIDNotFound(crash_id)
+
+    def close(self):
+        pass
+
+
+class TestSignatureBatchApp(object):
+
+    def setup_method(self, method):
+        self.temp_dir = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.temp_dir)
+
+    def get_config(self, crash_ids, **kwargs):
+        crash_ids_file = os.path.join(self.temp_dir, 'crashids.txt')
+        with open(crash_ids_file, 'w') as f:
+            f.write('\n'.join(crash_ids) + '\n')
+        config = DotDict()
+        config.source = DotDict()
+        config.source.crashstorage_class = FakeCrashStorage
+        config.crash_ids_file = crash_ids_file
+        config.report_file = os.path.join(self.temp_dir, 'report.csv')
+        config.changed_only = False
+        config.changed_crash_ids_file = os.path.join(self.temp_dir, 'changed.txt')
+        config.number_of_processes = 1
+        config.chunk_size = 1
+        config.number_of_top_changes = 20
+        config.logger = mock.Mock()
+        config.update(kwargs)
+        return config
+
+    def read_report(self, config):
+        with open(config.report_file) as f:
+            rows = list(csv.reader(f))
+        assert rows[0] == ['crashid', 'old', 'new', 'same?', 'notes']
+        return dict((row[0], row[1:4]) for row in rows[1:])
+
+    def read_changed(self, config):
+        with open(config.changed_crash_ids_file) as f:
+            return sorted(f.read().split())
+
+    def test_report(self):
+        config = self.get_config(['same', 'changed', 'missing', 'broken', 'oom'])
+        app = SignatureBatchApp(config)
+        assert app.main() == 0
+
+        assert self.read_report(config) == {
+            'same': ['f', 'f', 'True'],
+            'changed': ['g', 'h', 'False'],
+            'broken': ['', '', 'error'],
+            'oom': ['f', 'OOM | large | f', 'False'],
+        }
+        assert self.read_changed(config) == ['changed', 'oom']
+        config.logger.warning.assert_any_call('%s: not found', 'missing')
+        config.logger.warning.assert_any_call(
+            '%s: failed: %s', 'broken', 'ValueError: bad json'
+        )
+        config.logger.info.assert_any_call(
+            '%d crashes: %d changed signature, %d kept it, %d were not found, '
+            '%d failed',
+            5, 2, 1, 1, 1
+        )
+
+    def test_changed_only(self):
+        config = self.get_config(['same', 'changed'], changed_only=True)
+        SignatureBatchApp(config).main()
+        assert self.read_report(config) == {
+            'changed': ['g', 'h', 'False'],
+        }
+
+    def test_worker_processes(self):
+        crash_ids = ['same', 'changed', 'broken', 'oom'] * 10
+        config = self.get_config(crash_ids, number_of_processes=3)
+        SignatureBatchApp(config).main()
+
+        with open(config.report_file) as f:
+            assert len(list(csv.reader(f))) == 41
+        assert self.read_changed(config) == ['changed'] * 10 + ['oom'] * 10
+        assert self.read_report(config)['changed'] == ['g', 'h', 'False']
@@ -21,6 +21,7 @@ from socorro.signature.signature_utilities import (
     SignatureGenerationRule,
     SignatureJitCategory,
     SignatureRunWatchDog,
+    SiglistClassifier,
     SigTrim,
     SigTrunc,
     SignatureShutdownTimeout,
@@ -28,6 +29,38 @@ from socorro.signature.signature_utilities import (
 )
 
 
+class TestSiglistClassifier:
+
+    def get_classifier(self):
+        return SiglistClassifier(
+            irrelevant=['ignored.*', 'both'],
+            trim_dll=[r'foo32\.dll.*', '(tr)(im)'],
+            prefix=['pre(?P<x>1|2)', 'both', r'foo32\.dll'],
+            sentinels=['sentinel', ('sentinel2', lambda x: 'ff' in x)],
+        )
+
+    def test_classify(self):
+        c = self.get_classifier()
+        assert c.classify('ignored1') == SiglistClassifier.IRRELEVANT
+        assert c.classify('foo32.dll@0x23') == SiglistClassifier.TRIM
+        assert c.classify('trim') == SiglistClassifier.TRIM
+        assert c.classify('pre2') == SiglistClassifier.PREFIX
+        assert c.classify('plain') == SiglistClassifier.PLAIN
+        # the earlier lists take precedence
+        assert c.classify('both') == SiglistClassifier.IRRELEVANT
+        # patterns match at the start of a frame only
+        assert c.classify('a pre1') == SiglistClassifier.PLAIN
+
+    def test_find_sentinel(self):
+        c = self.get_classifier()
+        assert c.find_sentinel(['a', 'b']) is None
+        assert c.find_sentinel(['a', 'sentinel', 'sentinel']) == 1
+        # a conditional sentinel only counts when its condition holds
+        assert c.find_sentinel(['a', 'sentinel2', 'b']) is None
+        assert c.find_sentinel(['a', 'sentinel2', 'ff']) == 1
+        assert c.find_sentinel(['sentinel2', 'ff', 'sentinel']) == 0
+
+
 class TestCSignatureTool:
 
     @staticmethod
@@ -125,6 +158,64 @@ class TestCSignatureTool:
             r = s.normalize_signature(*args)
             assert e == r
 
+    def test_collapse_quirks(self):
+        s = self.setup_config_c_sig_tool()
+        a = [
+            # an exception only protects the next closing delimiter
+            ('f(anonymous namespace)(x)', 'f(anonymous namespace)'),
+            ('operator()<int>(a, b)', 'operator()<T>'),
+            # a closing delimiter without an opening one throws the count off
+            ('f)(x)', 'fx'),
+            ('Alpha<name omitted>::Bravo<int>', 'Alpha<name omitted>::Bravo<T>'),
+            ('f<', 'f<'),
+        ]
+        for function, e in a:
+            assert s.normalize_signature('module', function, 's', '23', '0xFFF') == e
+
+    def test_collapse_long_templates(self):
+        s = self.setup_config_c_sig_tool()
+        function = 'A<' * 5000 + 'x' + '>' * 5000 + '(' + 'int, ' * 5000 + ')'
+        assert s.normalize_signature('module', function, 's', '23', '0xFFF') == 'A<T>'
+
+    def test_normalize_is_cached(self):
+        s = self.setup_config_c_sig_tool()
+        args = ('module', 'f(int)', 's', '23', '0xFFF')
+        with mock.patch.object(
+            s, '_normalize_signature', wraps=s._normalize_signature
+        ) as mocked_normalize:
+            assert s.normalize_signature(*args) == 'f'
+            assert s.normalize_signature(*args) == 'f'
+            assert mocked_normalize.call_count == 1
+
+            # the setting of collapse_arguments is part of the key
+            s.collapse_arguments = False
+            assert s.normalize_signature(*args) == 'f(int)'
+            assert mocked_normalize.call_count == 2
+
+            # so is the offset of a frame that has nothing else
+            assert s.normalize_signature(offset='0x1') == '@0x1'
+            assert s.normalize_signature(offset='0x2') == '@0x2'
+            assert mocked_normalize.call_count == 4
+
+    def test_normalize_cache_is_bounded(self):
+        s = self.setup_config_c_sig_tool()
+        s.cache_size = 2
+        for function in ('f', 'g', 'h'):
+            s.normalize_signature('module', function, 's', '23', '0xFFF')
+        assert len(s._cache) == 2
+        assert [key[1] for key in s._cache] == ['g', 'h']
+
+        # using an entry makes it the most recently used
+        s.normalize_signature('module', 'g', 's', '23', '0xFFF')
+        s.normalize_signature('module', 'i', 's', '23', '0xFFF')
+        assert [key[1] for key in s._cache] == ['g', 'i']
+
+    def test_normalize_without_cache(self):
+        s = self.setup_config_c_sig_tool()
+        s.cache_size = 0
+        assert s.normalize_signature('module', 'f(int)', 's', '23', '0xFFF') == 'f'
+        assert not s._cache
+
     def test_generate_1(self):
         """test_generate_1: simple"""
         s = self.setup_config_c_sig_tool(['a', 'b', 'c'], ['d', 'e', 'f'])
@@ -3,6 +3,7 @@
 # file, You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import json
+import threading
 import time
 
 from configman.dotdict import DotDict
@@ -14,6 +15,8 @@ from socorro.submitter.submitter_app import (
     SubmitterFileSystemWalkerSource,
 )
 from socorro.external.crashstorage_base import Redactor
+from socorro.lib.threaded_task_manager import ThreadedTaskManager
+from socorro.lib.util import SilentFakeLogger
 from socorro.unittest.testbase import TestCase
 
 
@@ -150,29 +153,29 @@ class TestSubmitterFileSystemWalkerSource(TestCase):
             (
                 ((
                     '6611a662-e70f-4ba5-a397-69a3a2121129',
-                    [
+                    (
                         './6611a662-e70f-4ba5-a397-69a3a2121129.json',
                         './6611a662-e70f-4ba5-a397-69a3a2121129.upload.dump'
-                    ],
+                    ),
                 ), ),
                 {}
             ),
             (
                 ((
                     '7611a662-e70f-4ba5-a397-69a3a2121129',
-                    [
+                    (
                         './7611a662-e70f-4ba5-a397-69a3a2121129.json',
                         './7611a662-e70f-4ba5-a397-69a3a2121129.other.dump'
-                    ],
+                    ),
                 ), ),
                 {}
             ),
             (
                 ((
                     '8611a662-e70f-4ba5-a397-69a3a2121129',
-                    [
-                        './8611a662-e70f-4ba5-a397-69a3a2121129.json'
-                    ]
+                    (
+                        './8611a662-e70f-4ba5-a397-69a3a2121129.json',
+                    )
                 ), ),
                 {}
             ),
@@ -228,6 +231,8 @@ class TestSubmitterApp(TestCase):
         config.submitter.delay = 0
         config.submitter.dry_run = False
         config.number_of_submissions = "all"
+        config.prefetch = DotDict()
+        config.prefetch.number_of_threads = 0
 
         config.logger = mock.MagicMock()
 
@@ -269,6 +274,8 @@ class TestSubmitterApp(TestCase):
         config.submitter.delay = 0
         config.submitter.dry_run = False
         config.number_of_submissions = "all"
+        config.prefetch = DotDict()
+        config.prefetch.number_of_threads = 0
 
         config.logger = mock.MagicMock()
 
@@ -306,6 +313,71 @@ class TestSubmitterApp(TestCase):
             crash_id
         )
 
+    def test_prefetch(self):
+        crash_ids = [
+            ('%d' % x, ('%d.json' % x, '%d.dump' % x)) for x in range(20)
+        ]
+
+        class FakeStorageSource(object):
+            def __init__(self, config, quit_check_callback):
+                self.fetched_by = {}
+
+            def get_raw_crash(self, crash_id):
+                self.fetched_by.setdefault(crash_id, []).append(
+                    threading.current_thread().name
+                )
+                return DotDict({'uuid': crash_id[0]})
+
+            def get_raw_dumps_as_files(self, crash_id):
+                return {'upload_file_minidump': crash_id[1][1]}
+
+            def new_crashes(self):
+                for crash_id in crash_ids:
+                    yield ((crash_id,), {})
+
+        class FakeStorageDestination(object):
+            def __init__(self, config, quit_check_callback):
+                self.store = {}
+
+            def save_raw_crash_with_file_dumps(self, raw_crash, dumps,
+                                               crash_id):
+                self.store[crash_id] = (raw_crash, dumps)
+
+        logger = SilentFakeLogger()
+        config = DotDict({
+            'logger': logger,
+            'number_of_submissions': 'all',
+            'submitter': DotDict({'delay': 0, 'dry_run': False}),
+            'new_crash_source': DotDict({'new_crash_source_class': None}),
+            'prefetch': DotDict({
+                'number_of_threads': 2,
+                'maximum_crashes': 4,
+                'maximum_bytes': 1000,
+            }),
+            'source': DotDict({'crashstorage_class': FakeStorageSource}),
+            'destination': DotDict({
+                'crashstorage_class': FakeStorageDestination
+            }),
+            'producer_consumer': DotDict({
+                'producer_consumer_class': ThreadedTaskManager,
+                'logger': logger,
+                'number_of_threads': 2,
+                'maximum_queue_size': 4,
+            }),
+        })
+
+        sub = SubmitterApp(config)
+        sub.main()
+
+        assert sorted(sub.destination.store) == sorted(crash_ids)
+        for crash_id, (raw_crash, dumps) in sub.destination.store.items():
+            assert raw_crash == {'uuid': crash_id[0]}
+            assert dumps == {'upload_file_minidump': crash_id[1][1]}
+        # every crash was fetched once, and some of them ahead of the workers
+        fetched_by = sub.source.fetched_by.values()
+        assert all(len(names) == 1 for names in fetched_by)
+        assert any(names[0].startswith('Prefetcher') for names in fetched_by)
+
     def test_source_iterator(self):
 
         # Test with number of submissions equal to all
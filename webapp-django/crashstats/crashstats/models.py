@@ -6,6 +6,7 @@ import datetime
 import functools
 import hashlib
 import logging
+import threading
 import time
 
 from configman import configuration, Namespace
@@ -181,7 +182,6 @@ def measure_fetches(method):
         t1 = time.time()
         self = args[0]
         msecs = int((t1 - t0) * 1000)
-        hit_or_miss = 'HIT' if hit_or_miss else 'MISS'
 
         try:
             value = self.__class__.__name__
@@ -216,6 +216,16 @@ class SocorroCommon(object):
     # default cache expiration time if applicable
     cache_seconds = 60 * 60
 
+    # number of seconds an expired result is still served from the cache
+    # while one request refreshes it in the background
+    cache_stale_seconds = 60 * 5
+
+    # number of seconds after which the lock of a request computing a
+    # result is given up, in case that request died. It is also the longest
+    # the other requests wait for that result, when nothing is cached,
+    # before they compute it themselves.
+    cache_lock_seconds = 60
+
     # At the moment, we're supporting talk HTTP to the middleware AND
     # instantiating implementation classes so this is None by default.
     implementation = None
@@ -241,6 +251,7 @@ class SocorroCommon(object):
         retry_sleeptime=None
     ):
         cache_key = None
+        locked = False
 
         if (
             settings.CACHE_IMPLEMENTATION_FETCHES and
@@ -248,25 +259,103 @@ class SocorroCommon(object):
             self.cache_seconds
         ):
             name = implementation.__class__.__name__
-            cache_key = hashlib.md5(
+            # The prefix keeps apart the results cached before they were
+            # cached with their expiration time.
+            cache_key = 'fetch_%s' % hashlib.md5(
                 name + unicode(params)
             ).hexdigest()
 
             if not refresh_cache:
-                result = cache.get(cache_key)
-                if result is not None:
-                    logger.debug(
-                        "CACHE HIT %s" % implementation.__class__.__name__
+                cached = cache.get(cache_key)
+                if cached is not None:
+                    result, fresh_until = cached
+                    if time.time() < fresh_until:
+                        logger.debug("CACHE HIT %s" % name)
+                        return result, 'HIT'
+
+                    # The result has expired. One request refreshes it in
+                    # the background, meanwhile all of them serve it as it
+                    # is instead of computing it all at once.
+                    if self._lock_cache_key(cache_key):
+                        thread = threading.Thread(
+                            target=self._refresh_cache,
+                            args=(implementation, method, params, cache_key)
+                        )
+                        thread.daemon = True
+                        thread.start()
+                    logger.debug("CACHE STALE HIT %s" % name)
+                    return result, 'STALE'
+
+                # Nothing is cached. One request computes the result, the
+                # others wait for it while it holds the lock. If it takes
+                # too long, or releases the lock without caching a result
+                # (the cache may refuse results that are too big), they
+                # compute it themselves, without the lock.
+                locked = self._lock_cache_key(cache_key)
+                if not locked:
+                    cached = self._wait_for_cache_key(
+                        cache_key,
+                        time.time() + self.cache_lock_seconds
                     )
-                    return result, True
+                    if cached is not None:
+                        logger.debug("CACHE HIT %s" % name)
+                        return cached[0], 'HIT'
 
         implementation_method = getattr(implementation, method)
-        result = implementation_method(**params)
+        try:
+            result = implementation_method(**params)
+            if cache_key:
+                self._set_cache_key(cache_key, result)
+        finally:
+            if locked:
+                self._unlock_cache_key(cache_key)
+
+        return result, 'MISS'
+
+    def _set_cache_key(self, cache_key, result):
+        # The result is kept cache_stale_seconds after it expires, to be
+        # served while it is refreshed.
+        cache.set(
+            cache_key,
+            (result, time.time() + self.cache_seconds),
+            self.cache_seconds + self.cache_stale_seconds
+        )
+
+    def _lock_cache_key(self, cache_key):
+        """Return whether the lock to compute the result of cache_key was
+        acquired. cache.add() is atomic, only one request gets it. """
+        return cache.add(
+            'lock_%s' % cache_key, True, self.cache_lock_seconds
+        )
 
-        if cache_key:
-            cache.set(cache_key, result, self.cache_seconds)
+    def _unlock_cache_key(self, cache_key):
+        cache.delete('lock_%s' % cache_key)
 
-        return result, False
+    def _wait_for_cache_key(self, cache_key, deadline):
+        """Return what was cached at cache_key by the request holding its
+        lock, None if that request released the lock without caching
+        anything or if the deadline passed. """
+        while time.time() < deadline:
+            time.sleep(0.1)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+            if cache.get('lock_%s' % cache_key) is None:
+                return None
+        return None
+
+    def _refresh_cache(self, implementation, method, params, cache_key):
+        try:
+            result = getattr(implementation, method)(**params)
+            self._set_cache_key(cache_key, result)
+        except Exception:
+            logger.error(
+                'Unable to refresh the cache of %s',
+                implementation.__class__.__name__,
+                exc_info=True
+            )
+        finally:
+            self._unlock_cache_key(cache_key)
 
     def _complete_url(self, url):
         if url.startswith('/'):
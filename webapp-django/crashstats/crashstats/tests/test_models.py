@@ -1,6 +1,7 @@
 import json
 import datetime
 import random
+import time
 import urlparse
 
 import mock
@@ -422,6 +423,103 @@ class TestModels(DjangoTestCase):
         assert 'Unknown' not in settings.DISPLAY_OS_NAMES
         eq_(r[1], {'code': 'unk', 'name': 'Unknown', 'display': False})
 
+    def test_fetch_serves_stale_results_while_refreshing(self):
+        api = models.Platforms()
+        names = ['Windows', 'Linux']
+
+        def mocked_get(**options):
+            return {
+                'hits': [{'code': 'win', 'name': names.pop(0)}],
+                'total': 1
+            }
+
+        implementation = models.Platforms.implementation()
+        implementation.get.side_effect = mocked_get
+
+        eq_(api.get()[0]['name'], 'Windows')
+        eq_(api.get()[0]['name'], 'Windows')
+        eq_(implementation.get.call_count, 1)
+
+        expired = time.time() + api.cache_seconds + 1
+        with mock.patch('crashstats.crashstats.models.time') as mocked_time:
+            mocked_time.time.return_value = expired
+            with mock.patch(
+                'crashstats.crashstats.models.threading'
+            ) as mocked_threading:
+                # the expired result is served, and refreshed by one request
+                # only
+                eq_(api.get()[0]['name'], 'Windows')
+                eq_(api.get()[0]['name'], 'Windows')
+                eq_(mocked_threading.Thread.call_count, 1)
+                eq_(implementation.get.call_count, 1)
+
+                refresh = mocked_threading.Thread.call_args[1]
+                refresh['target'](*refresh['args'])
+                eq_(implementation.get.call_count, 2)
+
+            eq_(api.get()[0]['name'], 'Linux')
+            eq_(implementation.get.call_count, 2)
+
+    def test_fetch_when_another_request_is_computing(self):
+        api = models.Platforms()
+        result = {
+            'hits': [{'code': 'win', 'name': 'Windows'}],
+            'total': 1
+        }
+        implementation = models.Platforms.implementation()
+        implementation.get.return_value = result
+
+        with mock.patch.object(api, '_lock_cache_key') as mocked_lock:
+            mocked_lock.return_value = False
+
+            def other_request_caches(seconds):
+                cache_key = mocked_lock.call_args[0][0]
+                api._set_cache_key(cache_key, result)
+
+            with mock.patch.object(
+                models.time,
+                'sleep',
+                side_effect=other_request_caches
+            ):
+                # the result of the other request is served
+                eq_(api.get()[0]['name'], 'Windows')
+        eq_(implementation.get.call_count, 0)
+
+    def test_fetch_when_another_request_gives_up(self):
+        api = models.Platforms()
+        implementation = models.Platforms.implementation()
+        implementation.get.return_value = {
+            'hits': [{'code': 'win', 'name': 'Windows'}],
+            'total': 1
+        }
+
+        with mock.patch.object(api, '_lock_cache_key') as mocked_lock:
+            # the other request releases the lock without a result, this
+            # one computes it without waiting for the lock
+            mocked_lock.return_value = False
+            with mock.patch.object(models.time, 'sleep'):
+                eq_(api.get()[0]['name'], 'Windows')
+        eq_(mocked_lock.call_count, 1)
+        eq_(implementation.get.call_count, 1)
+
+    def test_fetch_when_the_lock_is_never_released(self):
+        api = models.Platforms()
+        api.cache_lock_seconds = 0
+        implementation = models.Platforms.implementation()
+        implementation.get.return_value = {
+            'hits': [{'code': 'win', 'name': 'Windows'}],
+            'total': 1
+        }
+
+        with mock.patch.object(api, '_lock_cache_key') as mocked_lock:
+            mocked_lock.return_value = False
+            with mock.patch.object(api, '_unlock_cache_key') as mocked_unlock:
+                # once the wait is over, it is computed all the same
+                eq_(api.get()[0]['name'], 'Windows')
+                # and the lock of the other request is left alone
+                eq_(mocked_unlock.call_count, 0)
+        eq_(implementation.get.call_count, 1)
+
     def test_adi(self):
         model = models.ADI
         api = model()
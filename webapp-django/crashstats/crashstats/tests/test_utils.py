@@ -1,5 +1,6 @@
 import copy
 import datetime
+import gzip
 from cStringIO import StringIO
 from unittest import TestCase
 import json
@@ -531,6 +532,20 @@ class TestUtils(TestCase):
         ok_('123,' in u_result)
         ok_('1.23' in u_result)
 
+    def test_iter_csv(self):
+        rows = [['abc', u'\xe4\xc3'], [123, 1.23]] * 1000
+        chunks = list(utils.iter_csv(rows, chunk_size=1024, delimiter='\t'))
+        ok_(len(chunks) > 1)
+        result = ''.join(chunks)
+        eq_(result, 'abc\t\xc3\xa4\xc3\x83\r\n123\t1.23\r\n' * 1000)
+
+        chunks = list(utils.iter_csv(
+            rows, compress=True, chunk_size=1024, delimiter='\t'
+        ))
+        compressed = ''.join(chunks)
+        ok_(len(compressed) < len(result))
+        eq_(gzip.GzipFile(fileobj=StringIO(compressed)).read(), result)
+
     def test_json_view_basic(self):
         request = RequestFactory().get('/')
 
@@ -4,6 +4,7 @@ import re
 import copy
 import csv
 import datetime
+import gzip
 import json
 import random
 import urlparse
@@ -2582,7 +2583,7 @@ class TestViews(BaseTestViews):
 
     def test_graphics_report(self):
 
-        def mocked_supersearch_get(**params):
+        def mocked_supersearch_iter_hits(**params):
             assert params['product'] == [settings.DEFAULT_PRODUCT]
             hits = [
                 {
@@ -2604,13 +2605,10 @@ class TestViews(BaseTestViews):
                 for head in GRAPHICS_REPORT_HEADER:
                     if head not in hit:
                         hit[head] = None
-            return {
-                'hits': hits,
-                'total': 2
-            }
+            return iter(hits)
 
-        SuperSearch.implementation().get.side_effect = (
-            mocked_supersearch_get
+        SuperSearch.implementation().iter_hits.side_effect = (
+            mocked_supersearch_iter_hits
         )
 
         url = reverse('crashstats:graphics_report')
@@ -2641,11 +2639,12 @@ class TestViews(BaseTestViews):
         response = self.client.get(url, data)
         eq_(response.status_code, 200)
         eq_(response['Content-Type'], 'text/csv')
-        eq_(response['Content-Length'], str(len(response.content)))
+        ok_(response.streaming)
+        content = ''.join(response.streaming_content)
 
         # the response content should be parseable
-        length = len(response.content)
-        inp = StringIO(response.content)
+        length = len(content)
+        inp = StringIO(content)
         reader = csv.reader(inp, delimiter='\t')
         lines = list(reader)
         assert len(lines) == 3
@@ -2665,9 +2664,13 @@ class TestViews(BaseTestViews):
         response = self.client.get(url, data, HTTP_ACCEPT_ENCODING='gzip')
         eq_(response.status_code, 200)
         eq_(response['Content-Type'], 'text/csv')
-        eq_(response['Content-Length'], str(len(response.content)))
         eq_(response['Content-Encoding'], 'gzip')
-        ok_(len(response.content) < length)
+        content = ''.join(response.streaming_content)
+        ok_(len(content) < length)
+        eq_(
+            gzip.GzipFile(fileobj=StringIO(content)).read(),
+            ''.join(self.client.get(url, data).streaming_content)
+        )
 
     def test_graphics_report_not_available_via_regular_web_api(self):
         # check that the model isn't available in the API documentation
@@ -2,6 +2,7 @@ import csv
 import codecs
 import cStringIO
 import datetime
+import gzip
 import isodate
 import functools
 import json
@@ -333,6 +334,28 @@ class UnicodeWriter:
             self.writerow(row)
 
 
+def iter_csv(rows, compress=False, chunk_size=64 * 1024, **kwds):
+    """Yield the CSV of rows in chunks of about chunk_size bytes, gzipped
+    on the fly if compress, so that the whole CSV is never in memory.
+    The other keyword arguments are those of UnicodeWriter."""
+    out = cStringIO.StringIO()
+    if compress:
+        stream = gzip.GzipFile(mode='wb', compresslevel=6, fileobj=out)
+    else:
+        stream = out
+    writer = UnicodeWriter(stream, **kwds)
+    for row in rows:
+        writer.writerow(row)
+        if out.tell() >= chunk_size:
+            yield out.getvalue()
+            out.seek(0)
+            out.truncate()
+
+    if compress:
+        stream.close()
+    yield out.getvalue()
+
+
 def add_CORS_header(f):
     @functools.wraps(f)
     def wrapper(request, *args, **kw):
@@ -2,10 +2,8 @@ import copy
 import json
 import datetime
 import urllib
-import gzip
 from collections import defaultdict
 from operator import itemgetter
-from io import BytesIO
 
 import isoweek
 
@@ -1113,7 +1111,6 @@ def graphics_report(request):
     if not form.is_valid():
         return http.HttpResponseBadRequest(str(form.errors))
 
-    batch_size = 1000
     product = form.cleaned_data['product'] or settings.DEFAULT_PRODUCT
     date = form.cleaned_data['date']
     params = {
@@ -1142,24 +1139,14 @@ def graphics_report(request):
             'app_notes',
             'release_channel',
         ),
-        '_results_number': batch_size,
-        '_results_offset': 0,
+        # The number of crashes fetched from each shard at a time.
+        '_results_number': 1000,
     }
     api = SuperSearch()
-    # Do the first query. That'll give us the total and the first page's
-    # worth of crashes.
-    data = api.get(**params)
-    assert 'hits' in data
+    # All the crashes of the day, fetched from elasticsearch as the CSV is
+    # sent.
+    hits = api.iter_hits(**params)
 
-    accept_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
-    response = http.HttpResponse(content_type='text/csv')
-    out = BytesIO()
-    writer = utils.UnicodeWriter(out, delimiter='\t')
-    writer.writerow(GRAPHICS_REPORT_HEADER)
-    pages = data['total'] // batch_size
-    # if there is a remainder, add one more page
-    if data['total'] % batch_size:
-        pages += 1
     alias = {
         'crash_id': 'uuid',
         'os_name': 'platform',
@@ -1202,35 +1189,28 @@ def graphics_report(request):
             value = ''
         return value
 
-    for page in range(pages):
-        if page > 0:
-            params['_results_offset'] = batch_size * page
-            data = api.get(**params)
-
-        for row in data['hits']:
+    def rows():
+        yield GRAPHICS_REPORT_HEADER
+        for row in hits:
             # Each row is a dict, we want to turn it into a list of
             # exact order as the `header` tuple above.
             # However, because the csv writer module doesn't "understand"
             # python's None, we'll replace those with '' to make the
             # CSV not have the word 'None' where the data is None.
-            writer.writerow([
+            yield [
                 get_value(row, x)
                 for x in GRAPHICS_REPORT_HEADER
-            ])
+            ]
 
-    payload = out.getvalue()
+    # The CSV is written, and gzipped, as it is sent, so that neither the
+    # crashes nor the CSV are ever all in memory.
+    accept_gzip = 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', '')
+    response = http.StreamingHttpResponse(
+        utils.iter_csv(rows(), compress=accept_gzip, delimiter='\t'),
+        content_type='text/csv'
+    )
     if accept_gzip:
-        zbuffer = BytesIO()
-        zfile = gzip.GzipFile(mode='wb', compresslevel=6, fileobj=zbuffer)
-        zfile.write(payload)
-        zfile.close()
-        compressed_payload = zbuffer.getvalue()
-        response.write(compressed_payload)
-        response['Content-Length'] = len(compressed_payload)
         response['Content-Encoding'] = 'gzip'
-    else:
-        response.write(payload)
-        response['Content-Length'] = len(payload)
     return response
 
 
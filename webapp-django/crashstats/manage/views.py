@@ -248,24 +248,33 @@ def analyze_model_fetches(request):
         data = {}
         data['times'] = {}
         data['times']['hits'] = cache.get('times_HIT_%s' % itemkey, 0)
+        data['times']['stale_hits'] = cache.get(
+            'times_STALE_%s' % itemkey, 0
+        )
         data['times']['misses'] = cache.get('times_MISS_%s' % itemkey, 0)
         data['times']['both'] = (
-            data['times']['hits'] + data['times']['misses']
+            data['times']['hits'] +
+            data['times']['stale_hits'] +
+            data['times']['misses']
         )
         data['uses'] = {}
         data['uses']['hits'] = cache.get('uses_HIT_%s' % itemkey, 0)
+        data['uses']['stale_hits'] = cache.get('uses_STALE_%s' % itemkey, 0)
         data['uses']['misses'] = cache.get('uses_MISS_%s' % itemkey, 0)
         data['uses']['both'] = (
-            data['uses']['hits'] + data['uses']['misses']
-        )
-        data['uses']['hits_percentage'] = (
-            data['uses']['both'] and
-            round(
-                100.0 * data['uses']['hits'] / data['uses']['both'],
-                1
-            ) or
-            'n/a'
+            data['uses']['hits'] +
+            data['uses']['stale_hits'] +
+            data['uses']['misses']
         )
+        for key in ('hits', 'stale_hits', 'misses'):
+            data['uses']['%s_percentage' % key] = (
+                data['uses']['both'] and
+                round(
+                    100.0 * data['uses'][key] / data['uses']['both'],
+                    1
+                ) or
+                'n/a'
+            )
         records.append((item, data))
     context['records'] = records
     return render(request, 'manage/analyze-model-fetches.html', context)
@@ -737,8 +737,11 @@ class TestViews(BaseTestViews):
 
             return res
 
-        SuperSearchUnredacted.implementation().get.side_effect = (
-            mocked_supersearch_get
+        def mocked_supersearch_get_batch(queries):
+            return [mocked_supersearch_get(**params) for params in queries]
+
+        SuperSearchUnredacted.implementation().get_batch.side_effect = (
+            mocked_supersearch_get_batch
         )
 
         # Test with no results
@@ -845,8 +848,11 @@ class TestViews(BaseTestViews):
 
             return res
 
-        SuperSearchUnredacted.implementation().get.side_effect = (
-            mocked_supersearch_get
+        def mocked_supersearch_get_batch(queries):
+            return [mocked_supersearch_get(**params) for params in queries]
+
+        SuperSearchUnredacted.implementation().get_batch.side_effect = (
+            mocked_supersearch_get_batch
         )
 
         # Test with no results
@@ -427,30 +427,23 @@ def signature_summary(request, params):
 
     api = SuperSearchUnredacted()
 
-    # Now make the actual request with all expected parameters.
-    try:
-        search_results = api.get(**params)
-    except BadArgumentError as e:
-        # We need to return the error message in some HTML form for jQuery to
-        # pick it up.
-        return http.HttpResponseBadRequest(render_exception(e))
-
-    facets = search_results['facets']
-
     # We need to make a separate query so that we can show all versions and
-    # not just the one asked for.
+    # not just the one asked for. Both queries are made in a single request.
     params_copy = {
         'signature': params['signature'],
         '_aggs.product.version': ['_cardinality.install_time'],
     }
 
+    # Now make the actual request with all expected parameters.
     try:
-        product_results = api.get(**params_copy)
+        search_results, product_results = api.get_batch(params, params_copy)
     except BadArgumentError as e:
-        # We need to return the error message in some HTML form for jQuery
-        # to pick it up.
+        # We need to return the error message in some HTML form for jQuery to
+        # pick it up.
         return http.HttpResponseBadRequest(render_exception(e))
 
+    facets = search_results['facets']
+
     if 'product' in product_results['facets']:
         facets['product'] = product_results['facets']['product']
     else:
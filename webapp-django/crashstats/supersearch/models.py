@@ -148,6 +148,36 @@ class SuperSearch(ESSocorroMiddleware):
         return tuple(extended_fields)
 
     def get(self, **kwargs):
+        # Notice that here we use `SuperSearch` as the class, so that we
+        # shortcut the `get` function in that class.
+        return super(SuperSearch, self).get(**self._clean_kwargs(kwargs))
+
+    def get_batch(self, *queries):
+        """Return the results of each query, a query being the keyword
+        arguments of a call to `get`. All the queries are sent to
+        elasticsearch in a single request. """
+        queries = [
+            self.kwargs_to_params(self._clean_kwargs(dict(kwargs)))
+            for kwargs in queries
+        ]
+        return self.fetch(
+            self.get_implementation(),
+            method='get_batch',
+            params={'queries': queries},
+        )
+
+    def iter_hits(self, **kwargs):
+        """Return an iterator over all the hits of a query, however many
+        there are. They are fetched from elasticsearch as the iterator is
+        consumed, so they are never cached. """
+        return self.fetch(
+            self.get_implementation(),
+            method='iter_hits',
+            params=self.kwargs_to_params(self._clean_kwargs(kwargs)),
+            dont_cache=True,
+        )
+
+    def _clean_kwargs(self, kwargs):
         # Sanitize all parameters listing fields and make sure no private data
         # is requested.
 
@@ -190,7 +220,7 @@ class SuperSearch(ESSocorroMiddleware):
         # SuperSearch requires that the list of fields be passed to it.
         kwargs['_fields'] = self.all_fields
 
-        return super(SuperSearch, self).get(**kwargs)
+        return kwargs
 
 
 class SuperSearchUnredacted(SuperSearch):
@@ -221,14 +251,14 @@ class SuperSearchUnredacted(SuperSearch):
 
         self.API_REQUIRED_PERMISSIONS = tuple(permissions.keys())
 
-    def get(self, **kwargs):
+    def _clean_kwargs(self, kwargs):
+        # There is no _facets field cleaning here, all the fields can be
+        # requested.
+
         # SuperSearch requires that the list of fields be passed to it.
         kwargs['_fields'] = self.all_fields
 
-        # Notice that here we use `SuperSearch` as the class, so that we
-        # shortcut the `get` function in that class. The goal is to avoid
-        # the _facets field cleaning.
-        return super(SuperSearch, self).get(**kwargs)
+        return kwargs
 
 
 class SuperSearchFields(ESSocorroMiddleware):